@@ -0,0 +1,57 @@
+'''Benchmarks for detection scores on random blobs, run with ``asv run``.'''
+from .generators import random_detections, voronoi_segmentation
+from funlib import evaluate
+from funlib.evaluate.detection import find_centers
+import numpy as np
+
+
+class DetectionScores:
+
+    params = (
+        [64, 128, 256],
+        [10, 1000],
+        ['overlap', 'distance'])
+    param_names = ['size', 'num_blobs', 'matching_score']
+    timeout = 1800
+
+    def setup(self, size, num_blobs, matching_score):
+
+        # blobs fill about a tenth of the volume
+        radius = max(1.5, 0.3*size/num_blobs**(1/3))
+        self.truth, self.test = random_detections(
+            (size,)*3,
+            num_blobs,
+            radius)
+
+    def time_detection_scores(self, size, num_blobs, matching_score):
+
+        evaluate.detection_scores(
+            self.truth,
+            self.test,
+            matching_score=matching_score)
+
+    def peakmem_detection_scores(self, size, num_blobs, matching_score):
+
+        self.time_detection_scores(size, num_blobs, matching_score)
+
+
+class FindCenters:
+
+    params = (
+        [64, 128, 256],
+        [100, 10000])
+    param_names = ['size', 'num_labels']
+    timeout = 1800
+
+    def setup(self, size, num_labels):
+
+        self.labels = voronoi_segmentation((size,)*3, num_labels)
+        self.ids = np.arange(1, num_labels + 1)
+
+    def time_find_centers(self, size, num_labels):
+
+        find_centers(self.labels, self.ids)
+
+    def peakmem_find_centers(self, size, num_labels):
+
+        find_centers(self.labels, self.ids)
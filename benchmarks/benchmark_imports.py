@@ -0,0 +1,25 @@
+'''Benchmarks for the import time of the package, run with ``asv run``. Each
+import runs in a fresh interpreter.'''
+
+
+class ImportTime:
+
+    def timeraw_import_package(self):
+
+        return "import funlib.evaluate"
+
+    def timeraw_import_rand_voi(self):
+
+        return "from funlib.evaluate import rand_voi"
+
+    def timeraw_import_expected_run_length(self):
+
+        return "from funlib.evaluate import expected_run_length"
+
+    def timeraw_import_detection_scores(self):
+
+        return "from funlib.evaluate import detection_scores"
+
+    def timeraw_import_split_graph(self):
+
+        return "from funlib.evaluate import split_graph"
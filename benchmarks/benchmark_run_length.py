@@ -0,0 +1,82 @@
+'''Benchmarks for the expected run-length, run with ``asv run``. Use ``asv
+continuous <commit> HEAD`` to compare against another commit.'''
+from .generators import random_segmentation, random_skeletons, to_networkx
+from funlib import evaluate
+import numpy as np
+
+
+class SkeletonsSetup:
+
+    param_names = ['num_nodes', 'implementation']
+    timeout = 1800
+
+    def setup(self, num_nodes, implementation):
+
+        if implementation == 'networkx' and num_nodes > 10**6:
+            raise NotImplementedError("too slow")
+
+        self.skeletons = random_skeletons(num_nodes)
+        self.segments = random_segmentation(self.skeletons)
+
+        if implementation == 'networkx':
+            self.graph = to_networkx(self.skeletons)
+            self.node_segment_lut = dict(zip(
+                self.skeletons.node_ids.tolist(),
+                self.segments.tolist()))
+            self.skeleton_lengths = evaluate.get_skeleton_lengths(
+                self.graph,
+                ['z', 'y', 'x'],
+                'skeleton_id',
+                store_edge_length='length')
+
+        # build cached indices outside of the timing
+        self.skeletons.skeleton_csr()
+
+
+class ExpectedRunLength(SkeletonsSetup):
+
+    params = (
+        [10**5, 10**6, 10**7, 10**8],
+        ['compiled', 'vectorized', 'networkx'])
+
+    def time_expected_run_length(self, num_nodes, implementation):
+
+        if implementation == 'compiled':
+            evaluate.expected_run_length(
+                self.skeletons,
+                None,
+                None,
+                self.segments)
+        elif implementation == 'vectorized':
+            evaluate.expected_run_length_sweep(
+                self.skeletons,
+                self.segments[np.newaxis])
+        else:
+            evaluate.expected_run_length(
+                self.graph,
+                'skeleton_id',
+                'length',
+                self.node_segment_lut,
+                skeleton_lengths=self.skeleton_lengths)
+
+    def peakmem_expected_run_length(self, num_nodes, implementation):
+
+        self.time_expected_run_length(num_nodes, implementation)
+
+
+class EvaluateSkeletons(SkeletonsSetup):
+
+    # there is no vectorized version of evaluate_skeletons
+    params = (
+        [10**5, 10**6, 10**7, 10**8],
+        ['compiled', 'networkx'])
+
+    def time_evaluate_skeletons(self, num_nodes, implementation):
+
+        if implementation == 'compiled':
+            evaluate.evaluate_skeleton_arrays(self.skeletons, self.segments)
+        else:
+            evaluate.evaluate_skeletons(
+                self.graph,
+                'skeleton_id',
+                self.node_segment_lut)
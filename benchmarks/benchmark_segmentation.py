@@ -0,0 +1,37 @@
+'''Benchmarks for segmentation metrics on Voronoi segmentations with split
+and merge errors, run with ``asv run``.'''
+from .generators import perturb_segmentation, voronoi_segmentation
+from funlib import evaluate
+
+
+class SegmentationMetrics:
+
+    params = (
+        [64, 128, 256],
+        [100, 10000])
+    param_names = ['size', 'num_labels']
+    timeout = 1800
+
+    def setup(self, size, num_labels):
+
+        self.truth = voronoi_segmentation((size,)*3, num_labels)
+        self.test = perturb_segmentation(
+            self.truth,
+            num_splits=num_labels//10,
+            num_merges=num_labels//10)
+
+    def time_rand_voi(self, size, num_labels):
+
+        evaluate.rand_voi(self.truth, self.test)
+
+    def peakmem_rand_voi(self, size, num_labels):
+
+        evaluate.rand_voi(self.truth, self.test)
+
+    def time_edit_counts(self, size, num_labels):
+
+        evaluate.edit_counts(self.truth, self.test)
+
+    def peakmem_edit_counts(self, size, num_labels):
+
+        evaluate.edit_counts(self.truth, self.test)
@@ -0,0 +1,49 @@
+'''Benchmarks for splitting graphs with min-cuts, run with ``asv run``.'''
+from .generators import random_grid_graph
+from funlib import evaluate
+import numpy as np
+
+
+class SplitGraph:
+
+    params = (
+        [10, 20, 40],
+        [2, 16],
+        ['graph_tool', 'scipy'])
+    param_names = ['size', 'num_components', 'backend']
+    timeout = 1800
+
+    def setup(self, size, num_components, backend):
+
+        if backend == 'graph_tool' and not evaluate._have_graph_tool:
+            raise NotImplementedError("graph_tool not installed")
+
+        self.edges, self.weights, self.positions = random_grid_graph(size)
+
+        # components of a few nodes each, at random locations
+        rng = np.random.default_rng(0)
+        nodes = rng.permutation(len(self.positions))[:num_components*5]
+        self.components = np.split(nodes, num_components)
+
+    def time_split_graph(self, size, num_components, backend):
+
+        evaluate.split_graph_arrays(
+            self.edges,
+            self.weights,
+            self.positions,
+            self.components,
+            backend=backend)
+
+    def peakmem_split_graph(self, size, num_components, backend):
+
+        self.time_split_graph(size, num_components, backend)
+
+    def time_split_graph_multiway(self, size, num_components, backend):
+
+        evaluate.split_graph_arrays(
+            self.edges,
+            self.weights,
+            self.positions,
+            self.components,
+            backend=backend,
+            mode='multiway')
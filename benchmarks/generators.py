@@ -0,0 +1,206 @@
+'''Generators of synthetic data for the benchmarks. All generators are
+deterministic for a given ``seed``.'''
+from funlib import evaluate
+import networkx
+import numpy as np
+import scipy.ndimage
+
+
+def voronoi_segmentation(shape, num_labels, seed=0):
+    '''Create a segmentation with ``num_labels`` Voronoi cells around random
+    seed points, labelled ``1, ..., num_labels``.'''
+
+    rng = np.random.default_rng(seed)
+
+    size = int(np.prod(shape))
+    seeds = rng.choice(size, num_labels, replace=False)
+    labels = np.zeros(shape, dtype=np.uint64)
+    labels.ravel()[seeds] = np.arange(1, num_labels + 1, dtype=np.uint64)
+
+    # assign each voxel to its closest seed
+    indices = scipy.ndimage.distance_transform_edt(
+        labels == 0,
+        return_distances=False,
+        return_indices=True)
+
+    return labels[tuple(indices)]
+
+
+def perturb_segmentation(segmentation, num_splits, num_merges, seed=0):
+    '''Introduce split and merge errors into a segmentation: ``num_splits``
+    random segments are cut in half along a random axis through their
+    center, ``num_merges`` random segments are merged into another random
+    segment.'''
+
+    rng = np.random.default_rng(seed)
+
+    num_labels = int(segmentation.max()) + 1
+    labels = segmentation.ravel()
+    sizes = np.maximum(np.bincount(labels, minlength=num_labels), 1)
+
+    split = np.zeros((num_labels,), dtype=bool)
+    split[rng.choice(np.arange(1, num_labels), num_splits, replace=False)] = \
+        True
+    axes = rng.integers(0, segmentation.ndim, num_labels)
+
+    result = segmentation.copy()
+    for d in range(segmentation.ndim):
+
+        coordinates = np.broadcast_to(
+            np.arange(segmentation.shape[d]).reshape(
+                [-1 if i == d else 1 for i in range(segmentation.ndim)]),
+            segmentation.shape)
+        centers = np.bincount(
+            labels,
+            weights=coordinates.ravel(),
+            minlength=num_labels)/sizes
+
+        cut = np.logical_and(
+            np.logical_and(split, axes == d)[segmentation],
+            coordinates > centers[segmentation])
+        result[cut] += np.uint64(num_labels)
+
+    lut = np.arange(2*num_labels, dtype=segmentation.dtype)
+    merged = rng.choice(np.arange(1, num_labels), num_merges, replace=False)
+    lut[merged] = rng.integers(1, num_labels, num_merges)
+
+    return lut[result]
+
+
+def paint_blobs(shape, centers, radius):
+    '''Paint balls of the given radius around each center. Later balls
+    overwrite earlier ones, the remaining balls are labelled consecutively
+    starting at 1.'''
+
+    labels = np.zeros(shape, dtype=np.uint64)
+
+    r = int(np.ceil(radius))
+    offsets = np.indices((2*r + 1,)*len(shape)).reshape(len(shape), -1).T - r
+    offsets = offsets[np.sum(offsets**2, axis=1) <= radius**2]
+
+    for i, center in enumerate(np.round(centers).astype(np.int64)):
+        coordinates = center + offsets
+        inside = np.all(
+            np.logical_and(coordinates >= 0, coordinates < shape),
+            axis=1)
+        labels[tuple(coordinates[inside].T)] = i + 1
+
+    ids = np.unique(labels[labels > 0])
+    lut = np.zeros((len(centers) + 1,), dtype=np.uint64)
+    lut[ids] = np.arange(1, len(ids) + 1)
+
+    return lut[labels]
+
+
+def random_detections(
+        shape,
+        num_blobs,
+        radius,
+        jitter=1.0,
+        miss_rate=0.1,
+        false_rate=0.1,
+        seed=0):
+    '''Create ``truth`` and ``test`` arrays of blobs, where ``test`` has
+    jittered centers, misses a fraction of the ``truth`` blobs, and contains
+    a fraction of additional blobs.'''
+
+    rng = np.random.default_rng(seed)
+    shape = np.array(shape)
+
+    true_centers = rng.random((num_blobs, len(shape)))*shape
+    detected = rng.random(num_blobs) >= miss_rate
+    test_centers = np.concatenate([
+        true_centers[detected] +
+        rng.normal(scale=jitter, size=(np.sum(detected), len(shape))),
+        rng.random((int(num_blobs*false_rate), len(shape)))*shape
+    ])
+
+    return (
+        paint_blobs(tuple(shape), true_centers, radius),
+        paint_blobs(tuple(shape), test_centers, radius))
+
+
+def random_skeletons(num_nodes, nodes_per_skeleton=1000, seed=0):
+    '''Create random tree skeletons, each a random walk in space.'''
+
+    rng = np.random.default_rng(seed)
+
+    node_ids = np.arange(num_nodes, dtype=np.uint64)
+    skeleton_ids = node_ids//nodes_per_skeleton + 1
+    local_ids = node_ids % nodes_per_skeleton
+
+    # connect each node to one of the previous few nodes of its skeleton
+    children = np.nonzero(local_ids > 0)[0]
+    parents = children - np.minimum(
+        rng.integers(1, 10, size=len(children)),
+        local_ids[children]).astype(np.int64)
+    edges = np.stack([parents, children], axis=1)
+
+    positions = np.cumsum(
+        rng.normal(size=(num_nodes, 3)).astype(np.float32),
+        axis=0)
+
+    return evaluate.SkeletonArrays(
+        node_ids,
+        skeleton_ids,
+        edges,
+        positions=positions)
+
+
+def random_segmentation(skeletons, split_rate=0.01, merge_rate=0.01, seed=0):
+    '''Assign a segment to each skeleton node with a given rate of splits
+    along each skeleton and merges between skeletons.'''
+
+    rng = np.random.default_rng(seed)
+    num_nodes = skeletons.num_nodes
+
+    # start a new segment at random nodes (in ID order)
+    splits = rng.random(num_nodes) < split_rate
+    segments = skeletons.skeleton_ids*num_nodes + np.cumsum(splits)
+
+    # relabel random nodes to the segment of another random node
+    merged = np.nonzero(rng.random(num_nodes) < merge_rate)[0]
+    segments[merged] = segments[rng.integers(0, num_nodes, len(merged))]
+
+    return segments.astype(np.uint64)
+
+
+def to_networkx(skeletons):
+
+    graph = networkx.Graph()
+    graph.add_nodes_from(
+        (int(n), {'skeleton_id': int(s), 'z': p[0], 'y': p[1], 'x': p[2]})
+        for n, s, p in zip(
+            skeletons.node_ids,
+            skeletons.skeleton_ids,
+            skeletons.positions))
+    graph.add_edges_from(
+        (int(skeletons.node_ids[u]), int(skeletons.node_ids[v]))
+        for u, v in skeletons.edges)
+
+    return graph
+
+
+def random_grid_graph(size, seed=0):
+    '''Create a 3D grid graph with random edge weights, like a region
+    adjacency graph of a regular oversegmentation.'''
+
+    rng = np.random.default_rng(seed)
+
+    shape = (size, size, size)
+    num_nodes = size**3
+    node_ids = np.arange(num_nodes).reshape(shape)
+    positions = np.stack(
+        np.unravel_index(np.arange(num_nodes), shape),
+        axis=1).astype(np.float64)
+
+    edges = np.concatenate([
+        np.stack([
+            np.take(node_ids, np.arange(size - 1), axis=d).ravel(),
+            np.take(node_ids, np.arange(1, size), axis=d).ravel()
+        ], axis=1)
+        for d in range(3)
+    ])
+    weights = rng.random(len(edges))
+
+    return edges, weights, positions
@@ -1,26 +1,74 @@
 from __future__ import absolute_import
-from .detection import detection_scores
+import importlib
+
+# functions with the same name as their module are imported eagerly (they only
+# need numpy), otherwise importing the module later would shadow the function
+from .edit_counts import edit_counts
 from .rand_voi import rand_voi
-from .run_length import \
-        expected_run_length, \
-        evaluate_skeletons, \
-        get_skeleton_lengths
-
-try:
-    import graph_tool  # noqa
-    _have_graph_tool = True
-except ImportError:
-    _have_graph_tool = False
-if _have_graph_tool:
-    from .split_merge import split_graph
+from .skeleton_rand_voi import skeleton_rand_voi
+
+# all other names are imported from their module on first access, such that
+# scipy, networkx, and graph_tool are only loaded when needed
+_lazy_imports = {
+    'BlockReader': 'blocks',
+    'evaluate_blockwise': 'blocks',
+    'detection_scores': 'detection',
+    'DetectionEvaluator': 'detection',
+    'get_node_segment_lut': 'node_lut',
+    'CallStats': 'profiling',
+    'collect_stats': 'profiling',
+    'expected_run_length': 'run_length',
+    'expected_run_length_sweep': 'run_length',
+    'expected_run_length_bootstrap': 'run_length',
+    'expected_run_length_curve': 'run_length',
+    'IncrementalRunLength': 'run_length',
+    'evaluate_skeletons': 'run_length',
+    'evaluate_skeleton_arrays': 'run_length',
+    'get_skeleton_lengths': 'run_length',
+    'SkeletonArrays': 'skeletons',
+    'split_graph': 'split_merge',
+    'split_graph_arrays': 'split_merge',
+    '_have_graph_tool': 'split_merge'
+}
 
 __all__ = [
-    detection_scores,
-    rand_voi,
-    expected_run_length,
-    evaluate_skeletons,
-    get_skeleton_lengths
+    'detection_scores',
+    'DetectionEvaluator',
+    'rand_voi',
+    'edit_counts',
+    'expected_run_length',
+    'expected_run_length_sweep',
+    'expected_run_length_bootstrap',
+    'expected_run_length_curve',
+    'IncrementalRunLength',
+    'evaluate_skeletons',
+    'evaluate_skeleton_arrays',
+    'get_skeleton_lengths',
+    'skeleton_rand_voi',
+    'SkeletonArrays',
+    'get_node_segment_lut',
+    'BlockReader',
+    'evaluate_blockwise',
+    'CallStats',
+    'collect_stats',
+    'split_graph',
+    'split_graph_arrays'
 ]
 
-if _have_graph_tool:
-    __all__.append(split_graph)
+
+def __getattr__(name):
+
+    if name not in _lazy_imports:
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, name))
+
+    module = importlib.import_module('.' + _lazy_imports[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+
+    return sorted(set(globals()) | set(_lazy_imports))
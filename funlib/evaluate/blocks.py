@@ -0,0 +1,365 @@
+from .contingency import \
+        contingency_table, \
+        edit_counts_from_contingency, \
+        merge_contingency_tables, \
+        rand_voi_from_contingency
+from .profiling import add_count, add_time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import numpy as np
+import time
+
+METRICS = ['rand_voi', 'edit_counts', 'detection']
+
+# merge contingency tables after this many blocks, to bound memory
+MERGE_INTERVAL = 64
+
+
+def get_blocks(roi, block_shape):
+    '''Split ``roi`` (a tuple of slices) into blocks of at most
+    ``block_shape``.'''
+
+    starts = [
+        range(r.start, r.stop, b)
+        for r, b in zip(roi, block_shape)
+    ]
+
+    return [
+        tuple(
+            slice(s, min(s + b, r.stop))
+            for s, b, r in zip(start, block_shape, roi))
+        for start in itertools.product(*starts)
+    ]
+
+
+class BlockReader():
+    '''Iterate over blocks of one or more arrays, reading the next blocks on
+    background threads while the current block is processed.
+
+    Iterating yields tuples ``(block, data)``, where ``data`` contains one
+    ``ndarray`` per array. Processing a block overlaps with reading the next
+    ones, as long as the processing releases the GIL (like the compiled
+    metrics and most NumPy operations on large arrays).
+
+    The time spent waiting for data and the time spent processing blocks are
+    reported as ``BlockReader.io_wait`` and ``BlockReader.compute`` to
+    :func:`collect_stats`, and kept in the attributes ``io_wait`` and
+    ``compute``.
+
+    Args:
+
+        arrays (list of array-like):
+
+            Arrays that support slicing with tuples of slices, e.g., NumPy
+            arrays, memory maps, HDF5 datasets, or Zarr arrays.
+
+        blocks (list of tuple of slice):
+
+            The blocks to read, see :func:`get_blocks`.
+
+        num_prefetch (int, optional):
+
+            How many blocks to read ahead while a block is processed. 0 reads
+            each block only when it is needed.
+
+        max_bytes (int, optional):
+
+            The maximal number of bytes of blocks read ahead. The next block
+            is always read, even if it is larger.
+
+        num_threads (int, optional):
+
+            The number of threads to read blocks with.
+    '''
+
+    def __init__(
+            self,
+            arrays,
+            blocks,
+            num_prefetch=2,
+            max_bytes=None,
+            num_threads=1):
+
+        self.arrays = list(arrays)
+        self.blocks = list(blocks)
+        self.num_prefetch = num_prefetch
+        self.max_bytes = max_bytes
+        self.num_threads = num_threads
+        self.io_wait = 0.0
+        self.compute = 0.0
+
+    def __len__(self):
+
+        return len(self.blocks)
+
+    def __iter__(self):
+
+        blocks = iter(self.blocks)
+        pending = deque()
+        pending_bytes = 0
+        next_block = next(blocks, None)
+
+        executor = ThreadPoolExecutor(self.num_threads)
+        try:
+            while next_block is not None or pending:
+
+                # read ahead up to num_prefetch blocks besides the next one
+                while (
+                        next_block is not None and
+                        len(pending) <= self.num_prefetch):
+
+                    num_bytes = self._num_bytes(next_block)
+                    if (
+                            pending and
+                            self.max_bytes is not None and
+                            pending_bytes + num_bytes > self.max_bytes):
+                        break
+
+                    pending.append((
+                        next_block,
+                        num_bytes,
+                        executor.submit(self._read, next_block)))
+                    pending_bytes += num_bytes
+                    next_block = next(blocks, None)
+
+                block, num_bytes, future = pending.popleft()
+
+                start = time.perf_counter()
+                data = future.result()
+                seconds = time.perf_counter() - start
+                self.io_wait += seconds
+                add_time('BlockReader.io_wait', seconds)
+                add_count('BlockReader.bytes_read', num_bytes)
+                pending_bytes -= num_bytes
+
+                start = time.perf_counter()
+                yield block, data
+                seconds = time.perf_counter() - start
+                self.compute += seconds
+                add_time('BlockReader.compute', seconds)
+
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _read(self, block):
+
+        return tuple(np.asarray(array[block]) for array in self.arrays)
+
+    def _num_bytes(self, block):
+
+        size = int(np.prod([b.stop - b.start for b in block]))
+        return sum(size*np.dtype(a.dtype).itemsize for a in self.arrays)
+
+
+def block_statistics(truth, test, metrics, offset=None):
+    '''Collect the statistics of one block that are needed to compute
+    ``metrics`` with :class:`BlockwiseEvaluation`.'''
+
+    statistics = {}
+
+    if 'rand_voi' in metrics or 'edit_counts' in metrics:
+        statistics['contingency'] = contingency_table(truth, test)
+
+    if 'detection' in metrics:
+        # detection needs scipy, which is only loaded when used
+        from .detection import component_statistics
+        statistics['detection'] = component_statistics(
+            truth,
+            test,
+            offset=offset)
+
+    return statistics
+
+
+class BlockwiseEvaluation():
+    '''Combine the statistics of blocks of a volume, such that metrics can be
+    computed for the whole volume.
+
+    Args:
+
+        metrics (list of string):
+
+            The metrics to compute: ``'rand_voi'`` (see :func:`rand_voi`),
+            ``'edit_counts'`` (see :func:`edit_counts`), and ``'detection'``
+            (see :func:`detection_scores`, for arrays of components).
+    '''
+
+    def __init__(self, metrics):
+
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError("Unknown metric %s" % metric)
+
+        self.metrics = list(metrics)
+        self.tables = []
+        self.statistics = None
+
+    def add_block(self, truth, test, offset=None):
+        '''Add the statistics of a block with the given offset (in voxels) in
+        the volume.'''
+
+        self.add_statistics(
+            block_statistics(truth, test, self.metrics, offset))
+
+    def add_statistics(self, statistics):
+        '''Add the statistics of a block as returned by
+        :func:`block_statistics`.'''
+
+        if 'contingency' in statistics:
+            self.tables.append(statistics['contingency'])
+            if len(self.tables) >= MERGE_INTERVAL:
+                self.tables = [merge_contingency_tables(self.tables)]
+
+        if 'detection' in statistics:
+            from .detection import \
+                    add_component_statistics, \
+                    merge_component_statistics
+            if self.statistics is None:
+                self.statistics = merge_component_statistics([])
+            add_component_statistics(self.statistics, statistics['detection'])
+
+    def scores(
+            self,
+            return_cluster_scores=False,
+            min_overlap=1,
+            min_overlap_fraction=0.0,
+            matching_score='overlap',
+            matching_threshold=0,
+            voxel_size=None):
+        '''Compute the metrics on all blocks added so far.
+
+        Args:
+
+            return_cluster_scores (bool, optional):
+
+                See :func:`rand_voi`.
+
+            min_overlap, min_overlap_fraction (optional):
+
+                See :func:`edit_counts`.
+
+            matching_score, matching_threshold, voxel_size (optional):
+
+                See :func:`detection_scores`.
+
+        Returns:
+
+            A dictionary with the scores of each metric.
+        '''
+
+        scores = {}
+
+        table = merge_contingency_tables(self.tables)
+        self.tables = [table]
+        if 'rand_voi' in self.metrics:
+            scores['rand_voi'] = rand_voi_from_contingency(
+                *table,
+                return_cluster_scores=return_cluster_scores)
+        if 'edit_counts' in self.metrics:
+            scores['edit_counts'] = edit_counts_from_contingency(
+                *table,
+                min_overlap=min_overlap,
+                min_overlap_fraction=min_overlap_fraction)
+
+        if 'detection' in self.metrics:
+            from .detection import \
+                    DetectionEvaluator, \
+                    merge_component_statistics
+            if self.statistics is None:
+                self.statistics = merge_component_statistics([])
+            scores['detection'] = DetectionEvaluator.from_statistics(
+                **self.statistics,
+                matching_score=matching_score,
+                matching_threshold=matching_threshold,
+                voxel_size=voxel_size).scores()
+
+        return scores
+
+
+def evaluate_blockwise(
+        truth,
+        test,
+        metrics,
+        roi=None,
+        mask=None,
+        block_shape=None,
+        num_prefetch=2,
+        max_bytes=None,
+        **kwargs):
+    '''Evaluate ``test`` against ``truth`` block-wise, reading the next
+    blocks while the current one is processed. The results are the same as
+    for the whole volume in memory. Detection scores are the same as those of
+    :class:`DetectionEvaluator`, :func:`detection_scores` can choose a
+    different matching with the same score if there are ties.
+
+    Args:
+
+        truth, test (array-like):
+
+            The volumes to compare, e.g., NumPy arrays, memory maps, HDF5
+            datasets, or Zarr arrays.
+
+        metrics (list of string):
+
+            The metrics to compute, see :class:`BlockwiseEvaluation`.
+
+        roi (tuple of slice, optional):
+
+            The region to evaluate, in voxels. Defaults to the whole volume.
+
+        mask (array-like, optional):
+
+            Locations where the mask is 0 are ignored.
+
+        block_shape (tuple of int, optional):
+
+            The shape of the blocks to process at once. Defaults to 256
+            voxels in each dimension.
+
+        num_prefetch, max_bytes (optional):
+
+            See :class:`BlockReader`.
+
+        kwargs:
+
+            Passed on to :meth:`BlockwiseEvaluation.scores`.
+
+    Returns:
+
+        A dictionary with the scores of each metric.
+    '''
+
+    assert truth.shape == test.shape, (
+        "shapes between truth and test don't match")
+
+    if roi is None:
+        roi = tuple(slice(0, s) for s in truth.shape)
+    if block_shape is None:
+        block_shape = (256,)*len(truth.shape)
+
+    evaluation = BlockwiseEvaluation(metrics)
+
+    arrays = [truth, test] + ([mask] if mask is not None else [])
+    reader = BlockReader(
+        arrays,
+        get_blocks(roi, block_shape),
+        num_prefetch=num_prefetch,
+        max_bytes=max_bytes)
+
+    for block, data in reader:
+
+        truth_block, test_block = data[:2]
+        if mask is not None:
+            block_mask = data[2] > 0
+            truth_block = np.where(block_mask, truth_block, 0)
+            test_block = np.where(block_mask, test_block, 0)
+
+        evaluation.add_block(
+            truth_block,
+            test_block,
+            offset=tuple(b.start for b in block))
+
+    return evaluation.scores(**kwargs)
@@ -3,23 +3,26 @@ from libcpp cimport bool
 from libcpp.map cimport map as cpp_map
 import numpy as np
 cimport numpy as np
+from .profiling import add_count, contiguous
 
 def find_centers_cpp(np.ndarray[uint64_t, ndim=3] labels):
 
-    # the C++ part assumes contiguous memory, make sure we have it (and do 
+    # the C++ part assumes contiguous memory, make sure we have it (and do
     # nothing, if we do)
-    if not labels.flags['C_CONTIGUOUS']:
-        print("Creating memory-contiguous label arrray (avoid this by passing C_CONTIGUOUS arrays)")
-        labels = np.ascontiguousarray(labels)
+    labels = contiguous(labels, 'find_centers')
+    add_count('find_centers.voxels', labels.size)
 
     cdef uint64_t* labels_data
     labels_data = <uint64_t*>labels.data
+    cdef size_t size_z = labels.shape[0]
+    cdef size_t size_y = labels.shape[1]
+    cdef size_t size_x = labels.shape[2]
+    cdef cpp_map[uint64_t, Center] result
 
-    return centers(
-        labels.shape[0],
-        labels.shape[1],
-        labels.shape[2],
-        labels_data)
+    with nogil:
+        result = centers(size_z, size_y, size_x, labels_data)
+
+    return result
 
 cdef extern from "impl/centers.hpp":
 
@@ -32,5 +35,5 @@ cdef extern from "impl/centers.hpp":
             size_t size_z,
             size_t size_y,
             size_t size_x,
-            const uint64_t* labels);
+            const uint64_t* labels) nogil
 
@@ -0,0 +1,358 @@
+'''Command-line evaluation of large volumes, processed block-wise by a pool of
+worker processes (or by one process that reads ahead)::
+
+    funlib-evaluate truth.zarr:labels test.h5:volumes/segmentation \\
+        --metrics rand_voi edit_counts detection \\
+        --roi 0:512,0:1024,0:1024 --num-workers 8 --output scores.json
+'''
+from .blocks import \
+        METRICS, \
+        BlockwiseEvaluation, \
+        block_statistics, \
+        evaluate_blockwise, \
+        get_blocks
+from .profiling import collect_stats
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
+import json
+import numpy as np
+import os
+import sys
+
+
+def open_array(path, shape=None, dtype=None):
+    '''Open an array for reading.
+
+    Args:
+
+        path (string):
+
+            ``<file>.h5:<dataset>`` (also ``.hdf`` and ``.hdf5``) for HDF5
+            datasets, ``<container>.zarr:<dataset>`` or ``<array>.zarr`` for
+            Zarr arrays (also ``.n5``), a ``.npy`` file, or any other file
+            with raw data. ``.npy`` and raw files are memory-mapped.
+
+        shape (tuple of int, optional):
+        dtype (string, optional):
+
+            The shape and data type of raw files.
+    '''
+
+    filename, _, dataset = path.partition(':')
+    extension = os.path.splitext(filename.rstrip('/'))[1].lower()
+
+    if extension in ['.h5', '.hdf', '.hdf5']:
+        import h5py
+        return h5py.File(filename, 'r')[dataset]
+
+    if extension in ['.zarr', '.n5']:
+        import zarr
+        array = zarr.open(filename, mode='r')
+        return array[dataset] if dataset else array
+
+    if extension == '.npy':
+        return np.load(filename, mmap_mode='r')
+
+    if shape is None or dtype is None:
+        raise ValueError(
+            "Shape and dtype are needed to read raw file %s" % filename)
+
+    return np.memmap(filename, dtype=dtype, mode='r', shape=tuple(shape))
+
+
+_open_arrays = {}
+
+
+def _open_cached(path, shape, dtype):
+
+    key = (path, shape, dtype)
+    if key not in _open_arrays:
+        _open_arrays[key] = open_array(path, shape, dtype)
+
+    return _open_arrays[key]
+
+
+def evaluate_block(config, block):
+    '''Collect the statistics of one block that are needed for the metrics
+    in ``config``.'''
+
+    raw = (config['shape'], config['dtype'])
+    truth = np.asarray(_open_cached(config['truth'], *raw)[block])
+    test = np.asarray(_open_cached(config['test'], *raw)[block])
+
+    if config['mask'] is not None:
+        mask = np.asarray(_open_cached(config['mask'], *raw)[block]) > 0
+        truth = np.where(mask, truth, 0)
+        test = np.where(mask, test, 0)
+
+    return block_statistics(
+        truth,
+        test,
+        config['metrics'],
+        offset=tuple(b.start for b in block))
+
+
+def evaluate_volume(
+        truth,
+        test,
+        metrics,
+        roi=None,
+        mask=None,
+        block_shape=None,
+        num_workers=1,
+        num_prefetch=2,
+        max_bytes=None,
+        shape=None,
+        dtype=None,
+        return_cluster_scores=False,
+        min_overlap=1,
+        min_overlap_fraction=0.0,
+        matching_score='overlap',
+        matching_threshold=0,
+        voxel_size=None):
+    '''Evaluate a test volume against a truth volume block-wise.
+
+    Each block is read and reduced to label statistics (a contingency table
+    and per-component sizes, centers, and overlaps), either by a pool of
+    worker processes or, with a single worker, in this process while the next
+    blocks are read in the background (see :class:`BlockReader`). The
+    statistics of all blocks are combined to compute the metrics on the whole
+    volume, the results are the same as for the whole volume in memory.
+    Detection scores are the same as those of :class:`DetectionEvaluator`,
+    :func:`detection_scores` can choose a different matching with the same
+    score if there are ties.
+
+    Args:
+
+        truth, test, mask (string):
+
+            Paths to the arrays, see :func:`open_array`. Locations where the
+            mask is 0 are ignored.
+
+        metrics (list of string):
+
+            The metrics to compute, see :class:`BlockwiseEvaluation`.
+
+        roi (tuple of slice, optional):
+
+            The region to evaluate, in voxels. Defaults to the whole volume.
+
+        block_shape (tuple of int, optional):
+
+            The shape of the blocks to process at once. Defaults to 256
+            voxels in each dimension.
+
+        num_workers (int, optional):
+
+            The number of worker processes.
+
+        num_prefetch, max_bytes (optional):
+
+            How many blocks to read ahead, and the maximal number of bytes to
+            read ahead, with a single worker. See :class:`BlockReader`.
+
+        shape, dtype (optional):
+
+            The shape and data type of raw files.
+
+        return_cluster_scores (bool, optional):
+
+            See :func:`rand_voi`.
+
+        min_overlap, min_overlap_fraction (optional):
+
+            See :func:`edit_counts`.
+
+        matching_score, matching_threshold, voxel_size (optional):
+
+            See :func:`detection_scores`.
+
+    Returns:
+
+        A dictionary with the scores of each metric.
+    '''
+
+    scores_args = {
+        'return_cluster_scores': return_cluster_scores,
+        'min_overlap': min_overlap,
+        'min_overlap_fraction': min_overlap_fraction,
+        'matching_score': matching_score,
+        'matching_threshold': matching_threshold,
+        'voxel_size': voxel_size
+    }
+
+    shape = tuple(shape) if shape is not None else None
+    volume_shape = _open_cached(truth, shape, dtype).shape
+    if roi is None:
+        roi = tuple(slice(0, s) for s in volume_shape)
+    if block_shape is None:
+        block_shape = (256,)*len(volume_shape)
+
+    if num_workers <= 1:
+        return evaluate_blockwise(
+            _open_cached(truth, shape, dtype),
+            _open_cached(test, shape, dtype),
+            metrics,
+            roi=roi,
+            mask=_open_cached(mask, shape, dtype) if mask else None,
+            block_shape=block_shape,
+            num_prefetch=num_prefetch,
+            max_bytes=max_bytes,
+            **scores_args)
+
+    evaluation = BlockwiseEvaluation(metrics)
+    config = {
+        'truth': truth,
+        'test': test,
+        'mask': mask,
+        'shape': shape,
+        'dtype': dtype,
+        'metrics': list(metrics)
+    }
+
+    with ProcessPoolExecutor(num_workers) as executor:
+        for statistics in executor.map(
+                partial(evaluate_block, config),
+                get_blocks(roi, block_shape)):
+            evaluation.add_statistics(statistics)
+
+    return evaluation.scores(**scores_args)
+
+
+def parse_roi(roi):
+    '''Parse a ROI given as ``begin:end,begin:end,...``.'''
+
+    return tuple(
+        slice(*(int(x) for x in r.split(':')))
+        for r in roi.split(','))
+
+
+def parse_shape(shape):
+
+    return tuple(int(x) for x in shape.split(','))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        prog='funlib-evaluate',
+        description=(
+            "Evaluate a test volume against a truth volume block-wise and "
+            "write the scores as JSON. Arrays are given as "
+            "<file>.h5:<dataset>, <container>.zarr:<dataset>, .npy files, or "
+            "raw files (with --shape and --dtype)."))
+    parser.add_argument('truth', help="the truth array")
+    parser.add_argument('test', help="the test array")
+    parser.add_argument(
+        '--metrics',
+        nargs='+',
+        choices=METRICS,
+        default=['rand_voi'],
+        help="the metrics to compute")
+    parser.add_argument(
+        '--roi',
+        type=parse_roi,
+        help="the region to evaluate, as begin:end,begin:end,... in voxels")
+    parser.add_argument(
+        '--mask',
+        help="an array, locations where it is 0 are ignored")
+    parser.add_argument(
+        '--block-shape',
+        type=parse_shape,
+        help="the shape of blocks to process at once, as z,y,x")
+    parser.add_argument(
+        '--num-workers',
+        type=int,
+        default=1,
+        help="the number of worker processes")
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=2,
+        help="the number of blocks to read ahead with a single worker")
+    parser.add_argument(
+        '--prefetch-memory',
+        type=int,
+        help="the maximal number of MiB to read ahead with a single worker")
+    parser.add_argument(
+        '--shape',
+        type=parse_shape,
+        help="the shape of raw arrays")
+    parser.add_argument('--dtype', help="the data type of raw arrays")
+    parser.add_argument(
+        '--min-overlap',
+        type=int,
+        default=1,
+        help="ignore smaller overlaps for edit_counts")
+    parser.add_argument(
+        '--min-overlap-fraction',
+        type=float,
+        default=0.0,
+        help="ignore overlaps covering less of a segment for edit_counts")
+    parser.add_argument(
+        '--matching-score',
+        choices=['overlap', 'iou', 'distance'],
+        default='overlap',
+        help="the score to match components with for detection")
+    parser.add_argument(
+        '--matching-threshold',
+        type=float,
+        default=0,
+        help="the score threshold for matches for detection")
+    parser.add_argument(
+        '--voxel-size',
+        type=parse_shape,
+        help="the voxel size for distances between components, as z,y,x")
+    parser.add_argument(
+        '--output',
+        help="the JSON file to write to, defaults to stdout")
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help=(
+            "add timings and counters (e.g., time spent waiting for blocks "
+            "to be read) to the output"))
+
+    args = parser.parse_args(argv)
+
+    max_bytes = None
+    if args.prefetch_memory is not None:
+        max_bytes = args.prefetch_memory*2**20
+
+    with collect_stats() as stats:
+        scores = evaluate_volume(
+            args.truth,
+            args.test,
+            args.metrics,
+            roi=args.roi,
+            mask=args.mask,
+            block_shape=args.block_shape,
+            num_workers=args.num_workers,
+            num_prefetch=args.prefetch,
+            max_bytes=max_bytes,
+            shape=args.shape,
+            dtype=args.dtype,
+            min_overlap=args.min_overlap,
+            min_overlap_fraction=args.min_overlap_fraction,
+            matching_score=args.matching_score,
+            matching_threshold=args.matching_threshold,
+            voxel_size=args.voxel_size)
+
+    if args.profile:
+        scores['stats'] = stats.to_dict()
+
+    output = json.dumps(
+        scores,
+        indent=2,
+        default=lambda value: value.item())
+
+    if args.output is None:
+        sys.stdout.write(output + '\n')
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
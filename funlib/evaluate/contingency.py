@@ -0,0 +1,110 @@
+from .edit_counts import edit_counts
+from .rand_voi import rand_voi
+import numpy as np
+
+
+def contingency_table(truth, test):
+    '''Count the co-occurrences of labels in ``truth`` and ``test``.
+    Locations with label 0 in ``truth`` are ignored.
+
+    Tables of different parts of a volume can be combined with
+    :func:`merge_contingency_tables`.
+
+    Args:
+
+        truth, test (ndarray):
+
+            Label arrays of the same shape.
+
+    Returns:
+
+        Tuple ``(truth_ids, test_ids, counts)`` of arrays with one entry per
+        pair of co-occurring labels.
+    '''
+
+    assert truth.shape == test.shape, (
+        "shapes between truth and test don't match")
+
+    truth = np.ravel(truth)
+    test = np.ravel(test)
+    foreground = truth > 0
+
+    return group_pairs(
+        truth[foreground],
+        test[foreground],
+        np.ones((np.count_nonzero(foreground),), dtype=np.uint64))
+
+
+def merge_contingency_tables(tables):
+    '''Combine contingency tables as returned by :func:`contingency_table`
+    into one, summing the counts of pairs that occur in several tables.'''
+
+    tables = list(tables)
+    if not tables:
+        return (
+            np.zeros((0,), dtype=np.uint64),
+            np.zeros((0,), dtype=np.uint64),
+            np.zeros((0,), dtype=np.uint64))
+
+    return group_pairs(*(
+        np.concatenate(column)
+        for column in zip(*tables)))
+
+
+def group_pairs(a, b, counts):
+    '''Sum ``counts`` of equal ``(a, b)`` pairs.'''
+
+    a_ids, a_inverse = np.unique(a, return_inverse=True)
+    b_ids, b_inverse = np.unique(b, return_inverse=True)
+
+    keys = a_inverse.astype(np.int64)*len(b_ids) + b_inverse
+    keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=counts, minlength=len(keys))
+
+    return (
+        a_ids[keys//max(len(b_ids), 1)],
+        b_ids[keys % max(len(b_ids), 1)],
+        np.round(counts).astype(np.uint64))
+
+
+def rand_voi_from_contingency(
+        truth_ids,
+        test_ids,
+        counts,
+        return_cluster_scores=False):
+    '''Compute the scores of :func:`rand_voi` from a contingency table, by
+    passing each pair of labels weighted by its count to :func:`rand_voi`.
+
+    Returns:
+
+        The same dictionary as :func:`rand_voi`.
+    '''
+
+    return rand_voi(
+        np.asarray(truth_ids, dtype=np.uint64),
+        np.asarray(test_ids, dtype=np.uint64),
+        return_cluster_scores=return_cluster_scores,
+        weights=np.asarray(counts, dtype=np.float64))
+
+
+def edit_counts_from_contingency(
+        truth_ids,
+        test_ids,
+        counts,
+        min_overlap=1,
+        min_overlap_fraction=0.0):
+    '''Compute the scores of :func:`edit_counts` from a contingency table, by
+    passing each pair of labels weighted by its count to
+    :func:`edit_counts`.
+
+    Returns:
+
+        A dictionary with the keys ``splits``, ``merges``, and ``total``.
+    '''
+
+    return edit_counts(
+        np.asarray(truth_ids, dtype=np.uint64),
+        np.asarray(test_ids, dtype=np.uint64),
+        min_overlap=min_overlap,
+        min_overlap_fraction=min_overlap_fraction,
+        weights=np.asarray(counts, dtype=np.uint64))
@@ -2,6 +2,7 @@ import numpy as np
 import scipy.ndimage
 import scipy.optimize
 from .centers import find_centers_cpp
+from .profiling import add_count, timer
 
 
 def detection_scores(
@@ -151,38 +152,42 @@ def evaluate_components(
     dims = len(test_components.shape)
 
     # get sizes
-    test_ids, test_counts = np.unique(
-        test_components[test_components > 0].ravel(),
-        return_counts=True)
-    true_ids, true_counts = np.unique(
-        true_components[true_components > 0].ravel(),
-        return_counts=True)
-    test_sizes = {i: c for i, c in zip(test_ids, test_counts)}
-    true_sizes = {i: c for i, c in zip(true_ids, true_counts)}
-    n_test = int(test_components.max())
-    n_true = int(true_components.max())
+    add_count('detection_scores.voxels', test_components.size)
+    with timer('detection_scores.sizes'):
+        test_ids, test_counts = np.unique(
+            test_components[test_components > 0].ravel(),
+            return_counts=True)
+        true_ids, true_counts = np.unique(
+            true_components[true_components > 0].ravel(),
+            return_counts=True)
+        test_sizes = {i: c for i, c in zip(test_ids, test_counts)}
+        true_sizes = {i: c for i, c in zip(true_ids, true_counts)}
+        n_test = int(test_components.max())
+        n_true = int(true_components.max())
 
     # get centers
-    test_centers = find_centers(test_components, test_ids)
-    true_centers = find_centers(true_components, true_ids)
-    if voxel_size is not None:
-        if n_test > 0:
-            test_centers *= voxel_size
-        if n_true > 0:
-            true_centers *= voxel_size
+    with timer('detection_scores.centers'):
+        test_centers = find_centers(test_components, test_ids)
+        true_centers = find_centers(true_components, true_ids)
+        if voxel_size is not None:
+            if n_test > 0:
+                test_centers *= voxel_size
+            if n_true > 0:
+                true_centers *= voxel_size
 
     # get pairs and count of shared elements (excluding background 0)
-    both_fg_mask = np.logical_and(test_components > 0, true_components > 0)
-    both_fg_test = test_components[both_fg_mask].ravel()
-    both_fg_true = true_components[both_fg_mask].ravel()
-    if both_fg_true.size > 0:
-        pairs, counts = np.unique(
-            np.array([both_fg_test, both_fg_true]),
-            axis=1,
-            return_counts=True)
-    else:
-        pairs = np.array([[], []], dtype=test_components.dtype)
-        counts = np.array([], dtype=np.int32)
+    with timer('detection_scores.overlaps'):
+        both_fg_mask = np.logical_and(test_components > 0, true_components > 0)
+        both_fg_test = test_components[both_fg_mask].ravel()
+        both_fg_true = true_components[both_fg_mask].ravel()
+        if both_fg_true.size > 0:
+            pairs, counts = np.unique(
+                np.array([both_fg_test, both_fg_true]),
+                axis=1,
+                return_counts=True)
+        else:
+            pairs = np.array([[], []], dtype=test_components.dtype)
+            counts = np.array([], dtype=np.int32)
 
     # get IoUs (for overlapping components, in matrix form)
     ious = np.zeros(
@@ -225,24 +230,13 @@ def evaluate_components(
     else:
         raise RuntimeError(f"Unknown matching score {matching_score}")
 
-    matches = scipy.optimize.linear_sum_assignment(
-        scores,
-        maximize=maximize)
-
-    rel = {
-        'overlap': np.greater_equal,
-        'iou': np.greater_equal,
-        'distance': np.less_equal
-    }[matching_score]
-
-    # filter matches
-    matches = [
-        (test_id, true_id)
-        for test_id, true_id in zip(matches[0], matches[1])
-        if rel(scores[test_id, true_id], matching_threshold)
-        and test_id > 0
-        and true_id > 0
-    ]
+    add_count('detection_scores.components', n_test + n_true)
+    with timer('detection_scores.matching'):
+        matches = find_matches(
+            scores,
+            maximize,
+            matching_score,
+            matching_threshold)
 
     tp = len(matches)
     fp = n_test - tp
@@ -279,6 +273,31 @@ def evaluate_components(
     return detection_scores
 
 
+def find_matches(scores, maximize, matching_score, matching_threshold):
+    '''Solve the assignment problem on a (test x truth) score matrix and
+    return the matched pairs that pass ``matching_threshold``. Row and column
+    0 are reserved for background and never reported.'''
+
+    matches = scipy.optimize.linear_sum_assignment(
+        scores,
+        maximize=maximize)
+
+    rel = {
+        'overlap': np.greater_equal,
+        'iou': np.greater_equal,
+        'distance': np.less_equal
+    }[matching_score]
+
+    # filter matches
+    return [
+        (test_id, true_id)
+        for test_id, true_id in zip(matches[0], matches[1])
+        if rel(scores[test_id, true_id], matching_threshold)
+        and test_id > 0
+        and true_id > 0
+    ]
+
+
 def find_centers_scipy(components, ids):
     return np.array(scipy.ndimage.measurements.center_of_mass(
             np.ones_like(components),
@@ -299,3 +318,586 @@ def find_centers(components, ids):
     else:
 
         return find_centers_scipy(components, ids)
+
+
+class DetectionEvaluator:
+    '''Keeps the component statistics and the overlap table between ``truth``
+    and ``test`` components, such that detection scores can be updated after
+    local edits of ``test`` without re-scanning and re-matching the whole
+    volume.
+
+    An update only recomputes the statistics of the components that changed
+    and the matching subproblems these components belong to. A matching
+    subproblem is a connected component of the bipartite graph of overlapping
+    test and truth components. For the `overlap` and `iou` matching scores
+    with a positive ``matching_threshold``, components that do not overlap
+    can never be matched, and solving the subproblems independently gives
+    the same result as one global matching (up to ties). For the `distance`
+    score or a threshold of 0, every pair of components can be matched and
+    the global matching is solved again from the cached statistics after
+    each update.
+
+    Args:
+
+        truth (ndarray):
+
+            Array of true components.
+
+        test (ndarray):
+
+            Array of predicted components. A copy of this array is kept and
+            modified by :meth:`update`.
+
+        matching_score (string, optional):
+        matching_threshold (float, optional):
+        voxel_size (tuple of int, optional):
+
+            See :func:`detection_scores`.
+    '''
+
+    def __init__(
+            self,
+            truth,
+            test,
+            matching_score='overlap',
+            matching_threshold=0,
+            voxel_size=None):
+
+        assert truth.shape == test.shape, (
+            "shapes between truth and test don't match")
+
+        self._setup(
+            truth,
+            np.array(test),
+            matching_score,
+            matching_threshold,
+            voxel_size)
+
+        coordinates = np.nonzero(truth)
+        add_statistics(
+            self.true_sizes,
+            self.true_sums,
+            truth[coordinates],
+            coordinates,
+            1)
+
+        coordinates = np.nonzero(self.test)
+        self._update_statistics(
+            self.test[coordinates],
+            truth[coordinates],
+            coordinates,
+            1)
+
+        self._setup_matching()
+
+    @classmethod
+    def from_statistics(
+            cls,
+            true_sizes,
+            true_sums,
+            test_sizes,
+            test_sums,
+            overlaps,
+            matching_score='overlap',
+            matching_threshold=0,
+            voxel_size=None):
+        '''Create an evaluator from component statistics that were collected
+        elsewhere, e.g., block-wise with :func:`component_statistics`. Such an
+        evaluator can not be updated and does not return component arrays.
+
+        Args:
+
+            true_sizes, test_sizes (dict):
+
+                The number of voxels of each component.
+
+            true_sums, test_sums (dict):
+
+                The sum of the voxel coordinates of each component.
+
+            overlaps (dict):
+
+                The number of voxels shared by each pair ``(test_id,
+                true_id)`` of components.
+
+            matching_score (string, optional):
+            matching_threshold (float, optional):
+            voxel_size (tuple of int, optional):
+
+                See :func:`detection_scores`.
+        '''
+
+        evaluator = cls.__new__(cls)
+        evaluator._setup(
+            None,
+            None,
+            matching_score,
+            matching_threshold,
+            voxel_size)
+
+        evaluator.true_sizes.update(true_sizes)
+        evaluator.true_sums.update(true_sums)
+        evaluator.test_sizes.update(test_sizes)
+        evaluator.test_sums.update(test_sums)
+        for (test_id, true_id), count in overlaps.items():
+            if count > 0:
+                evaluator.overlaps[(test_id, true_id)] = count
+                evaluator.test_neighbors.setdefault(
+                    test_id, set()).add(true_id)
+                evaluator.true_neighbors.setdefault(
+                    true_id, set()).add(test_id)
+
+        evaluator._setup_matching()
+
+        return evaluator
+
+    def _setup(
+            self,
+            truth,
+            test,
+            matching_score,
+            matching_threshold,
+            voxel_size):
+
+        if matching_score not in ['overlap', 'iou', 'distance']:
+            raise RuntimeError(f"Unknown matching score {matching_score}")
+
+        self.truth = truth
+        self.test = test
+        self.matching_score = matching_score
+        self.matching_threshold = matching_threshold
+        self.voxel_size = voxel_size
+        self.decomposable = (
+            matching_score != 'distance' and matching_threshold > 0)
+
+        # component sizes and sums of voxel coordinates (for centers)
+        self.test_sizes = {}
+        self.test_sums = {}
+        self.true_sizes = {}
+        self.true_sums = {}
+
+        # (test_id, true_id) -> number of shared voxels, and adjacency of the
+        # bipartite overlap graph
+        self.overlaps = {}
+        self.test_neighbors = {}
+        self.true_neighbors = {}
+
+    def _setup_matching(self):
+
+        # matching subproblems: key -> (test IDs, truth IDs, matches, sum of
+        # distances, sum of IoUs)
+        self.subproblems = {}
+        self.test_subproblem = {}
+        self.true_subproblem = {}
+        self.next_subproblem = 0
+        self.tp = 0
+        self.sum_distance = 0.0
+        self.sum_iou = 0.0
+
+        self._rematch(set(self.test_sizes), set(self.true_sizes))
+
+    def update(self, roi, test_block):
+        '''Replace the content of ``test`` in ``roi`` with ``test_block`` and
+        update the scores.
+
+        Args:
+
+            roi (tuple of slice):
+
+                The region of ``test`` to replace.
+
+            test_block (ndarray):
+
+                The new content of ``test`` in ``roi``.
+        '''
+
+        if self.test is None:
+            raise RuntimeError(
+                "DetectionEvaluator created from statistics can not be "
+                "updated")
+
+        roi = tuple(roi)
+        old_block = self.test[roi]
+
+        assert old_block.shape == test_block.shape, (
+            "shape of test_block does not match roi")
+
+        changed = old_block != test_block
+        if not changed.any():
+            return
+        add_count(
+            'DetectionEvaluator.changed_voxels',
+            np.count_nonzero(changed))
+
+        coordinates = tuple(
+            c + (s.start or 0)
+            for c, s in zip(np.nonzero(changed), roi))
+        true_values = self.truth[roi][changed]
+
+        touched_test = self._update_statistics(
+            old_block[changed],
+            true_values,
+            coordinates,
+            -1)
+        touched_test |= self._update_statistics(
+            test_block[changed],
+            true_values,
+            coordinates,
+            1)
+        touched_true = set(true_values[true_values > 0].tolist())
+
+        self.test[roi] = test_block
+
+        with timer('DetectionEvaluator.rematch'):
+            self._rematch(touched_test, touched_true)
+
+    def scores(self, return_matches=False):
+        '''Get the current detection scores, in the same format as returned
+        by :func:`detection_scores` without ``label_ids``.'''
+
+        tp = self.tp
+
+        detection_scores = {
+            'tp': tp,
+            'fp': len(self.test_sizes) - tp,
+            'fn': len(self.true_sizes) - tp,
+            'avg_distance': self.sum_distance/tp if tp > 0 else 0,
+            'avg_iou': self.sum_iou/tp if tp > 0 else 0
+        }
+
+        if return_matches:
+
+            detection_scores['matches'] = [
+                match
+                for subproblem in self.subproblems.values()
+                for match in subproblem[2]
+            ]
+            detection_scores['components_truth'] = self.truth
+            detection_scores['components_test'] = self.test
+
+        return detection_scores
+
+    def _update_statistics(self, test_values, true_values, coordinates, sign):
+
+        touched = add_statistics(
+            self.test_sizes,
+            self.test_sums,
+            test_values,
+            coordinates,
+            sign)
+
+        both_fg = np.logical_and(test_values > 0, true_values > 0)
+        if not both_fg.any():
+            return touched
+
+        pairs, counts = np.unique(
+            np.array([test_values[both_fg], true_values[both_fg]]),
+            axis=1,
+            return_counts=True)
+
+        for test_id, true_id, count in zip(
+                pairs[0].tolist(),
+                pairs[1].tolist(),
+                counts.tolist()):
+
+            pair = (test_id, true_id)
+            count = self.overlaps.get(pair, 0) + sign*count
+
+            if count > 0:
+                self.overlaps[pair] = count
+                self.test_neighbors.setdefault(test_id, set()).add(true_id)
+                self.true_neighbors.setdefault(true_id, set()).add(test_id)
+            else:
+                del self.overlaps[pair]
+                self.test_neighbors[test_id].discard(true_id)
+                self.true_neighbors[true_id].discard(test_id)
+
+        return touched
+
+    def _rematch(self, touched_test, touched_true):
+
+        if not self.decomposable:
+
+            self._remove_subproblems(list(self.subproblems.keys()))
+            self._add_subproblem(
+                list(self.test_sizes.keys()),
+                list(self.true_sizes.keys()))
+            return
+
+        keys = set(
+            self.test_subproblem[i]
+            for i in touched_test
+            if i in self.test_subproblem)
+        keys |= set(
+            self.true_subproblem[j]
+            for j in touched_true
+            if j in self.true_subproblem)
+
+        # all members of affected subproblems need to be re-grouped, since
+        # the subproblems might have been split or joined
+        seeds = set(touched_test)
+        for key in keys:
+            seeds.update(self.subproblems[key][0])
+        self._remove_subproblems(keys)
+
+        visited = set()
+        for seed in seeds:
+
+            if seed in visited or seed not in self.test_sizes:
+                continue
+
+            # breadth-first search in the bipartite overlap graph
+            test_ids = [seed]
+            true_ids = []
+            visited.add(seed)
+            visited_true = set()
+            queue = [seed]
+            while queue:
+                test_id = queue.pop()
+                for true_id in self.test_neighbors.get(test_id, ()):
+                    if true_id in visited_true:
+                        continue
+                    visited_true.add(true_id)
+                    true_ids.append(true_id)
+                    for i in self.true_neighbors[true_id]:
+                        if i not in visited:
+                            visited.add(i)
+                            test_ids.append(i)
+                            queue.append(i)
+
+            if true_ids:
+                self._add_subproblem(test_ids, true_ids)
+
+    def _remove_subproblems(self, keys):
+
+        for key in keys:
+
+            test_ids, true_ids, matches, sum_distance, sum_iou = \
+                self.subproblems.pop(key)
+
+            self.tp -= len(matches)
+            self.sum_distance -= sum_distance
+            self.sum_iou -= sum_iou
+
+            for i in test_ids:
+                del self.test_subproblem[i]
+            for j in true_ids:
+                del self.true_subproblem[j]
+
+    def _add_subproblem(self, test_ids, true_ids):
+
+        key = self.next_subproblem
+        self.next_subproblem += 1
+
+        matches, distances, ious = self._solve(test_ids, true_ids)
+
+        sum_distance = float(np.sum(distances))
+        sum_iou = float(np.sum(ious))
+        self.subproblems[key] = (
+            test_ids,
+            true_ids,
+            matches,
+            sum_distance,
+            sum_iou)
+        self.tp += len(matches)
+        self.sum_distance += sum_distance
+        self.sum_iou += sum_iou
+
+        for i in test_ids:
+            self.test_subproblem[i] = key
+        for j in true_ids:
+            self.true_subproblem[j] = key
+
+    def _solve(self, test_ids, true_ids):
+        '''Match the given components, using local indices that start at 1
+        (0 is background, as in :func:`evaluate_components`).
+
+        Components are ordered by ID, such that ties between matchings are
+        broken the same way, no matter in which order the statistics were
+        collected (e.g., block-wise or for the whole volume).'''
+
+        test_ids = sorted(test_ids)
+        true_ids = sorted(true_ids)
+        n_test = len(test_ids)
+        n_true = len(true_ids)
+        true_index = {j: k + 1 for k, j in enumerate(true_ids)}
+
+        overlaps = np.zeros((n_test + 1, n_true + 1), dtype=np.int64)
+        ious = np.zeros((n_test + 1, n_true + 1), dtype=np.float32)
+        for k, test_id in enumerate(test_ids):
+            for true_id in self.test_neighbors.get(test_id, ()):
+                if true_id not in true_index:
+                    continue
+                c = self.overlaps[(test_id, true_id)]
+                overlaps[k + 1, true_index[true_id]] = c
+                ious[k + 1, true_index[true_id]] = c/(
+                    self.test_sizes[test_id] + self.true_sizes[true_id] - c)
+
+        distances = np.ones((n_test + 1, n_true + 1), dtype=np.float32)
+        if n_test > 0 and n_true > 0:
+            test_centers = self._centers(
+                self.test_sizes, self.test_sums, test_ids)
+            true_centers = self._centers(
+                self.true_sizes, self.true_sums, true_ids)
+            center_dists = np.sqrt(np.sum(
+                (test_centers[:, None, :] - true_centers[None, :, :])**2,
+                axis=2))
+            distances *= center_dists.max()*10
+            distances[1:, 1:] = center_dists
+
+        if self.matching_score == 'overlap':
+            scores, maximize = overlaps, True
+        elif self.matching_score == 'iou':
+            scores, maximize = ious, True
+        else:
+            scores, maximize = distances, False
+
+        local_matches = find_matches(
+            scores,
+            maximize,
+            self.matching_score,
+            self.matching_threshold)
+
+        matches = [
+            (test_ids[i - 1], true_ids[j - 1])
+            for i, j in local_matches
+        ]
+        return (
+            matches,
+            [distances[i, j] for i, j in local_matches],
+            [ious[i, j] for i, j in local_matches])
+
+    def _centers(self, sizes, sums, ids):
+
+        centers = np.array([sums[i]/sizes[i] for i in ids])
+        if self.voxel_size is not None:
+            centers *= self.voxel_size
+        return centers
+
+
+def add_statistics(sizes, sums, components, coordinates, sign):
+    '''Add (``sign=1``) or remove (``sign=-1``) the voxels of ``components``
+    at ``coordinates`` to the per-component ``sizes`` and coordinate
+    ``sums``. Returns the set of non-background component IDs that changed.
+    '''
+
+    fg = components > 0
+    ids, inverse, counts = np.unique(
+        components[fg],
+        return_inverse=True,
+        return_counts=True)
+    coordinate_sums = np.stack(
+        [
+            np.bincount(inverse, weights=c[fg], minlength=len(ids))
+            for c in coordinates
+        ],
+        axis=1)
+
+    ids = ids.tolist()
+    for i, count, coordinate_sum in zip(ids, counts, coordinate_sums):
+
+        size = sizes.get(i, 0) + sign*count
+        if size > 0:
+            sizes[i] = size
+            sums[i] = sums.get(i, 0) + sign*coordinate_sum
+        else:
+            del sizes[i]
+            del sums[i]
+
+    return set(ids)
+
+
+def component_statistics(truth, test, offset=None):
+    '''Collect the sizes, coordinate sums, and overlaps of the components in
+    ``truth`` and ``test``, as needed by
+    :meth:`DetectionEvaluator.from_statistics`.
+
+    Args:
+
+        truth, test (ndarray):
+
+            Arrays of true and predicted components, e.g., a block of a larger
+            volume.
+
+        offset (tuple of int, optional):
+
+            The offset of the arrays in the volume, in voxels. Statistics of
+            blocks of the same volume can be combined with
+            :func:`merge_component_statistics`.
+
+    Returns:
+
+        A dictionary with the keys ``true_sizes``, ``true_sums``,
+        ``test_sizes``, ``test_sums``, and ``overlaps``.
+    '''
+
+    assert truth.shape == test.shape, (
+        "shapes between truth and test don't match")
+
+    if offset is None:
+        offset = (0,)*truth.ndim
+
+    statistics = {
+        'true_sizes': {},
+        'true_sums': {},
+        'test_sizes': {},
+        'test_sums': {},
+        'overlaps': {}
+    }
+
+    for components, sizes, sums in [
+            (truth, statistics['true_sizes'], statistics['true_sums']),
+            (test, statistics['test_sizes'], statistics['test_sums'])]:
+
+        coordinates = np.nonzero(components)
+        add_statistics(
+            sizes,
+            sums,
+            components[coordinates],
+            tuple(c + o for c, o in zip(coordinates, offset)),
+            1)
+
+    both_fg = np.logical_and(truth > 0, test > 0)
+    if both_fg.any():
+        pairs, counts = np.unique(
+            np.array([test[both_fg], truth[both_fg]]),
+            axis=1,
+            return_counts=True)
+        statistics['overlaps'] = {
+            (test_id, true_id): count
+            for test_id, true_id, count in zip(
+                pairs[0].tolist(),
+                pairs[1].tolist(),
+                counts.tolist())
+        }
+
+    return statistics
+
+
+def merge_component_statistics(statistics):
+    '''Combine component statistics as returned by
+    :func:`component_statistics` into one.'''
+
+    merged = {
+        'true_sizes': {},
+        'true_sums': {},
+        'test_sizes': {},
+        'test_sums': {},
+        'overlaps': {}
+    }
+
+    for s in statistics:
+        add_component_statistics(merged, s)
+
+    return merged
+
+
+def add_component_statistics(merged, statistics):
+    '''Add component statistics as returned by :func:`component_statistics`
+    to ``merged`` in place. This takes time linear in the size of
+    ``statistics``, independent of the size of ``merged``.'''
+
+    for key, values in statistics.items():
+        target = merged[key]
+        for k, v in values.items():
+            target[k] = target[k] + v if k in target else v
@@ -0,0 +1,100 @@
+from libc.stdint cimport uint64_t
+import numpy as np
+cimport numpy as np
+from .profiling import add_count, ravel, timer
+
+def edit_counts(
+        truth,
+        test,
+        min_overlap=1,
+        min_overlap_fraction=0.0,
+        weights=None):
+    '''Estimate the number of split and merge operations needed to turn
+    `test` into `truth`, from the contingency table of both in a single pass
+    over the volumes. Locations with label 0 in `truth` are ignored.
+
+    A truth segment that overlaps with `n` test segments counts as `n - 1`
+    splits (each fixed by a merge operation), a test segment that overlaps
+    with `n` truth segments counts as `n - 1` merges (each fixed by a split
+    operation). Test label 0 is not counted as a segment.
+
+    Args:
+
+        truth, test (ndarray):
+
+            Label arrays of the same shape.
+
+        min_overlap (int, optional):
+
+            Ignore overlaps of fewer than this many locations.
+
+        min_overlap_fraction (float, optional):
+
+            Ignore overlaps that cover less than this fraction of the truth
+            segment (when counting splits) or the test segment (when counting
+            merges).
+
+        weights (ndarray, optional):
+
+            Non-negative integers of the same shape as `truth`. Each location
+            counts with its weight instead of 1 (e.g., to compute the edit
+            counts from the pairs and counts of a contingency table).
+
+    Returns:
+
+        A dictionary with the keys `splits`, `merges`, and `total`.
+    '''
+
+    assert truth.shape == test.shape, (
+            "shapes between truth and test don't match")
+
+    cdef np.ndarray[uint64_t] truth_data = ravel(
+        truth, 'edit_counts', dtype=np.uint64)
+    cdef np.ndarray[uint64_t] test_data = ravel(
+        test, 'edit_counts', dtype=np.uint64)
+    cdef size_t size = truth_data.size
+    cdef uint64_t min_overlap_ = min_overlap
+    cdef double min_overlap_fraction_ = min_overlap_fraction
+    cdef EditCounts counts
+
+    cdef uint64_t* truth_ptr = <uint64_t*>truth_data.data
+    cdef uint64_t* test_ptr = <uint64_t*>test_data.data
+
+    cdef np.ndarray[uint64_t] weights_data
+    cdef uint64_t* weights_ptr = NULL
+    if weights is not None:
+        assert weights.shape == truth.shape, (
+                "shapes between truth and weights don't match")
+        weights_data = ravel(weights, 'edit_counts', dtype=np.uint64)
+        weights_ptr = <uint64_t*>weights_data.data
+
+    add_count('edit_counts.voxels', size)
+    with timer('edit_counts'):
+        with nogil:
+            counts = edit_counts_arrays(
+                size,
+                truth_ptr,
+                test_ptr,
+                min_overlap_,
+                min_overlap_fraction_,
+                weights_ptr)
+
+    return {
+        'splits': counts.splits,
+        'merges': counts.merges,
+        'total': counts.splits + counts.merges
+    }
+
+cdef extern from "impl/edit_counts.hpp":
+
+    struct EditCounts:
+        uint64_t splits
+        uint64_t merges
+
+    EditCounts edit_counts_arrays "edit_counts"(
+            size_t          size,
+            const uint64_t* labels_a,
+            const uint64_t* labels_b,
+            uint64_t        min_overlap,
+            double          min_overlap_fraction,
+            const uint64_t* weights) nogil
@@ -0,0 +1,107 @@
+#ifndef IMPL_EDIT_COUNTS_H__
+#define IMPL_EDIT_COUNTS_H__
+
+#include <algorithm>
+#include <cstdint>
+#include <unordered_map>
+
+struct EditCounts {
+
+	uint64_t splits;
+	uint64_t merges;
+};
+
+/**
+ * Count the split and merge errors of labels_b with respect to labels_a
+ * from their contingency table.
+ *
+ * A pair (a, b) overlaps if they share at least min_overlap locations and at
+ * least min_overlap_fraction of the locations of a (for splits) or b (for
+ * merges). Each label a overlapping with n labels b is split n - 1 times,
+ * each label b overlapping with n labels a merges n - 1 times. Locations
+ * with label 0 in labels_a are ignored, label 0 in labels_b does not split
+ * or merge. If weights are given, location i counts weights[i] times (e.g.,
+ * to compute the edit counts from an existing contingency table).
+ */
+EditCounts
+edit_counts(
+		std::size_t     size,
+		const uint64_t* labels_a,
+		const uint64_t* labels_b,
+		uint64_t        min_overlap,
+		double          min_overlap_fraction,
+		const uint64_t* weights=nullptr) {
+
+	// number of co-occurences of label a and b
+	std::unordered_map<uint64_t, std::unordered_map<uint64_t, uint64_t>> n_ab;
+
+	// number of occurences of label a and b
+	std::unordered_map<uint64_t, uint64_t> n_a, n_b;
+
+	// consecutive locations are likely to have the same labels, count them
+	// in runs
+	std::size_t i = 0;
+	while (i < size) {
+
+		uint64_t a = labels_a[i];
+		uint64_t b = labels_b[i];
+
+		std::size_t run = 1;
+		uint64_t n = (weights ? weights[i] : 1);
+		while (
+				i + run < size &&
+				labels_a[i + run] == a &&
+				labels_b[i + run] == b) {
+
+			n += (weights ? weights[i + run] : 1);
+			++run;
+		}
+		i += run;
+
+		if (a == 0)
+			continue;
+
+		n_a[a] += n;
+
+		if (b == 0)
+			continue;
+
+		n_b[b] += n;
+		n_ab[a][b] += n;
+	}
+
+	EditCounts counts = {0, 0};
+
+	// number of overlapping labels a per label b
+	std::unordered_map<uint64_t, uint64_t> b_overlaps;
+
+	for (auto& a : n_ab) {
+
+		double min_a = std::max<double>(
+			min_overlap,
+			min_overlap_fraction*n_a[a.first]);
+
+		uint64_t a_overlaps = 0;
+		for (auto& b : a.second) {
+
+			double min_b = std::max<double>(
+				min_overlap,
+				min_overlap_fraction*n_b[b.first]);
+
+			if (b.second >= min_a)
+				++a_overlaps;
+			if (b.second >= min_b)
+				++b_overlaps[b.first];
+		}
+
+		if (a_overlaps > 1)
+			counts.splits += a_overlaps - 1;
+	}
+
+	for (auto& b : b_overlaps)
+		counts.merges += b.second - 1;
+
+	return counts;
+}
+
+#endif // IMPL_EDIT_COUNTS_H__
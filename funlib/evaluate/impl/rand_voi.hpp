@@ -19,13 +19,19 @@ struct Metrics {
 	std::map<uint64_t, double> voi_merge_j;
 };
 
+/**
+ * Compute Rand and VOI scores between two labellings. If weights are given
+ * (not nullptr), each location counts with its weight instead of 1.
+ * Locations with label 0 in labels_a are ignored.
+ */
 template <typename V1, typename V2>
 Metrics
 rand_voi_arrays(
 		std::size_t size,
 		const V1* labels_a,
 		const V2* labels_b,
-		bool return_cluster_scores=false){
+		bool return_cluster_scores=false,
+		const double* weights=nullptr){
 
 	double total = 0;
 
@@ -42,11 +48,13 @@ rand_voi_arrays(
 
 		if (a) {
 
-			++total;
+			double w = (weights ? weights[i] : 1.0);
 
-			++p_ij[a][b];
-			++p_i[a];
-			++p_j[b];
+			total += w;
+
+			p_ij[a][b] += w;
+			p_i[a] += w;
+			p_j[b] += w;
 		}
 	}
 
@@ -0,0 +1,263 @@
+#ifndef IMPL_SKELETON_SCORES_H__
+#define IMPL_SKELETON_SCORES_H__
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <thread>
+#include <unordered_map>
+#include <vector>
+
+// edge classes, same as in run_length.py
+const uint8_t CORRECT = 0;
+const uint8_t OMITTED = 1;
+const uint8_t SPLIT = 2;
+const uint8_t MERGED = 3;
+
+const uint64_t NO_SKELETON = static_cast<uint64_t>(-1);
+
+/**
+ * Flag each node whose segment merges at least two skeletons.
+ */
+void
+find_merging_nodes(
+		std::size_t     num_nodes,
+		const uint64_t* node_segments,
+		const uint64_t* node_skeletons,
+		uint8_t*        node_merging) {
+
+	// find the skeleton of each segment, NO_SKELETON if more than one
+	std::unordered_map<uint64_t, uint64_t> segment_skeleton;
+	segment_skeleton.reserve(num_nodes);
+
+	// consecutive nodes are likely to be in the same segment and skeleton,
+	// avoid hash map lookups for them
+	for (std::size_t i = 0; i < num_nodes; ++i) {
+
+		if (i > 0 &&
+				node_segments[i] == node_segments[i - 1] &&
+				node_skeletons[i] == node_skeletons[i - 1])
+			continue;
+
+		auto inserted = segment_skeleton.emplace(
+			node_segments[i],
+			node_skeletons[i]);
+
+		if (!inserted.second && inserted.first->second != node_skeletons[i])
+			inserted.first->second = NO_SKELETON;
+	}
+
+	for (std::size_t i = 0; i < num_nodes; ++i) {
+
+		if (i > 0 && node_segments[i] == node_segments[i - 1])
+			node_merging[i] = node_merging[i - 1];
+		else
+			node_merging[i] = (
+				segment_skeleton[node_segments[i]] == NO_SKELETON);
+	}
+}
+
+/**
+ * Classify the edges of skeletons [first_skeleton, last_skeleton) and sum
+ * the correct edge lengths per (skeleton, segment) pair. Needs the merging
+ * flags of find_merging_nodes. Outputs are indexed like in skeleton_scores,
+ * except for the pairs, which are written from the start of the given
+ * arrays.
+ *
+ * Returns the number of (skeleton, segment) pairs written.
+ */
+std::size_t
+classify_skeleton_edges(
+		std::size_t     first_skeleton,
+		std::size_t     last_skeleton,
+		const uint64_t* node_segments,
+		const uint8_t*  node_merging,
+		const uint64_t* edge_offsets,
+		const uint64_t* edges_u,
+		const uint64_t* edges_v,
+		const double*   edge_lengths,
+		uint8_t*        edge_classes,
+		uint64_t*       counts,
+		uint64_t*       correct_skeletons,
+		uint64_t*       correct_segments,
+		double*         correct_lengths) {
+
+	std::size_t num_pairs = 0;
+	std::unordered_map<uint64_t, double> segment_lengths;
+
+	for (std::size_t s = first_skeleton; s < last_skeleton; ++s) {
+
+		segment_lengths.clear();
+		uint64_t* skeleton_counts = counts + 4*s;
+
+		// length accumulator of the previous correct edge's segment
+		uint64_t previous_segment = 0;
+		double* previous_length = nullptr;
+
+		for (uint64_t e = edge_offsets[s]; e < edge_offsets[s + 1]; ++e) {
+
+			uint64_t u = edges_u[e];
+			uint64_t v = edges_v[e];
+			uint64_t segment_u = node_segments[u];
+			uint64_t segment_v = node_segments[v];
+
+			uint8_t edge_class;
+			if (segment_u == 0 || segment_v == 0)
+				edge_class = OMITTED;
+			else if (segment_u != segment_v)
+				edge_class = SPLIT;
+			else if (node_merging[u])
+				edge_class = MERGED;
+			else
+				edge_class = CORRECT;
+
+			edge_classes[e] = edge_class;
+			++skeleton_counts[edge_class];
+
+			if (edge_class == CORRECT) {
+
+				if (previous_length == nullptr ||
+						segment_u != previous_segment) {
+
+					previous_segment = segment_u;
+					previous_length = &segment_lengths[segment_u];
+				}
+
+				*previous_length += edge_lengths[e];
+			}
+		}
+
+		for (auto& p : segment_lengths) {
+
+			correct_skeletons[num_pairs] = s;
+			correct_segments[num_pairs] = p.first;
+			correct_lengths[num_pairs] = p.second;
+			++num_pairs;
+		}
+	}
+
+	return num_pairs;
+}
+
+/**
+ * Classify skeleton edges and accumulate the correct edge lengths per
+ * (skeleton, segment) pair.
+ *
+ * Edges are given in CSR form: the edges of skeleton s are stored in
+ * [edge_offsets[s], edge_offsets[s + 1]).
+ *
+ * After a global pass to find merging segments, the skeletons are split into
+ * num_workers ranges with about the same number of edges, which are
+ * processed in parallel. The result does not depend on num_workers.
+ *
+ * Outputs (allocated by the caller):
+ *
+ *   edge_classes:      one class per edge
+ *   counts:            num_skeletons x 4, number of edges per class
+ *   node_merging:      one flag per node, whether the node's segment merges
+ *                      at least two skeletons
+ *   correct_skeletons,
+ *   correct_segments,
+ *   correct_lengths:   one entry per (skeleton, segment) pair with at least
+ *                      one correct edge, needs space for num_edges entries
+ *
+ * Returns the number of (skeleton, segment) pairs written.
+ */
+std::size_t
+skeleton_scores(
+		std::size_t     num_nodes,
+		std::size_t     num_skeletons,
+		const uint64_t* node_segments,
+		const uint64_t* node_skeletons,
+		const uint64_t* edge_offsets,
+		const uint64_t* edges_u,
+		const uint64_t* edges_v,
+		const double*   edge_lengths,
+		uint8_t*        edge_classes,
+		uint64_t*       counts,
+		uint8_t*        node_merging,
+		uint64_t*       correct_skeletons,
+		uint64_t*       correct_segments,
+		double*         correct_lengths,
+		std::size_t     num_workers = 1) {
+
+	find_merging_nodes(
+		num_nodes,
+		node_segments,
+		node_skeletons,
+		node_merging);
+
+	num_workers = std::max<std::size_t>(
+		std::min(num_workers, num_skeletons), 1);
+
+	// split skeletons into ranges of about the same number of edges
+	std::size_t num_edges = edge_offsets[num_skeletons];
+	std::vector<std::size_t> first_skeletons(num_workers + 1);
+	for (std::size_t w = 0; w < num_workers; ++w)
+		first_skeletons[w] = std::lower_bound(
+			edge_offsets,
+			edge_offsets + num_skeletons,
+			num_edges*w/num_workers) - edge_offsets;
+	first_skeletons[num_workers] = num_skeletons;
+
+	// each range has at most as many pairs as edges, so it can write its
+	// pairs starting at its first edge
+	std::vector<std::size_t> num_pairs(num_workers);
+	auto classify_range = [&](std::size_t w) {
+
+		std::size_t first = first_skeletons[w];
+		std::size_t last = first_skeletons[w + 1];
+		if (first >= last)
+			return;
+
+		uint64_t begin = edge_offsets[first];
+		num_pairs[w] = classify_skeleton_edges(
+			first,
+			last,
+			node_segments,
+			node_merging,
+			edge_offsets,
+			edges_u,
+			edges_v,
+			edge_lengths,
+			edge_classes,
+			counts,
+			correct_skeletons + begin,
+			correct_segments + begin,
+			correct_lengths + begin);
+	};
+
+	std::vector<std::thread> workers;
+	for (std::size_t w = 1; w < num_workers; ++w)
+		workers.emplace_back(classify_range, w);
+	classify_range(0);
+	for (auto& worker : workers)
+		worker.join();
+
+	// move pairs of all ranges next to each other
+	std::size_t total_pairs = num_pairs[0];
+	for (std::size_t w = 1; w < num_workers; ++w) {
+
+		if (num_pairs[w] == 0)
+			continue;
+
+		uint64_t begin = edge_offsets[first_skeletons[w]];
+		std::memmove(
+			correct_skeletons + total_pairs,
+			correct_skeletons + begin,
+			num_pairs[w]*sizeof(uint64_t));
+		std::memmove(
+			correct_segments + total_pairs,
+			correct_segments + begin,
+			num_pairs[w]*sizeof(uint64_t));
+		std::memmove(
+			correct_lengths + total_pairs,
+			correct_lengths + begin,
+			num_pairs[w]*sizeof(double));
+		total_pairs += num_pairs[w];
+	}
+
+	return total_pairs;
+}
+
+#endif // IMPL_SKELETON_SCORES_H__
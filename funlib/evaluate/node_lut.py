@@ -0,0 +1,149 @@
+from .blocks import BlockReader
+from .profiling import add_count, timer
+import numpy as np
+
+
+def get_node_segment_lut(
+        positions,
+        segmentation,
+        voxel_size=None,
+        offset=None,
+        chunk_shape=None,
+        num_workers=1):
+    '''Look up the segment ID of each node in a segmentation volume.
+
+    Nodes are grouped by the chunk of the volume they fall into, and each
+    chunk is read only once. This makes the lookup efficient for chunked
+    arrays on disk (e.g., ``zarr`` or ``h5py`` datasets) and memory maps.
+
+    Args:
+
+        positions (ndarray):
+
+            The positions of the nodes in world units, shape ``(N, ndim)``.
+
+        segmentation (array-like):
+
+            The segmentation volume. Can be anything that supports slicing
+            with a tuple of ``slice`` objects and has a ``shape`` and
+            ``dtype``, like NumPy arrays, memory maps, ``zarr`` arrays, or
+            ``h5py`` datasets.
+
+        voxel_size (tuple of int, optional):
+
+            The size of a voxel in world units. Defaults to 1.
+
+        offset (tuple of int, optional):
+
+            The position of the first voxel of ``segmentation`` in world
+            units. Defaults to 0.
+
+        chunk_shape (tuple of int, optional):
+
+            The shape of the blocks to read at once, in voxels. Defaults to
+            the chunk shape of ``segmentation``, if it has one. NumPy arrays
+            and memory maps without a ``chunk_shape`` are indexed directly,
+            touching only the voxels of the nodes.
+
+        num_workers (int, optional):
+
+            The number of threads to read chunks with. The same number of
+            chunks is read ahead while nodes are looked up in the current
+            chunk (see :class:`BlockReader`).
+
+    Returns:
+
+        An array of segment IDs, one for each node. Nodes outside of the
+        volume are assigned to segment 0.
+    '''
+
+    positions = np.asarray(positions, dtype=np.float64)
+    if positions.ndim == 1:
+        positions = positions[:, np.newaxis]
+
+    shape = np.array(segmentation.shape, dtype=np.int64)
+    dims = len(shape)
+
+    assert positions.shape[1] == dims, (
+        "positions and segmentation have different dimensions")
+
+    if voxel_size is None:
+        voxel_size = np.ones((dims,))
+    if offset is None:
+        offset = np.zeros((dims,))
+
+    voxels = np.floor(
+        (positions - np.asarray(offset))/np.asarray(voxel_size)
+    ).astype(np.int64)
+    inside = np.all(np.logical_and(voxels >= 0, voxels < shape), axis=1)
+
+    lut = np.zeros((len(positions),), dtype=segmentation.dtype)
+    nodes = np.nonzero(inside)[0]
+    voxels = voxels[inside]
+
+    if chunk_shape is None:
+        chunk_shape = get_chunk_shape(segmentation)
+
+    if chunk_shape is None:
+        add_count('get_node_segment_lut.nodes', len(nodes))
+        with timer('get_node_segment_lut.read_voxels'):
+            lut[nodes] = segmentation[tuple(voxels.T)]
+        return lut
+
+    chunk_shape = np.array(chunk_shape, dtype=np.int64)
+
+    # sort nodes by chunk
+    chunk_grid = -(-shape//chunk_shape)
+    chunks = np.ravel_multi_index(
+        tuple((voxels//chunk_shape).T),
+        tuple(chunk_grid))
+    order = np.argsort(chunks, kind='stable')
+    chunks = chunks[order]
+    nodes = nodes[order]
+    voxels = voxels[order]
+    starts = np.flatnonzero(np.diff(chunks, prepend=-1))
+    ends = np.append(starts[1:], len(chunks))
+
+    def chunk_roi(begin):
+
+        chunk = np.array(np.unravel_index(chunks[begin], tuple(chunk_grid)))
+        chunk_begin = chunk*chunk_shape
+        chunk_end = np.minimum(chunk_begin + chunk_shape, shape)
+
+        return tuple(slice(b, e) for b, e in zip(chunk_begin, chunk_end))
+
+    add_count('get_node_segment_lut.nodes', len(nodes))
+    add_count('get_node_segment_lut.chunks', len(starts))
+
+    reader = BlockReader(
+        [segmentation],
+        [chunk_roi(begin) for begin in starts],
+        num_prefetch=num_workers,
+        num_threads=num_workers)
+
+    with timer('get_node_segment_lut.read_chunks'):
+        for (roi, (block,)), begin, end in zip(reader, starts, ends):
+            chunk_begin = np.array([r.start for r in roi])
+            local = voxels[begin:end] - chunk_begin
+            lut[nodes[begin:end]] = block[tuple(local.T)]
+
+    return lut
+
+
+def get_chunk_shape(array):
+    '''Get the chunk shape of a chunked array. Returns ``None`` for NumPy
+    arrays (which can be indexed directly) and the whole shape for other
+    arrays without chunks.'''
+
+    if isinstance(array, np.ndarray):
+        return None
+
+    chunks = getattr(array, 'chunks', None)
+
+    if chunks is None:
+        return array.shape
+
+    # dask-like arrays store the sizes of all chunks per dimension
+    return tuple(
+        c[0] if isinstance(c, tuple) else c
+        for c in chunks)
@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_current_stats = ContextVar('funlib_evaluate_stats', default=None)
+
+
+class CallStats():
+    '''Phase timings and counters collected while computing metrics.
+
+    Phases and counters are named after the function they belong to, e.g.,
+    ``split_graph.min_cut`` or ``rand_voi.voxels``. Bytes spent on copies to
+    get contiguous arrays are counted in ``<function>.bytes_copied``.
+
+    Attributes:
+
+        timings (``dict``):
+
+            The total time in seconds spent in each phase.
+
+        calls (``dict``):
+
+            How often each phase was entered.
+
+        counts (``dict``):
+
+            The value of each counter.
+    '''
+
+    def __init__(self, callback=None):
+
+        self.timings = {}
+        self.calls = {}
+        self.counts = {}
+        self.callback = callback
+
+    def add_time(self, name, seconds):
+
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def add_count(self, name, value):
+
+        self.counts[name] = self.counts.get(name, 0) + value
+        if self.callback is not None:
+            self.callback(name, value)
+
+    def to_dict(self):
+
+        return {
+            'timings': dict(self.timings),
+            'calls': dict(self.calls),
+            'counts': dict(self.counts)
+        }
+
+    def __repr__(self):
+
+        phases = ', '.join(
+            '%s=%.3fs' % (name, seconds)
+            for name, seconds in sorted(
+                self.timings.items(),
+                key=lambda item: -item[1]))
+        counts = ', '.join(
+            '%s=%d' % item
+            for item in sorted(self.counts.items()))
+
+        return 'CallStats(%s; %s)' % (phases, counts)
+
+
+@contextmanager
+def collect_stats(callback=None):
+    '''Collect timings and counters of all metrics computed in this context.
+
+    Timings and counters are always sent to the ``funlib.evaluate.profiling``
+    logger at level ``DEBUG``. Inside this context, they are additionally
+    accumulated in a :class:`CallStats` object and passed to ``callback``.
+    Work done in worker processes is not included.
+
+    Example::
+
+        with collect_stats() as stats:
+            evaluate.rand_voi(truth, test)
+        print(stats.timings)
+
+    Args:
+
+        callback (callable, optional):
+
+            Called with ``(name, value)`` for every finished phase (value in
+            seconds) and every counter increment.
+
+    Returns:
+
+        The :class:`CallStats` of this context.
+    '''
+
+    stats = CallStats(callback)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def timer(name):
+    '''Time a phase.'''
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def add_time(name, seconds):
+    '''Add the time spent in a phase.'''
+
+    logger.debug("%s took %.3fs", name, seconds)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add_time(name, seconds)
+
+
+def add_count(name, value=1):
+    '''Increment a counter.'''
+
+    value = int(value)
+    logger.debug("%s += %d", name, value)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add_count(name, value)
+
+
+def contiguous(array, name, dtype=None):
+    '''Get a C-contiguous version of ``array``, counting the bytes copied in
+    ``<name>.bytes_copied``.'''
+
+    result = np.ascontiguousarray(array, dtype=dtype)
+    if not np.may_share_memory(result, array):
+        add_count(name + '.bytes_copied', result.nbytes)
+
+    return result
+
+
+def ravel(array, name, dtype=None):
+    '''Get a flat, C-contiguous version of ``array`` (in memory order, if
+    possible), counting the bytes copied in ``<name>.bytes_copied``.'''
+
+    result = np.ascontiguousarray(np.ravel(array, order='A'), dtype=dtype)
+    if not np.may_share_memory(result, array):
+        add_count(name + '.bytes_copied', result.nbytes)
+
+    return result
@@ -3,43 +3,68 @@ from libcpp cimport bool
 from libcpp.map cimport map as cpp_map
 import numpy as np
 cimport numpy as np
+from .profiling import add_count, contiguous, ravel, timer
 
-def rand_voi(truth, test, return_cluster_scores=False):
+def rand_voi(truth, test, return_cluster_scores=False, weights=None):
+    '''Compute Rand and VOI scores between `truth` and `test`. Locations
+    with label 0 in `truth` are ignored.
+
+    If `weights` (an array of the same shape) are given, each location
+    contributes with its weight instead of 1 to the contingency table.'''
 
     for d in range(truth.ndim):
         assert truth.shape[d] == test.shape[d], (
                 "shapes between truth and test don't match")
 
-    return rand_voi_wrapper(
-        np.ravel(truth, order='A'),
-        np.ravel(test, order='A'),
-        return_cluster_scores)
+    if weights is not None:
+        assert weights.shape == truth.shape, (
+                "shapes between truth and weights don't match")
+        weights = ravel(weights, 'rand_voi', dtype=np.float64)
+
+    with timer('rand_voi'):
+        return rand_voi_wrapper(
+            ravel(truth, 'rand_voi'),
+            ravel(test, 'rand_voi'),
+            return_cluster_scores,
+            weights)
 
 def rand_voi_wrapper(
         np.ndarray[uint64_t] truth,
         np.ndarray[uint64_t] test,
-        return_cluster_scores):
+        return_cluster_scores,
+        np.ndarray[double] weights=None):
 
-    # the C++ part assumes contiguous memory, make sure we have it (and do 
+    # the C++ part assumes contiguous memory, make sure we have it (and do
     # nothing, if we do)
-    if truth is not None and not truth.flags['C_CONTIGUOUS']:
-        print("Creating memory-contiguous ground-truth arrray (avoid this by passing C_CONTIGUOUS arrays)")
-        truth = np.ascontiguousarray(truth)
-    if not test.flags['C_CONTIGUOUS']:
-        print("Creating memory-contiguous test arrray (avoid this by passing C_CONTIGUOUS arrays)")
-        test = np.ascontiguousarray(test)
+    truth = contiguous(truth, 'rand_voi')
+    test = contiguous(test, 'rand_voi')
+    add_count('rand_voi.voxels', test.size)
 
     cdef uint64_t* test_data
     cdef uint64_t* truth_data
+    cdef double* weights_data = NULL
+    cdef size_t size = test.size
+    cdef bool cluster_scores = return_cluster_scores
+    cdef Metrics metrics
 
     test_data = <uint64_t*>test.data
     truth_data = <uint64_t*>truth.data
 
-    return rand_voi_arrays(
-        test.size,
-        truth_data,
-        test_data,
-        return_cluster_scores)
+    if weights is not None:
+        weights = contiguous(weights, 'rand_voi')
+        weights_data = <double*>weights.data
+
+    # release the GIL, such that other threads (e.g., reading the next
+    # block) can run meanwhile
+    with nogil:
+        metrics = rand_voi_arrays(
+            size,
+            truth_data,
+            test_data,
+            cluster_scores,
+            weights_data)
+
+    return metrics
 
 cdef extern from "impl/rand_voi.hpp":
 
@@ -58,4 +83,5 @@ cdef extern from "impl/rand_voi.hpp":
             size_t          size,
             const uint64_t* truth_data,
             const uint64_t* test_data,
-            bool            return_cluster_scores);
+            bool            return_cluster_scores,
+            const double*   weights) nogil
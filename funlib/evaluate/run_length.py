@@ -1,3 +1,9 @@
+from .profiling import add_count, timer
+from .skeleton_scores import skeleton_scores_cpp
+from .skeletons import SkeletonArrays
+from collections.abc import Mapping
+from functools import partial
+import networkx
 import numpy as np
 
 
@@ -8,7 +14,8 @@ def expected_run_length(
         node_segment_lut,
         skeleton_lengths=None,
         skeleton_position_attributes=None,
-        return_merge_split_stats=False):
+        return_merge_split_stats=False,
+        num_workers=1):
     '''Compute the expected run-length on skeletons, given a segmentation in
     the form of a node -> segment lookup table.
 
@@ -16,11 +23,12 @@ def expected_run_length(
 
         skeletons:
 
-            A networkx-like graph.
+            A networkx-like graph or a :class:`SkeletonArrays` instance.
 
         skeleton_id_attribute:
 
-            The name of the node attribute containing the skeleton ID.
+            The name of the node attribute containing the skeleton ID. Not
+            used for :class:`SkeletonArrays`.
 
         edge_length_attribute:
 
@@ -34,15 +42,21 @@ def expected_run_length(
             function `get_skeleton_lengths` below, and reuse them for
             subsequent calls with different `node_segment_lut`s.
 
+            Not used for :class:`SkeletonArrays`, which store the edge lengths
+            in ``edge_lengths``.
+
         node_segment_lut:
 
-            A dictionary mapping node IDs to segment IDs.
+            A dictionary mapping node IDs to segment IDs. For
+            :class:`SkeletonArrays`, this can also be an array of segment IDs
+            aligned with ``node_ids``.
 
         skeleton_lengths (optional):
 
             A dictionary from skeleton IDs to their length. Has to be given if
             precomputed edge lengths are to be used (see argument
-            `edge_length_attribute`).
+            `edge_length_attribute`). For :class:`SkeletonArrays`, the lengths
+            are computed from the edge lengths if not given.
 
         skeleton_position_attributes (optional):
 
@@ -59,6 +73,12 @@ def expected_run_length(
 
             The split stats are a dictionary mapping skeleton IDs to pairs of
             segment IDs, one pair for each split along the skeleton edges.
+
+        num_workers (optional):
+
+            The number of threads to classify edges with. Skeletons are
+            split into contiguous ranges with about the same number of edges,
+            after a single pass over all nodes to find merging segments.
     '''
 
     if skeleton_position_attributes is not None:
@@ -74,44 +94,38 @@ def expected_run_length(
             skeleton_id_attribute,
             store_edge_length=edge_length_attribute)
 
-    total_skeletons_length = np.sum([l for _, l in skeleton_lengths.items()])
+    if not isinstance(skeletons, SkeletonArrays):
+        skeletons = SkeletonArrays.from_graph(
+            skeletons,
+            skeleton_id_attribute,
+            edge_length_attribute=edge_length_attribute)
 
-    res = evaluate_skeletons(
-        skeletons,
-        skeleton_id_attribute,
-        node_segment_lut,
-        return_merge_split_stats=return_merge_split_stats)
+    if skeletons.edge_lengths is None:
+        raise RuntimeError(
+            "SkeletonArrays need positions or edge lengths to compute the "
+            "expected run length")
 
-    if return_merge_split_stats:
-        skeleton_scores, merge_split_stats = res
+    if skeleton_lengths is None:
+        total_skeletons_length = np.sum(skeletons.skeleton_lengths()[1])
     else:
-        skeleton_scores = res
+        total_skeletons_length = np.sum(list(skeleton_lengths.values()))
 
-    skeletons_erl = 0
-
-    for skeleton_id, scores in skeleton_scores.items():
-
-        skeleton_length = skeleton_lengths[skeleton_id]
-        skeleton_erl = 0
-
-        for segment_id, correct_edges in scores.correct_edges.items():
-
-            correct_edges_length = np.sum([
-                skeletons.edges[e][edge_length_attribute]
-                for e in correct_edges])
-
-            skeleton_erl += (
-                correct_edges_length *
-                (correct_edges_length/skeleton_length)
-            )
+    evaluation = evaluate_skeleton_arrays(
+        skeletons,
+        node_segment_lut,
+        num_workers)
 
-        skeletons_erl += (
-            (skeleton_length/total_skeletons_length) *
-            skeleton_erl
-        )
+    # each correct (skeleton, segment) pair of length l contributes
+    # l*(l/skeleton_length), weighted by skeleton_length/total_length
+    if total_skeletons_length == 0:
+        skeletons_erl = 0.0
+    else:
+        skeletons_erl = (
+            np.sum(evaluation.correct_lengths**2) /
+            total_skeletons_length)
 
     if return_merge_split_stats:
-        return skeletons_erl, merge_split_stats
+        return skeletons_erl, evaluation.merge_split_stats()
     else:
         return skeletons_erl
 
@@ -120,165 +134,1080 @@ def get_skeleton_lengths(
         skeletons,
         skeleton_position_attributes,
         skeleton_id_attribute,
-        store_edge_length=None):
+        store_edge_length=None,
+        voxel_size=None):
     '''Get the length of each skeleton in the given graph.
 
     Args:
 
         skeletons:
 
-            A networkx-like graph.
+            A networkx-like graph or a :class:`SkeletonArrays` instance.
 
         skeleton_position_attributes:
 
             A list of strings with the names of the node attributes for the
-            spatial coordinates.
+            spatial coordinates. Not used for :class:`SkeletonArrays`.
 
         skeleton_id_attribute:
 
-            The name of the node attribute containing the skeleton ID.
+            The name of the node attribute containing the skeleton ID. Not
+            used for :class:`SkeletonArrays`.
 
         store_edge_length (optional):
 
-            If given, stores the length of an edge in this edge attribute.
+            If given, stores the length of an edge in this edge attribute. For
+            :class:`SkeletonArrays`, any value that evaluates to ``True``
+            stores the lengths in ``edge_lengths``.
+
+        voxel_size (optional):
+
+            A tuple with one scaling factor per spatial dimension, to be
+            applied to the node positions before measuring lengths. Use this
+            if positions are stored in voxels of an anisotropic volume.
+    '''
+
+    if isinstance(skeletons, SkeletonArrays):
+
+        edge_lengths = skeletons.compute_edge_lengths(voxel_size)
+        if store_edge_length:
+            skeletons.edge_lengths = edge_lengths
+        else:
+            skeletons = SkeletonArrays(
+                skeletons.node_ids,
+                skeletons.skeleton_ids,
+                skeletons.edges,
+                edge_lengths=edge_lengths)
+
+        skeleton_ids, lengths = skeletons.skeleton_lengths()
+        return dict(zip(skeleton_ids.tolist(), lengths.tolist()))
+
+    arrays = SkeletonArrays.from_graph(
+        skeletons,
+        skeleton_id_attribute,
+        position_attributes=skeleton_position_attributes)
+    edge_lengths = arrays.compute_edge_lengths(voxel_size)
+
+    if store_edge_length:
+        networkx.set_edge_attributes(
+            skeletons,
+            dict(zip(skeletons.edges(), edge_lengths.tolist())),
+            store_edge_length)
+
+    arrays.edge_lengths = edge_lengths
+    skeleton_ids, lengths = arrays.skeleton_lengths()
+
+    return dict(zip(skeleton_ids.tolist(), lengths.tolist()))
+
+
+def expected_run_length_sweep(
+        skeletons,
+        node_segment_luts,
+        skeleton_lengths=None,
+        max_chunk_size=2**22):
+    '''Compute the expected run-length and edge statistics for many
+    segmentations of the same skeletons at once, e.g., for a series of
+    agglomeration thresholds.
+
+    Args:
+
+        skeletons (:class:`SkeletonArrays`):
+
+            The skeletons to evaluate, with edge lengths.
+
+        node_segment_luts (ndarray):
+
+            A 2D array of segment IDs of shape ``(T, N)``, one row per
+            segmentation, aligned with ``skeletons.node_ids``.
+
+        skeleton_lengths (optional):
+
+            A dictionary from skeleton IDs to their length. Computed from the
+            edge lengths if not given.
+
+        max_chunk_size (optional):
+
+            The maximal number of (row, edge) entries to process at once.
+            Limits the memory used for large skeleton sets.
+
+    Returns:
+
+        A dictionary with arrays of shape ``(T,)`` for keys `erl`,
+        `ommitted`, `split`, `merged`, and `correct`, where the latter are
+        the number of edges in each class (see :func:`evaluate_skeletons`).
     '''
 
-    node_positions = {
-        node: np.array(
-            [
-                skeletons.nodes[node][d]
-                for d in skeleton_position_attributes
-            ],
-            dtype=np.float32)
-        for node in skeletons.nodes()
+    if skeletons.edge_lengths is None:
+        raise RuntimeError(
+            "SkeletonArrays need positions or edge lengths to compute the "
+            "expected run length")
+
+    node_segment_luts = np.asarray(node_segment_luts)
+    if node_segment_luts.ndim == 1:
+        node_segment_luts = node_segment_luts[np.newaxis]
+    num_rows = len(node_segment_luts)
+
+    assert node_segment_luts.shape[1] == skeletons.num_nodes, (
+        "node_segment_luts need to be aligned with node_ids")
+
+    if skeleton_lengths is None:
+        total_skeletons_length = np.sum(skeletons.skeleton_lengths()[1])
+    else:
+        total_skeletons_length = np.sum(list(skeleton_lengths.values()))
+
+    # prepared once for all rows
+    _, node_skeletons = skeletons.skeleton_index()
+    edge_lengths = skeletons.edge_lengths
+
+    results = {
+        key: np.zeros((num_rows,), dtype=dtype)
+        for key, dtype in [
+            ('erl', np.float64),
+            ('ommitted', np.int64),
+            ('split', np.int64),
+            ('merged', np.int64),
+            ('correct', np.int64)
+        ]
     }
 
-    skeleton_lengths = {}
-    for u, v, data in skeletons.edges(data=True):
+    rows_per_chunk = max(1, max_chunk_size//max(skeletons.num_edges, 1))
+    for begin in range(0, num_rows, rows_per_chunk):
+
+        end = min(begin + rows_per_chunk, num_rows)
+        segments = node_segment_luts[begin:end]
+
+        groups = SegmentGroups(segments, node_skeletons)
+        edge_classes = classify_edges(skeletons.edges, segments, groups)
+
+        for name, edge_class in EDGE_CLASSES:
+            results[name][begin:end] = np.sum(
+                edge_classes == edge_class,
+                axis=1)
+
+        # correct edges lie on non-merging segments, which overlap with
+        # exactly one skeleton
+        correct_rows, correct_edges = np.nonzero(edge_classes == CORRECT)
+        correct_groups = groups.node_groups[
+            correct_rows,
+            skeletons.edges[correct_edges, 0]]
+        correct_lengths = np.bincount(
+            correct_groups,
+            weights=edge_lengths[correct_edges],
+            minlength=groups.num_groups)
+
+        if total_skeletons_length > 0:
+            results['erl'][begin:end] = np.bincount(
+                groups.group_rows,
+                weights=correct_lengths**2,
+                minlength=end - begin)/total_skeletons_length
+
+    return results
+
+
+def expected_run_length_bootstrap(
+        skeleton_lengths,
+        skeleton_contributions,
+        num_samples=1000,
+        confidence=0.95,
+        seed=None,
+        max_chunk_size=2**24):
+    '''Bootstrap confidence intervals for the expected run-length, by
+    resampling skeletons with replacement.
+
+    The expected run-length is the ratio of the summed contributions and the
+    summed lengths of all skeletons. Each replicate draws multinomial weights
+    for the skeletons, such that all replicates are computed with a single
+    matrix product.
 
-        skeleton_id = skeletons.nodes[u][skeleton_id_attribute]
+    Args:
 
-        if skeleton_id not in skeleton_lengths:
-            skeleton_lengths[skeleton_id] = 0
+        skeleton_lengths (ndarray):
 
-        pos_u = node_positions[u]
-        pos_v = node_positions[v]
+            The length of each skeleton, shape ``(S,)``.
 
-        length = np.linalg.norm(pos_u - pos_v)
+        skeleton_contributions (ndarray):
 
-        if store_edge_length:
-            data[store_edge_length] = length
-        skeleton_lengths[skeleton_id] += length
+            The contribution of each skeleton to the expected run-length,
+            i.e., the sum of the squared correct lengths per segment, shape
+            ``(S,)``. See :meth:`SkeletonEvaluation.run_length_contributions`.
+
+        num_samples (int, optional):
+
+            The number of bootstrap replicates.
 
-    return skeleton_lengths
+        confidence (float, optional):
+
+            The width of the percentile interval to report.
+
+        seed (optional):
+
+            A seed for ``numpy.random.default_rng``.
+
+        max_chunk_size (optional):
+
+            The maximal number of (replicate, skeleton) weights to draw at
+            once. Limits the memory used for large skeleton sets.
+
+    Returns:
+
+        A dictionary with keys `erl` (the expected run-length of all
+        skeletons), `mean`, `lower`, `upper` (the bounds of the percentile
+        interval), and `samples` (the expected run-length of each replicate).
+    '''
+
+    lengths = np.asarray(skeleton_lengths, dtype=np.float64)
+    contributions = np.asarray(skeleton_contributions, dtype=np.float64)
+    num_skeletons = len(lengths)
+
+    assert contributions.shape == lengths.shape, (
+        "skeleton_lengths and skeleton_contributions need to be aligned")
+
+    rng = np.random.default_rng(seed)
+    values = np.stack([contributions, lengths], axis=1)
+
+    # without skeletons, all replicates have an expected run-length of 0
+    samples = np.zeros((num_samples,))
+    if num_skeletons == 0:
+        num_samples = 0
+
+    samples_per_chunk = max(1, max_chunk_size//max(num_skeletons, 1))
+    for begin in range(0, num_samples, samples_per_chunk):
+
+        end = min(begin + samples_per_chunk, num_samples)
+        num_rows = end - begin
+
+        # how often each skeleton is drawn in each replicate (multinomial
+        # weights, but counting uniform draws is faster than
+        # rng.multinomial)
+        draws = rng.integers(0, num_skeletons, size=(num_rows, num_skeletons))
+        draws += np.arange(num_rows)[:, np.newaxis]*num_skeletons
+        weights = np.bincount(
+            draws.ravel(),
+            minlength=num_rows*num_skeletons
+        ).reshape(num_rows, num_skeletons).astype(np.float64)
+
+        # replicates without length have an expected run-length of 0
+        sums = weights@values
+        np.divide(
+            sums[:, 0],
+            sums[:, 1],
+            out=samples[begin:end],
+            where=sums[:, 1] > 0)
+
+    alpha = (1.0 - confidence)/2
+    lower, upper = np.percentile(samples, [100*alpha, 100*(1 - alpha)])
+
+    total_length = np.sum(lengths)
+
+    return {
+        'erl': np.sum(contributions)/total_length if total_length > 0 else 0.0,
+        'mean': np.mean(samples),
+        'lower': lower,
+        'upper': upper,
+        'samples': samples
+    }
+
+
+def expected_run_length_curve(
+        skeletons,
+        node_fragment_lut,
+        merges,
+        skeleton_lengths=None):
+    '''Compute the expected run-length after each merge of a fragment
+    agglomeration.
+
+    Args:
+
+        skeletons (:class:`SkeletonArrays`):
+
+            The skeletons to evaluate, with edge lengths.
+
+        node_fragment_lut:
+
+            A dictionary mapping node IDs to fragment IDs, or an array of
+            fragment IDs aligned with ``skeletons.node_ids``.
+
+        merges (array-like):
+
+            Pairs of fragment IDs, shape ``(M, 2)``, in the order in which
+            they are merged.
+
+        skeleton_lengths (optional):
+
+            A dictionary from skeleton IDs to their length. Computed from the
+            edge lengths if not given.
+
+    Returns:
+
+        An array of shape ``(M + 1,)`` with the expected run-length before
+        any merge, followed by the expected run-length after each merge.
+    '''
+
+    merges = np.asarray(merges).reshape(-1, 2)
+
+    run_length = IncrementalRunLength(
+        skeletons,
+        node_fragment_lut,
+        skeleton_lengths,
+        fragment_ids=merges.ravel())
+
+    curve = np.empty((len(merges) + 1,), dtype=np.float64)
+    curve[0] = run_length.erl
+
+    merges = run_length.fragment_indices(merges.ravel()).reshape(-1, 2)
+    for i, (a, b) in enumerate(merges.tolist()):
+        curve[i + 1] = run_length.merge_indices(a, b)
+
+    return curve
+
+
+class IncrementalRunLength():
+    '''Keeps track of the expected run-length while fragments are merged
+    one by one.
+
+    Fragments are kept in a union-find structure. For each current segment,
+    the length of the skeleton edges inside the segment, the skeleton(s) it
+    overlaps with, and the length of the skeleton edges to each adjacent
+    segment are stored. A merge only updates the two merged segments (and
+    the adjacency of their neighbors), such that a whole agglomeration can
+    be evaluated in time close to linear in the number of merges plus nodes.
+
+    Merges involving fragment 0 (background) are ignored.
+
+    Args:
+
+        skeletons (:class:`SkeletonArrays`):
+
+            The skeletons to evaluate, with edge lengths.
+
+        node_fragment_lut:
+
+            A dictionary mapping node IDs to fragment IDs, or an array of
+            fragment IDs aligned with ``skeletons.node_ids``.
+
+        skeleton_lengths (optional):
+
+            A dictionary from skeleton IDs to their length. Computed from the
+            edge lengths if not given.
+
+        fragment_ids (array-like, optional):
+
+            Additional fragment IDs that will be merged later, but do not
+            contain skeleton nodes.
+    '''
+
+    # skeleton states of segments without skeleton nodes and merging segments
+    NO_SKELETON = -1
+    MERGING = -2
+
+    def __init__(
+            self,
+            skeletons,
+            node_fragment_lut,
+            skeleton_lengths=None,
+            fragment_ids=None):
+
+        if skeletons.edge_lengths is None:
+            raise RuntimeError(
+                "SkeletonArrays need positions or edge lengths to compute "
+                "the expected run length")
+
+        if skeleton_lengths is None:
+            self.total_length = np.sum(skeletons.skeleton_lengths()[1])
+        else:
+            self.total_length = np.sum(list(skeleton_lengths.values()))
+
+        fragments = skeletons.node_segments(node_fragment_lut)
+        if fragment_ids is None:
+            fragment_ids = np.zeros((0,), dtype=fragments.dtype)
+        self.fragment_ids, node_fragments = np.unique(
+            np.concatenate([fragments, np.asarray(fragment_ids)]),
+            return_inverse=True)
+        node_fragments = node_fragments[:len(fragments)]
+        num_fragments = len(self.fragment_ids)
+
+        if num_fragments > 0 and self.fragment_ids[0] == 0:
+            self.background = 0
+        else:
+            self.background = None
+
+        # skeleton of each fragment
+        _, node_skeletons = skeletons.skeleton_index()
+        groups = SegmentGroups(node_fragments[np.newaxis], node_skeletons)
+        skeleton = np.full(
+            (num_fragments,),
+            self.NO_SKELETON,
+            dtype=np.int64)
+        skeleton[groups.group_segments] = np.where(
+            groups.merging,
+            self.MERGING,
+            groups.group_skeletons)
+
+        # lengths of edges inside and between fragments
+        u, v = skeletons.edges[:, 0], skeletons.edges[:, 1]
+        fragment_u = node_fragments[u]
+        fragment_v = node_fragments[v]
+        valid = np.logical_and(fragments[u] != 0, fragments[v] != 0)
+
+        inside = np.logical_and(valid, fragment_u == fragment_v)
+        internal = np.bincount(
+            fragment_u[inside],
+            weights=skeletons.edge_lengths[inside],
+            minlength=num_fragments)
+
+        between = np.logical_and(valid, fragment_u != fragment_v)
+        fragment_a, fragment_b, pair_index = unique_pairs(
+            np.minimum(fragment_u[between], fragment_v[between]),
+            np.maximum(fragment_u[between], fragment_v[between]))
+        between_lengths = np.bincount(
+            pair_index,
+            weights=skeletons.edge_lengths[between],
+            minlength=len(fragment_a))
+
+        self.parent = list(range(num_fragments))
+        self.skeleton = skeleton.tolist()
+        self.internal = internal.tolist()
+        self.adjacent = [{} for _ in range(num_fragments)]
+        for a, b, length in zip(
+                fragment_a.tolist(),
+                fragment_b.tolist(),
+                between_lengths.tolist()):
+            self.adjacent[a][b] = length
+            self.adjacent[b][a] = length
+
+        self.sum_squares = np.sum(internal[skeleton >= 0]**2)
+
+    @property
+    def erl(self):
+        '''The current expected run-length.'''
+        if self.total_length == 0:
+            return 0.0
+        # guard against round-off of the running sum
+        return max(self.sum_squares, 0.0)/self.total_length
+
+    def fragment_indices(self, fragment_ids):
+        '''Get the internal indices of the given fragment IDs.'''
+
+        fragment_ids = np.asarray(fragment_ids)
+        indices = np.searchsorted(self.fragment_ids, fragment_ids)
+        indices = np.minimum(indices, max(len(self.fragment_ids) - 1, 0))
+
+        if np.any(self.fragment_ids[indices] != fragment_ids):
+            raise KeyError("Unknown fragment IDs")
+
+        return indices
+
+    def merge(self, fragment_a, fragment_b):
+        '''Merge the segments containing the two given fragments and return
+        the new expected run-length.'''
+
+        a, b = self.fragment_indices([fragment_a, fragment_b]).tolist()
+        return self.merge_indices(a, b)
+
+    def merge_indices(self, a, b):
+        '''Same as :meth:`merge`, but with internal fragment indices.'''
+
+        if a == self.background or b == self.background:
+            return self.erl
+
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a == root_b:
+            return self.erl
+
+        # merge smaller adjacency into larger one
+        if len(self.adjacent[root_a]) < len(self.adjacent[root_b]):
+            root_a, root_b = root_b, root_a
+
+        self.sum_squares -= self._contribution(root_a)
+        self.sum_squares -= self._contribution(root_b)
+
+        skeleton_a = self.skeleton[root_a]
+        skeleton_b = self.skeleton[root_b]
+        if skeleton_a == self.NO_SKELETON:
+            skeleton = skeleton_b
+        elif skeleton_b == self.NO_SKELETON or skeleton_a == skeleton_b:
+            skeleton = skeleton_a
+        else:
+            skeleton = self.MERGING
+
+        adjacent_a = self.adjacent[root_a]
+        adjacent_b = self.adjacent[root_b]
+
+        self.internal[root_a] += (
+            self.internal[root_b] +
+            adjacent_a.pop(root_b, 0.0))
+        adjacent_b.pop(root_a, None)
+
+        for c, length in adjacent_b.items():
+            adjacent_a[c] = adjacent_a.get(c, 0.0) + length
+            adjacent_c = self.adjacent[c]
+            del adjacent_c[root_b]
+            adjacent_c[root_a] = adjacent_c.get(root_a, 0.0) + length
+
+        self.adjacent[root_b] = None
+        self.skeleton[root_a] = skeleton
+        self.parent[root_b] = root_a
+
+        self.sum_squares += self._contribution(root_a)
+
+        return self.erl
+
+    def find(self, a):
+        '''Find the root of fragment index ``a``, with path compression.'''
+
+        parent = self.parent
+        root = a
+        while parent[root] != root:
+            root = parent[root]
+        while parent[a] != root:
+            parent[a], a = root, parent[a]
+
+        return root
+
+    def _contribution(self, root):
+
+        if self.skeleton[root] < 0:
+            return 0.0
+        return self.internal[root]**2
 
 
 class SkeletonScores():
+    '''Edge statistics of a single skeleton.
+
+    Attributes:
 
-    def __init__(self):
+        ommitted, split, merged, correct (int):
 
-        self.ommitted = 0
-        self.split = 0
-        self.merged = 0
-        self.correct = 0
-        self.correct_edges = {}
+            The number of edges of each class.
+
+        correct_lengths (dict):
+
+            The summed length of correct edges per segment, ``None`` if edge
+            lengths are not known.
+
+        correct_edges (dict):
+
+            The correct edges (as pairs of node IDs) per segment. Computed on
+            first access for scores returned by
+            :meth:`SkeletonEvaluation.skeleton_scores`.
+    '''
+
+    __slots__ = (
+        'ommitted',
+        'split',
+        'merged',
+        'correct',
+        'correct_lengths',
+        '_correct_edges',
+        '_get_correct_edges')
+
+    def __init__(
+            self,
+            ommitted=0,
+            split=0,
+            merged=0,
+            correct=0,
+            correct_lengths=None,
+            get_correct_edges=None):
+
+        self.ommitted = ommitted
+        self.split = split
+        self.merged = merged
+        self.correct = correct
+        self.correct_lengths = correct_lengths
+        self._correct_edges = None
+        self._get_correct_edges = get_correct_edges
+
+    @property
+    def correct_edges(self):
+
+        if self._correct_edges is None:
+            if self._get_correct_edges is None:
+                self._correct_edges = {}
+            else:
+                self._correct_edges = self._get_correct_edges()
+                self._get_correct_edges = None
+
+        return self._correct_edges
+
+    @correct_edges.setter
+    def correct_edges(self, correct_edges):
+        self._correct_edges = correct_edges
+        self._get_correct_edges = None
 
 
 def evaluate_skeletons(
         skeletons,
         skeleton_id_attribute,
         node_segment_lut,
-        return_merge_split_stats=False):
+        return_merge_split_stats=False,
+        num_workers=1):
+    '''Classify the edges of each skeleton as ommitted, split, merged, or
+    correct, given a segmentation in the form of a node -> segment lookup
+    table.
 
-    # find all merging segments (skeleton edges on merging segments will be
-    # counted as wrong)
+    This is a thin adapter around :func:`evaluate_skeleton_arrays`.
 
-    # pairs of (skeleton, segment), one for each node
-    skeleton_segment = np.array([
-        [data[skeleton_id_attribute], node_segment_lut[n]]
-        for n, data in skeletons.nodes(data=True)
-    ])
+    Args:
 
-    # unique pairs of (skeleton, segment)
-    skeleton_segment = np.unique(skeleton_segment, axis=0)
+        skeletons:
 
-    # number of times that a segment was mapped to a skeleton
-    segments, num_segment_skeletons = np.unique(
-        skeleton_segment[:, 1],
-        return_counts=True)
+            A networkx-like graph or a :class:`SkeletonArrays` instance.
 
-    # all segments that merge at least two skeletons
-    merging_segments = segments[num_segment_skeletons > 1]
+        skeleton_id_attribute:
 
-    merging_segments_mask = np.isin(skeleton_segment[:, 1], merging_segments)
-    merged_skeletons = skeleton_segment[:, 0][merging_segments_mask]
-    merging_segments = set(merging_segments)
+            The name of the node attribute containing the skeleton ID. Not
+            used for :class:`SkeletonArrays`.
 
-    merges = {}
-    splits = {}
+        node_segment_lut:
+
+            A dictionary mapping node IDs to segment IDs. For
+            :class:`SkeletonArrays`, this can also be an array of segment IDs
+            aligned with ``node_ids``.
+
+        return_merge_split_stats (optional):
+
+            If ``True``, also return the split/merge stats (see
+            :func:`expected_run_length`).
+
+        num_workers (optional):
+
+            The number of threads to classify edges with. Skeletons are
+            split into contiguous ranges with about the same number of edges,
+            after a single pass over all nodes to find merging segments.
+
+    Returns:
+
+        A dictionary from skeleton IDs to :class:`SkeletonScores`.
+    '''
+
+    if not isinstance(skeletons, SkeletonArrays):
+        skeletons = SkeletonArrays.from_graph(
+            skeletons,
+            skeleton_id_attribute)
+
+    evaluation = evaluate_skeleton_arrays(
+        skeletons,
+        node_segment_lut,
+        num_workers)
+    skeleton_scores = evaluation.skeleton_scores()
 
     if return_merge_split_stats:
+        return skeleton_scores, evaluation.merge_split_stats()
+    else:
+        return skeleton_scores
+
+
+def evaluate_skeleton_arrays(skeletons, node_segment_lut, num_workers=1):
+    '''Vectorized evaluation of skeletons against a segmentation.
+
+    Args:
+
+        skeletons (:class:`SkeletonArrays`):
+
+            The skeletons to evaluate.
+
+        node_segment_lut:
+
+            A dictionary mapping node IDs to segment IDs, or an array of
+            segment IDs aligned with ``skeletons.node_ids``.
 
-        merged_segments = skeleton_segment[:, 1][merging_segments_mask]
+        num_workers (optional):
 
-        for segment, skeleton in zip(merged_segments, merged_skeletons):
-            if segment not in merges:
-                merges[segment] = []
-            merges[segment].append(skeleton)
+            The number of threads to classify edges with. Skeletons are
+            split into contiguous ranges with about the same number of edges,
+            after a single pass over all nodes to find merging segments.
 
-    merged_skeletons = set(np.unique(merged_skeletons))
+    Returns:
+
+        A :class:`SkeletonEvaluation` with per-skeleton edge counts and
+        per-(skeleton, segment) correct lengths.
+    '''
 
-    skeleton_scores = {}
+    add_count('evaluate_skeletons.nodes', skeletons.num_nodes)
+    add_count('evaluate_skeletons.edges', skeletons.num_edges)
 
-    for u, v in skeletons.edges():
+    with timer('evaluate_skeletons.node_segments'):
+        segments = skeletons.node_segments(node_segment_lut)
 
-        skeleton_id = skeletons.nodes[u][skeleton_id_attribute]
-        segment_u = node_segment_lut[u]
-        segment_v = node_segment_lut[v]
+    return SkeletonEvaluation(skeletons, segments, num_workers)
 
-        if skeleton_id not in skeleton_scores:
-            scores = SkeletonScores()
-            skeleton_scores[skeleton_id] = scores
+
+class SkeletonEvaluation():
+    '''Result of :func:`evaluate_skeleton_arrays`.
+
+    Attributes:
+
+        skeleton_ids (ndarray):
+
+            The IDs of all skeletons with at least one edge, shape ``(S,)``.
+
+        ommitted, split, merged, correct (ndarray):
+
+            The number of edges of each class per skeleton, shape ``(S,)``.
+
+        correct_skeleton_ids, correct_segment_ids (ndarray):
+
+            All (skeleton, segment) pairs with at least one correct edge,
+            shape ``(P,)`` each.
+
+        correct_lengths (ndarray):
+
+            The summed length of the correct edges of each (skeleton,
+            segment) pair, shape ``(P,)``. ``None`` if the skeletons have no
+            edge lengths.
+
+        merging_segments (ndarray):
+
+            The segments that merge at least two skeletons.
+
+        edge_classes (ndarray):
+
+            The class of each edge, one of ``CORRECT``, ``OMITTED``,
+            ``SPLIT``, or ``MERGED``.
+    '''
+
+    def __init__(self, skeletons, segments, num_workers=1):
+
+        self.skeletons = skeletons
+        self.segments = segments
+
+        with timer('evaluate_skeletons.skeleton_index'):
+            skeleton_ids, node_skeletons = skeletons.skeleton_index()
+            edge_order, edge_offsets = skeletons.skeleton_csr()
+
+        if skeletons.edge_lengths is not None:
+            edge_lengths = skeletons.edge_lengths[edge_order]
+        else:
+            edge_lengths = np.zeros((skeletons.num_edges,))
+
+        scores = skeleton_scores_cpp(
+            segments.astype(np.uint64),
+            node_skeletons.astype(np.uint64),
+            edge_offsets,
+            skeletons.edges[edge_order, 0].astype(np.uint64),
+            skeletons.edges[edge_order, 1].astype(np.uint64),
+            edge_lengths.astype(np.float64),
+            num_workers)
+
+        self.edge_classes = np.empty_like(scores['edge_classes'])
+        self.edge_classes[edge_order] = scores['edge_classes']
+        self.node_merging = scores['node_merging']
+
+        # only report skeletons with at least one edge
+        has_edges = edge_offsets[1:] > edge_offsets[:-1]
+        self.skeleton_ids = skeleton_ids[has_edges]
+        self._skeleton_indices = np.nonzero(has_edges)[0]
+        counts = scores['counts'][has_edges].astype(np.int64)
+        for name, edge_class in EDGE_CLASSES:
+            setattr(self, name, counts[:, edge_class])
+
+        self.correct_skeleton_ids = skeleton_ids[
+            scores['correct_skeletons'].astype(np.int64)]
+        self.correct_segment_ids = scores['correct_segments'].astype(
+            segments.dtype)
+
+        if skeletons.edge_lengths is not None:
+            self.correct_lengths = scores['correct_lengths']
         else:
-            scores = skeleton_scores[skeleton_id]
+            self.correct_lengths = None
 
-        if segment_u == 0 or segment_v == 0:
-            scores.ommitted += 1
-            continue
+    @property
+    def merging_segments(self):
+        return np.unique(self.segments[self.node_merging])
 
-        if segment_u != segment_v:
-            scores.split += 1
+    def skeleton_scores(self):
+        '''Get a read-only dictionary view from skeleton IDs to
+        :class:`SkeletonScores`. Scores are created on access.'''
 
-            if return_merge_split_stats:
-                if skeleton_id not in splits:
-                    splits[skeleton_id] = []
-                splits[skeleton_id].append((segment_u, segment_v))
-            continue
+        return SkeletonScoresView(self)
 
-        # segment_u == segment_v != 0
-        segment = segment_u
+    def run_length_contributions(self):
+        '''Get the length and expected run-length contribution of each
+        skeleton, for use with :func:`expected_run_length_bootstrap`.
 
-        # potentially merged edge?
-        if skeleton_id in merged_skeletons:
-            if segment in merging_segments:
-                scores.merged += 1
-                continue
+        Returns:
 
-        scores.correct += 1
+            Tuple ``(lengths, contributions)`` of arrays aligned with
+            ``skeleton_ids``, where the contribution of a skeleton is the sum
+            of the squared correct lengths per segment.
+        '''
 
-        if segment not in scores.correct_edges:
-            scores.correct_edges[segment] = []
-        scores.correct_edges[segment].append((u, v))
+        if self.correct_lengths is None:
+            raise RuntimeError(
+                "SkeletonArrays need positions or edge lengths to compute the "
+                "expected run length")
 
-    if return_merge_split_stats:
+        _, lengths = self.skeletons.skeleton_lengths()
+        contributions = np.bincount(
+            np.searchsorted(self.skeleton_ids, self.correct_skeleton_ids),
+            weights=self.correct_lengths**2,
+            minlength=len(self.skeleton_ids))
+
+        return lengths, contributions
+
+    def merge_split_arrays(self):
+        '''Get the merge and split stats as arrays.
+
+        Returns:
 
-        merge_split_stats = {
-            'merge_stats': merges,
-            'split_stats': splits
+            A dictionary with keys ``merges``, a tuple of arrays ``(segment,
+            skeleton)`` with one entry for each skeleton merged into a
+            segment, and ``splits``, a tuple of arrays ``(skeleton,
+            segment_u, segment_v)`` with one entry for each split edge.
+        '''
+
+        merged = np.isin(self.segments, self.merging_segments)
+        segments, skeletons, _ = unique_pairs(
+            self.segments[merged],
+            self.skeletons.skeleton_ids[merged])
+
+        split = np.nonzero(self.edge_classes == SPLIT)[0]
+        split_skeletons = self.skeletons.edge_skeleton_ids[split]
+        order = np.argsort(split_skeletons, kind='stable')
+        split = split[order]
+
+        return {
+            'merges': (segments, skeletons),
+            'splits': (
+                split_skeletons[order],
+                self.segments[self.skeletons.edges[split, 0]],
+                self.segments[self.skeletons.edges[split, 1]])
         }
 
-        return skeleton_scores, merge_split_stats
+    def merge_split_stats(self):
+        '''Get the merge and split stats dictionaries (see
+        :func:`expected_run_length`), as read-only dictionary views on the
+        arrays of :meth:`merge_split_arrays`.'''
 
-    else:
+        arrays = self.merge_split_arrays()
 
-        return skeleton_scores
+        return {
+            'merge_stats': StatsView(*arrays['merges']),
+            'split_stats': StatsView(*arrays['splits'])
+        }
+
+    def _correct_edges(self, skeleton_index):
+
+        edge_order, edge_offsets = self.skeletons.skeleton_csr()
+        edges = edge_order[
+            edge_offsets[skeleton_index]:edge_offsets[skeleton_index + 1]]
+        edges = edges[self.edge_classes[edges] == CORRECT]
+
+        u = self.skeletons.edges[edges, 0]
+        v = self.skeletons.edges[edges, 1]
+
+        correct_edges = {}
+        for segment, u, v in zip(
+                self.segments[u].tolist(),
+                self.skeletons.node_ids[u].tolist(),
+                self.skeletons.node_ids[v].tolist()):
+            correct_edges.setdefault(segment, []).append((u, v))
+
+        return correct_edges
+
+
+class SkeletonScoresView(Mapping):
+    '''A read-only dictionary from skeleton IDs to :class:`SkeletonScores`,
+    backed by the arrays of a :class:`SkeletonEvaluation`.'''
+
+    def __init__(self, evaluation):
+        self.evaluation = evaluation
+
+    def __getitem__(self, skeleton_id):
+
+        evaluation = self.evaluation
+        i = np.searchsorted(evaluation.skeleton_ids, skeleton_id)
+        if (
+                i == len(evaluation.skeleton_ids) or
+                evaluation.skeleton_ids[i] != skeleton_id):
+            raise KeyError(skeleton_id)
+
+        correct_lengths = None
+        if evaluation.correct_lengths is not None:
+            correct_skeleton_ids = evaluation.correct_skeleton_ids
+            begin = np.searchsorted(correct_skeleton_ids, skeleton_id)
+            end = np.searchsorted(
+                correct_skeleton_ids,
+                skeleton_id,
+                side='right')
+            correct_lengths = dict(zip(
+                evaluation.correct_segment_ids[begin:end].tolist(),
+                evaluation.correct_lengths[begin:end].tolist()))
+
+        return SkeletonScores(
+            ommitted=int(evaluation.ommitted[i]),
+            split=int(evaluation.split[i]),
+            merged=int(evaluation.merged[i]),
+            correct=int(evaluation.correct[i]),
+            correct_lengths=correct_lengths,
+            get_correct_edges=partial(
+                evaluation._correct_edges,
+                evaluation._skeleton_indices[i]))
+
+    def __iter__(self):
+        return iter(self.evaluation.skeleton_ids.tolist())
+
+    def __len__(self):
+        return len(self.evaluation.skeleton_ids)
+
+
+class StatsView(Mapping):
+    '''A read-only dictionary view on merge or split stats stored in
+    arrays, mapping each key to the list of its values.
+
+    Args:
+
+        keys (ndarray):
+
+            The key of each entry, shape ``(K,)``. Entries with the same key
+            have to be next to each other.
+
+        *values (ndarray):
+
+            One or more arrays of shape ``(K,)``. If more than one is given,
+            the values are tuples.
+    '''
+
+    def __init__(self, keys, *values):
+
+        self.arrays = (keys,) + values
+
+        starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] + 1))
+        self._keys = keys[starts]
+        self._offsets = np.append(starts, len(keys))
+        self._sorter = np.argsort(self._keys, kind='stable')
+
+    def __getitem__(self, key):
+
+        i = np.searchsorted(self._keys, key, sorter=self._sorter)
+        if i == len(self._keys) or self._keys[self._sorter[i]] != key:
+            raise KeyError(key)
+        i = self._sorter[i]
+
+        values = [
+            v[self._offsets[i]:self._offsets[i + 1]].tolist()
+            for v in self.arrays[1:]
+        ]
+        if len(values) == 1:
+            return values[0]
+        return list(zip(*values))
+
+    def __iter__(self):
+        return iter(self._keys.tolist())
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# edge classes, as assigned by classify_edges
+CORRECT = 0
+OMITTED = 1
+SPLIT = 2
+MERGED = 3
+
+EDGE_CLASSES = [
+    ('ommitted', OMITTED),
+    ('split', SPLIT),
+    ('merged', MERGED),
+    ('correct', CORRECT)
+]
+
+
+class SegmentGroups():
+    '''Groups the nodes by segment, separately for each row of a ``(T, N)``
+    array of segment IDs, and finds the segments that merge skeletons.
+
+    Attributes:
+
+        node_groups (ndarray):
+
+            The group of each node, shape ``(T, N)``. Groups are numbered
+            consecutively over all rows.
+
+        group_rows, group_segments, group_skeletons (ndarray):
+
+            The row, segment ID, and (one) skeleton index of each group.
+
+        merging (ndarray):
+
+            Whether a group contains nodes of more than one skeleton.
+    '''
+
+    def __init__(self, segments, node_skeletons):
+
+        num_rows, num_nodes = segments.shape
+
+        # only one sort per row is needed to find all groups
+        order = np.argsort(segments, axis=1, kind='stable')
+        sorted_segments = np.take_along_axis(segments, order, axis=1)
+        sorted_skeletons = node_skeletons[order]
+
+        starts = np.ones(segments.shape, dtype=bool)
+        starts[:, 1:] = sorted_segments[:, 1:] != sorted_segments[:, :-1]
+        starts = starts.ravel()
+        group_starts = np.flatnonzero(starts)
+
+        self.num_groups = len(group_starts)
+        self.group_rows = group_starts//max(num_nodes, 1)
+        self.group_segments = sorted_segments.ravel()[group_starts]
+
+        sorted_skeletons = sorted_skeletons.ravel()
+        self.group_skeletons = sorted_skeletons[group_starts]
+        if self.num_groups > 0:
+            self.merging = (
+                np.minimum.reduceat(sorted_skeletons, group_starts) !=
+                np.maximum.reduceat(sorted_skeletons, group_starts))
+        else:
+            self.merging = np.zeros((0,), dtype=bool)
+
+        self.node_groups = np.empty(segments.shape, dtype=np.int64)
+        np.put_along_axis(
+            self.node_groups,
+            order,
+            (np.cumsum(starts) - 1).reshape(segments.shape),
+            axis=1)
+
+
+def classify_edges(edges, segments, groups):
+    '''Classify each skeleton edge as ``CORRECT``, ``OMITTED``, ``SPLIT``, or
+    ``MERGED``, for each row of a ``(T, N)`` array of segment IDs.'''
+
+    group_u = groups.node_groups[:, edges[:, 0]]
+    group_v = groups.node_groups[:, edges[:, 1]]
+
+    edge_classes = np.full(group_u.shape, CORRECT, dtype=np.uint8)
+
+    # a segment that merges skeletons is part of the edge's skeleton as well,
+    # so the skeleton is merged
+    edge_classes[groups.merging[group_u]] = MERGED
+    edge_classes[group_u != group_v] = SPLIT
+    edge_classes[np.logical_or(
+        segments[:, edges[:, 0]] == 0,
+        segments[:, edges[:, 1]] == 0)] = OMITTED
+
+    return edge_classes
+
+
+def unique_pairs(a, b):
+    '''Find the unique pairs ``(a[i], b[i])``, sorted by ``a`` and then
+    ``b``.
+
+    Returns:
+
+        Tuple ``(unique_a, unique_b, inverse)``, where ``inverse`` maps each
+        input pair to its index in the unique pairs.
+    '''
+
+    a_ids, a_index = np.unique(a, return_inverse=True)
+    b_ids, b_index = np.unique(b, return_inverse=True)
+
+    # encode pairs of dense indices as single integer keys, this is much
+    # faster than np.unique(..., axis=0)
+    keys = a_index.astype(np.int64)*len(b_ids) + b_index
+    keys, inverse = np.unique(keys, return_inverse=True)
+
+    num_b = max(len(b_ids), 1)
+
+    return a_ids[keys//num_b], b_ids[keys % num_b], inverse
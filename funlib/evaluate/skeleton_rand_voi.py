@@ -0,0 +1,97 @@
+from .rand_voi import rand_voi
+from .skeletons import SkeletonArrays
+import numpy as np
+
+
+def skeleton_rand_voi(
+        skeletons,
+        skeleton_id_attribute,
+        node_segment_lut,
+        weighting='nodes',
+        return_cluster_scores=False):
+    '''Compute Rand and VOI scores between skeletons and a segmentation, using
+    the skeleton nodes as samples instead of voxels.
+
+    The contingency table between skeleton IDs and segment IDs is built from
+    the skeleton nodes and evaluated with the same formulas as
+    :func:`rand_voi`, with the skeletons taking the role of the ground-truth.
+    Segment 0 is treated like any other segment.
+
+    Args:
+
+        skeletons:
+
+            A networkx-like graph or a :class:`SkeletonArrays` instance.
+
+        skeleton_id_attribute:
+
+            The name of the node attribute containing the skeleton ID. Not
+            used for :class:`SkeletonArrays`.
+
+        node_segment_lut:
+
+            A dictionary mapping node IDs to segment IDs. For
+            :class:`SkeletonArrays`, this can also be an array of segment IDs
+            aligned with ``node_ids``.
+
+        weighting (string, optional):
+
+            How to weigh each node. ``'nodes'`` counts every node once.
+            ``'edge_length'`` weighs each node with half of the length of its
+            incident edges, such that the scores do not depend on the
+            sampling density along the skeletons. Requires edge lengths.
+
+        return_cluster_scores (optional):
+
+            If ``True``, also return the VOI contributions per skeleton
+            (``voi_split_i``) and per segment (``voi_merge_j``).
+
+    Returns:
+
+        A dictionary with the same keys as returned by :func:`rand_voi`.
+    '''
+
+    if not isinstance(skeletons, SkeletonArrays):
+        skeletons = SkeletonArrays.from_graph(
+            skeletons,
+            skeleton_id_attribute)
+
+    segments = skeletons.node_segments(node_segment_lut).astype(np.uint64)
+
+    # skeleton IDs can be 0, which rand_voi would ignore
+    skeleton_ids, node_skeletons = skeletons.skeleton_index()
+    labels = (node_skeletons + 1).astype(np.uint64)
+
+    if weighting == 'nodes':
+        weights = None
+    elif weighting == 'edge_length':
+        if skeletons.edge_lengths is None:
+            raise RuntimeError(
+                "SkeletonArrays need positions or edge lengths for "
+                "weighting='edge_length'")
+        half_lengths = skeletons.edge_lengths/2
+        weights = (
+            np.bincount(
+                skeletons.edges[:, 0],
+                weights=half_lengths,
+                minlength=skeletons.num_nodes) +
+            np.bincount(
+                skeletons.edges[:, 1],
+                weights=half_lengths,
+                minlength=skeletons.num_nodes))
+    else:
+        raise ValueError("Unknown weighting %s" % weighting)
+
+    metrics = rand_voi(
+        labels,
+        segments,
+        return_cluster_scores=return_cluster_scores,
+        weights=weights)
+
+    if return_cluster_scores:
+        metrics['voi_split_i'] = {
+            skeleton_ids[label - 1].item(): score
+            for label, score in metrics['voi_split_i'].items()
+        }
+
+    return metrics
@@ -0,0 +1,114 @@
+from libc.stdint cimport uint8_t, uint64_t
+import numpy as np
+cimport numpy as np
+from .profiling import add_count, contiguous, timer
+
+def skeleton_scores_cpp(
+        np.ndarray[uint64_t] node_segments,
+        np.ndarray[uint64_t] node_skeletons,
+        np.ndarray[uint64_t] edge_offsets,
+        np.ndarray[uint64_t] edges_u,
+        np.ndarray[uint64_t] edges_v,
+        np.ndarray[double] edge_lengths,
+        size_t num_workers=1):
+    '''Classify skeleton edges (given in CSR form, sorted by skeleton) and sum
+    the correct edge lengths per (skeleton, segment) pair, using
+    `num_workers` threads over contiguous ranges of skeletons.
+
+    Returns a dictionary with the keys `edge_classes`, `counts` (number of
+    edges per class and skeleton), `node_merging`, `correct_skeletons`,
+    `correct_segments`, and `correct_lengths`.'''
+
+    # the C++ part assumes contiguous memory, make sure we have it (and do
+    # nothing, if we do)
+    node_segments = contiguous(node_segments, 'skeleton_scores')
+    node_skeletons = contiguous(node_skeletons, 'skeleton_scores')
+    edge_offsets = contiguous(edge_offsets, 'skeleton_scores')
+    edges_u = contiguous(edges_u, 'skeleton_scores')
+    edges_v = contiguous(edges_v, 'skeleton_scores')
+    edge_lengths = contiguous(edge_lengths, 'skeleton_scores')
+
+    cdef size_t num_nodes = node_segments.size
+    cdef size_t num_edges = edges_u.size
+    cdef size_t num_skeletons = edge_offsets.size - 1
+    cdef size_t num_pairs
+
+    assert node_skeletons.size == num_nodes
+    assert edges_v.size == num_edges
+    assert edge_lengths.size == num_edges
+    assert edge_offsets[num_skeletons] == num_edges
+
+    cdef np.ndarray[uint8_t] edge_classes = np.zeros(
+        (num_edges,), dtype=np.uint8)
+    cdef np.ndarray[uint64_t, ndim=2] counts = np.zeros(
+        (num_skeletons, 4), dtype=np.uint64)
+    cdef np.ndarray[uint8_t] node_merging = np.zeros(
+        (num_nodes,), dtype=np.uint8)
+    cdef np.ndarray[uint64_t] correct_skeletons = np.zeros(
+        (num_edges,), dtype=np.uint64)
+    cdef np.ndarray[uint64_t] correct_segments = np.zeros(
+        (num_edges,), dtype=np.uint64)
+    cdef np.ndarray[double] correct_lengths = np.zeros(
+        (num_edges,), dtype=np.float64)
+
+    cdef uint64_t* node_segments_data = <uint64_t*>node_segments.data
+    cdef uint64_t* node_skeletons_data = <uint64_t*>node_skeletons.data
+    cdef uint64_t* edge_offsets_data = <uint64_t*>edge_offsets.data
+    cdef uint64_t* edges_u_data = <uint64_t*>edges_u.data
+    cdef uint64_t* edges_v_data = <uint64_t*>edges_v.data
+    cdef double* edge_lengths_data = <double*>edge_lengths.data
+    cdef uint8_t* edge_classes_data = <uint8_t*>edge_classes.data
+    cdef uint64_t* counts_data = <uint64_t*>counts.data
+    cdef uint8_t* node_merging_data = <uint8_t*>node_merging.data
+    cdef uint64_t* correct_skeletons_data = <uint64_t*>correct_skeletons.data
+    cdef uint64_t* correct_segments_data = <uint64_t*>correct_segments.data
+    cdef double* correct_lengths_data = <double*>correct_lengths.data
+
+    add_count('skeleton_scores.nodes', num_nodes)
+    add_count('skeleton_scores.edges', num_edges)
+    with timer('skeleton_scores'):
+        with nogil:
+            num_pairs = skeleton_scores(
+                num_nodes,
+                num_skeletons,
+                node_segments_data,
+                node_skeletons_data,
+                edge_offsets_data,
+                edges_u_data,
+                edges_v_data,
+                edge_lengths_data,
+                edge_classes_data,
+                counts_data,
+                node_merging_data,
+                correct_skeletons_data,
+                correct_segments_data,
+                correct_lengths_data,
+                num_workers)
+
+    return {
+        'edge_classes': edge_classes,
+        'counts': counts,
+        'node_merging': node_merging.astype(bool),
+        'correct_skeletons': correct_skeletons[:num_pairs],
+        'correct_segments': correct_segments[:num_pairs],
+        'correct_lengths': correct_lengths[:num_pairs]
+    }
+
+cdef extern from "impl/skeleton_scores.hpp":
+
+    size_t skeleton_scores(
+            size_t          num_nodes,
+            size_t          num_skeletons,
+            const uint64_t* node_segments,
+            const uint64_t* node_skeletons,
+            const uint64_t* edge_offsets,
+            const uint64_t* edges_u,
+            const uint64_t* edges_v,
+            const double*   edge_lengths,
+            uint8_t*        edge_classes,
+            uint64_t*       counts,
+            uint8_t*        node_merging,
+            uint64_t*       correct_skeletons,
+            uint64_t*       correct_segments,
+            double*         correct_lengths,
+            size_t          num_workers) nogil
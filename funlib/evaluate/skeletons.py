@@ -0,0 +1,389 @@
+from .profiling import timer
+import numpy as np
+import os
+
+
+class SkeletonArrays():
+    '''A compact, array-backed representation of a set of skeletons, to be
+    used in place of a networkx graph by the functions in ``run_length``.
+
+    Nodes are stored in arrays of length ``N``, edges as pairs of indices
+    into these arrays (not node IDs).
+
+    Args:
+
+        node_ids (array-like):
+
+            The IDs of the nodes, shape ``(N,)``.
+
+        skeleton_ids (array-like):
+
+            The skeleton ID of each node, shape ``(N,)``.
+
+        edges (array-like):
+
+            Pairs of node indices (into ``node_ids``), shape ``(E, 2)``.
+
+        positions (array-like, optional):
+
+            The spatial coordinates of each node, shape ``(N, ndim)``.
+
+        edge_lengths (array-like, optional):
+
+            The length of each edge, shape ``(E,)``. If not given but
+            ``positions`` are, the lengths will be computed from the
+            positions.
+    '''
+
+    def __init__(
+            self,
+            node_ids,
+            skeleton_ids,
+            edges,
+            positions=None,
+            edge_lengths=None):
+
+        self.node_ids = np.asarray(node_ids)
+        self.skeleton_ids = np.asarray(skeleton_ids)
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.positions = None
+        self.edge_lengths = None
+
+        assert self.node_ids.shape == self.skeleton_ids.shape, (
+            "node_ids and skeleton_ids need to have the same shape")
+
+        if positions is not None:
+            self.positions = np.asarray(positions)
+            if self.positions.ndim == 1:
+                self.positions = self.positions[:, np.newaxis]
+            assert len(self.positions) == self.num_nodes, (
+                "positions need to be given for each node")
+
+        if edge_lengths is not None:
+            self.edge_lengths = np.asarray(edge_lengths)
+            assert self.edge_lengths.shape == (self.num_edges,), (
+                "edge_lengths need to be given for each edge")
+        elif self.positions is not None:
+            self.edge_lengths = self.compute_edge_lengths()
+
+        self._node_sorter = None
+        self._skeleton_index = None
+        self._skeleton_csr = None
+
+    @classmethod
+    @timer('SkeletonArrays.from_graph')
+    def from_graph(
+            cls,
+            graph,
+            skeleton_id_attribute,
+            position_attributes=None,
+            edge_length_attribute=None):
+        '''Create skeleton arrays from a networkx-like graph.
+
+        Args:
+
+            graph:
+
+                A networkx-like graph.
+
+            skeleton_id_attribute:
+
+                The name of the node attribute containing the skeleton ID.
+
+            position_attributes (optional):
+
+                A list of strings with the names of the node attributes for
+                the spatial coordinates.
+
+            edge_length_attribute (optional):
+
+                The name of the edge attribute holding precomputed edge
+                lengths.
+        '''
+
+        node_ids = np.array(list(graph.nodes()))
+        node_data = [data for _, data in graph.nodes(data=True)]
+
+        skeleton_ids = np.array([
+            data[skeleton_id_attribute]
+            for data in node_data
+        ])
+
+        edge_list = list(graph.edges())
+        if node_ids.dtype.kind in 'iu':
+            # map node IDs to indices in bulk
+            sorter = np.argsort(node_ids, kind='stable')
+            edges = sorter[np.searchsorted(
+                node_ids[sorter],
+                np.array(edge_list, dtype=node_ids.dtype).reshape(-1, 2))]
+        else:
+            node_index = {n: i for i, n in enumerate(graph.nodes())}
+            edges = np.array(
+                [[node_index[u], node_index[v]] for u, v in edge_list],
+                dtype=np.int64)
+
+        positions = None
+        if position_attributes is not None:
+            positions = np.stack(
+                [
+                    np.array([data[d] for data in node_data],
+                             dtype=np.float64)
+                    for d in position_attributes
+                ],
+                axis=1).reshape(-1, len(position_attributes))
+
+        edge_lengths = None
+        if edge_length_attribute is not None and positions is None:
+            edge_lengths = np.array(
+                [
+                    data[edge_length_attribute]
+                    for _, _, data in graph.edges(data=True)
+                ],
+                dtype=np.float64)
+
+        return cls(node_ids, skeleton_ids, edges, positions, edge_lengths)
+
+    def save(self, path):
+        '''Save the skeletons to disk.
+
+        If ``path`` ends in ``.npz``, all arrays are stored in a single
+        (uncompressed) NumPy archive. Otherwise, ``path`` is a directory that
+        will contain one ``.npy`` file per array, which can be memory-mapped
+        by :meth:`load`.
+
+        Besides the arrays given to the constructor, the skeleton index and
+        the CSR edge order (see :meth:`skeleton_csr`) are stored as well, such
+        that they don't have to be recomputed after loading.
+        '''
+
+        path = str(path)
+        arrays = self._arrays()
+
+        if path.endswith('.npz'):
+            np.savez(path, **arrays)
+            return
+
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + '.npy'), array)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        '''Load skeletons stored with :meth:`save`.
+
+        Args:
+
+            path (string):
+
+                The ``.npz`` file or directory the skeletons were saved to.
+
+            mmap_mode (string, optional):
+
+                How to memory-map arrays stored in a directory, see
+                ``numpy.load``. Use ``None`` to read them into memory. Arrays
+                in ``.npz`` files are always read into memory.
+        '''
+
+        path = str(path)
+
+        if path.endswith('.npz'):
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        else:
+            arrays = {
+                name: np.load(
+                    os.path.join(path, name + '.npy'),
+                    mmap_mode=mmap_mode)
+                for name in cls._array_names
+                if os.path.exists(os.path.join(path, name + '.npy'))
+            }
+
+        skeletons = cls(
+            arrays['node_ids'],
+            arrays['skeleton_ids'],
+            arrays['edges'],
+            arrays.get('positions'),
+            arrays.get('edge_lengths'))
+
+        if 'unique_skeleton_ids' in arrays:
+            skeletons._skeleton_index = (
+                arrays['unique_skeleton_ids'],
+                arrays['node_skeletons'])
+        if 'edge_order' in arrays:
+            skeletons._skeleton_csr = (
+                arrays['edge_order'],
+                arrays['edge_offsets'])
+
+        return skeletons
+
+    _array_names = [
+        'node_ids',
+        'skeleton_ids',
+        'edges',
+        'positions',
+        'edge_lengths',
+        'unique_skeleton_ids',
+        'node_skeletons',
+        'edge_order',
+        'edge_offsets'
+    ]
+
+    def _arrays(self):
+
+        unique_skeleton_ids, node_skeletons = self.skeleton_index()
+        edge_order, edge_offsets = self.skeleton_csr()
+
+        arrays = {
+            'node_ids': self.node_ids,
+            'skeleton_ids': self.skeleton_ids,
+            'edges': self.edges,
+            'positions': self.positions,
+            'edge_lengths': self.edge_lengths,
+            'unique_skeleton_ids': unique_skeleton_ids,
+            'node_skeletons': node_skeletons,
+            'edge_order': edge_order,
+            'edge_offsets': edge_offsets
+        }
+
+        return {
+            name: np.asarray(array)
+            for name, array in arrays.items()
+            if array is not None
+        }
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    @property
+    def edge_skeleton_ids(self):
+        '''The skeleton ID of each edge (taken from the first node).'''
+        return self.skeleton_ids[self.edges[:, 0]]
+
+    def skeleton_index(self):
+        '''Get the unique skeleton IDs and the index of each node's skeleton
+        into them. Computed once and cached.'''
+
+        if self._skeleton_index is None:
+            self._skeleton_index = np.unique(
+                self.skeleton_ids,
+                return_inverse=True)
+
+        return self._skeleton_index
+
+    def skeleton_csr(self):
+        '''Get the edges sorted by skeleton, in compressed sparse row form.
+        Computed once and cached.
+
+        Returns:
+
+            Tuple ``(edge_order, edge_offsets)``, such that
+            ``edges[edge_order]`` are sorted by skeleton and the edges of
+            skeleton ``s`` (an index into the unique skeleton IDs) are
+            ``edges[edge_order[edge_offsets[s]:edge_offsets[s + 1]]]``.
+        '''
+
+        if self._skeleton_csr is None:
+
+            skeleton_ids, node_skeletons = self.skeleton_index()
+            edge_skeletons = node_skeletons[self.edges[:, 0]]
+
+            edge_order = np.argsort(edge_skeletons, kind='stable')
+            edge_offsets = np.zeros(
+                (len(skeleton_ids) + 1,),
+                dtype=np.uint64)
+            edge_offsets[1:] = np.cumsum(np.bincount(
+                edge_skeletons,
+                minlength=len(skeleton_ids)))
+
+            self._skeleton_csr = (edge_order, edge_offsets)
+
+        return self._skeleton_csr
+
+    def compute_edge_lengths(self, voxel_size=None):
+        '''Compute the Euclidean length of each edge from the node
+        positions.
+
+        Args:
+
+            voxel_size (optional):
+
+                A scaling factor per spatial dimension, applied to the
+                positions before measuring the lengths.
+        '''
+
+        if self.positions is None:
+            raise RuntimeError("Node positions are needed to compute lengths")
+
+        offsets = (
+            self.positions[self.edges[:, 0]] -
+            self.positions[self.edges[:, 1]])
+
+        if voxel_size is not None:
+            offsets = offsets*np.asarray(voxel_size, dtype=np.float64)
+
+        return np.linalg.norm(offsets, axis=1)
+
+    def skeleton_lengths(self):
+        '''Get the length of each skeleton that has at least one edge.
+
+        Returns:
+
+            Tuple ``(skeleton_ids, lengths)`` of arrays.
+        '''
+
+        if self.edge_lengths is None:
+            raise RuntimeError(
+                "Edge lengths are not known, give positions or edge_lengths")
+
+        skeleton_ids, node_skeletons = self.skeleton_index()
+        _, edge_offsets = self.skeleton_csr()
+        lengths = np.bincount(
+            node_skeletons[self.edges[:, 0]],
+            weights=self.edge_lengths,
+            minlength=len(skeleton_ids))
+        has_edges = edge_offsets[1:] > edge_offsets[:-1]
+
+        return skeleton_ids[has_edges], lengths[has_edges]
+
+    def node_indices(self, node_ids):
+        '''Get the indices of the given node IDs into the node arrays.'''
+
+        if self._node_sorter is None:
+            self._node_sorter = np.argsort(self.node_ids, kind='stable')
+
+        node_ids = np.asarray(node_ids)
+        sorted_ids = self.node_ids[self._node_sorter]
+        positions = np.searchsorted(sorted_ids, node_ids)
+        positions = np.minimum(positions, max(self.num_nodes - 1, 0))
+
+        if self.num_nodes == 0 or np.any(sorted_ids[positions] != node_ids):
+            raise KeyError("Not all node IDs are part of the skeletons")
+
+        return self._node_sorter[positions]
+
+    def node_segments(self, node_segment_lut):
+        '''Convert a node -> segment lookup table into an array of segment IDs
+        aligned with ``node_ids``.
+
+        Args:
+
+            node_segment_lut:
+
+                Either a dictionary mapping node IDs to segment IDs, or an
+                array of segment IDs aligned with ``node_ids``.
+        '''
+
+        if isinstance(node_segment_lut, dict):
+            return np.array(
+                [node_segment_lut[n] for n in self.node_ids.tolist()])
+
+        segments = np.asarray(node_segment_lut)
+        assert segments.shape == (self.num_nodes,), (
+            "node_segment_lut needs to be aligned with node_ids")
+
+        return segments
@@ -1,8 +1,18 @@
+from .profiling import add_count, timer
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order, maximum_flow
 from scipy.spatial import cKDTree as KDTree
-import graph_tool
-import graph_tool.flow
+import heapq
+import networkx
 import numpy as np
-import time
+
+try:
+    import graph_tool
+    import graph_tool.flow
+    _have_graph_tool = True
+except ImportError:
+    _have_graph_tool = False
 
 
 def split_graph(
@@ -10,13 +20,24 @@ def split_graph(
         components,
         position_attributes,
         weight_attribute,
-        split_attribute):
-    '''Recursively split a graph via min-cuts such that the given component
-    nodes are separated.
-
-    In every iteration, the two largest components that are not split are
-    selected, and a min-cut is sought between the two closest nodes of these
-    two components.
+        split_attribute,
+        num_workers=1,
+        backend=None,
+        mode='recursive',
+        return_cut_weight=False):
+    '''Split a graph via min-cuts such that the given component nodes are
+    separated.
+
+    In the default ``'recursive'`` mode, the two largest components that are
+    not split are selected in every iteration, and a min-cut is sought between
+    the two closest nodes of these two components.
+
+    In ``'multiway'`` mode, all components are separated at once with the
+    isolation heuristic: each component is cut from all other components
+    (merged into a single sink) with one max-flow on the full graph. The
+    heaviest of these isolating cuts is discarded, the remaining ones are
+    combined. The total cut weight is at most ``2 - 2/k`` times the optimum
+    for ``k`` components.
 
     Args:
 
@@ -43,161 +64,747 @@ def split_graph(
             The name of the node attribute in which to store the ID of the
             split each node ended up in.
 
+        num_workers (``int``, optional):
+
+            If larger than 1, split independent parts of the graph in a pool
+            of this many processes.
+
+        backend (``string``, optional):
+
+            The min-cut implementation to use, ``'graph_tool'`` or
+            ``'scipy'``. Defaults to ``'graph_tool'`` if it is installed.
+
+        mode (``string``, optional):
+
+            How to separate the components, ``'recursive'`` or
+            ``'multiway'`` (see above).
+
+        return_cut_weight (``bool``, optional):
+
+            If ``True``, also return the summed weight of all edges between
+            different splits.
+
     Returns:
 
-        The number of splits performed.
+        The number of splits performed, i.e., the number of min-cuts. In
+        ``'multiway'`` mode, this is one per component. If
+        ``return_cut_weight`` is set, a tuple ``(num_splits, cut_weight)``.
     '''
 
-    # number nodes consecutively in graph
-    for i, (_, data) in enumerate(graph.nodes(data=True)):
-        data['_gt_id'] = i
+    node_ids = list(graph.nodes())
+    node_index = {n: i for i, n in enumerate(node_ids)}
 
-    # map components to positions
-    component_node_positions = {
-        graph.nodes[n]['_gt_id']: np.array([
-            graph.nodes[n][p] for p in position_attributes
-        ])
-        for component in components
-        for n in component
-    }
-
-    # replace component node IDs with gt graph IDs
+    # positions are only needed for component nodes
     components = [
-        [graph.nodes[n]['_gt_id'] for n in component]
+        [node_index[n] for n in component]
         for component in components
     ]
-
-    # create edge list
-    edges = np.array([
-        [graph.nodes[u]['_gt_id'], graph.nodes[v]['_gt_id']]
-        for u, v in graph.edges()])
-
-    # create weights list
+    positions = np.zeros((len(node_ids), len(position_attributes)))
+    for component in components:
+        for i in component:
+            data = graph.nodes[node_ids[i]]
+            positions[i] = [data[p] for p in position_attributes]
+
+    edges = np.array(
+        [[node_index[u], node_index[v]] for u, v in graph.edges()],
+        dtype=np.int64).reshape(-1, 2)
     weights = np.array(
         [d[weight_attribute] for _, _, d in graph.edges(data=True)],
         dtype=np.float32)
 
-    # create graph_tool graph
-    gt_graph = graph_tool.Graph()
-    gt_graph.add_edge_list(edges)
-    gt_graph.add_edge_list(edges[:, [1, 0]])  # edges are directed
-    weights = gt_graph.new_edge_property(
-        'double',
-        np.concatenate([weights, weights]))
-    split_labels = gt_graph.new_vertex_property('int64_t', val=-1)
-
-    # recursively split the graph
-    num_splits = rec_split_graph(
-        gt_graph,
+    result = split_graph_arrays(
+        edges,
         weights,
+        positions,
         components,
-        component_node_positions,
-        split_labels,
-        0)[0]
+        num_workers=num_workers,
+        backend=backend,
+        mode=mode,
+        return_cut_weight=return_cut_weight)
+    split_labels = result[0]
 
-    for i, (_, data) in enumerate(graph.nodes(data=True)):
-        data[split_attribute] = split_labels[i]
+    networkx.set_node_attributes(
+        graph,
+        dict(zip(node_ids, split_labels.tolist())),
+        split_attribute)
 
-    return num_splits
+    if return_cut_weight:
+        return result[1:]
+    return result[1]
 
 
-def rec_split_graph(
-        graph,
+def split_graph_arrays(
+        edges,
         weights,
+        positions,
         components,
-        component_node_positions,
-        split_labels,
-        next_split_id):
+        num_workers=1,
+        backend=None,
+        mode='recursive',
+        return_cut_weight=False):
+    '''Split a graph given as arrays via min-cuts such that the given
+    component nodes are separated. See :func:`split_graph` for details.
 
-    # nothing to split?
-    if len(components) <= 1:
-        for node in graph.vertices():
-            split_labels[node] = next_split_id
-        return 0, next_split_id + 1
+    Args:
 
-    # find split nodes
-    component_u, component_v = select_split_component(components)
-    u, v = select_split_nodes(
-        component_u,
-        component_v,
-        component_node_positions)
+        edges (``ndarray``):
 
-    # split graph
-    partition = min_cut(graph, u, v, weights)
+            Pairs of node indices, shape ``(E, 2)``. Nodes are numbered
+            ``0, ..., N-1``.
 
-    # split recursively
+        weights (``ndarray``):
 
-    prev_partition = graph.get_vertex_filter()[0]
+            The weight of each edge for the min-cut, shape ``(E,)``.
 
-    graph.set_vertex_filter(partition)
-    component_nodes_u = filter_component_nodes(graph, components)
-    num_splits_needed_u, next_split_id = rec_split_graph(
-        graph,
-        weights,
-        component_nodes_u,
-        component_node_positions,
-        split_labels,
-        next_split_id)
-
-    if prev_partition:
-        partition.a = np.logical_and(
-            np.logical_not(partition.a),
-            prev_partition.a)
+        positions (``ndarray``):
+
+            The spatial position of each node, shape ``(N, ndim)``. Only the
+            positions of component nodes are used.
+
+        components (``list`` of arrays of node indices):
+
+            The nodes to separate from each other. Empty components are
+            ignored.
+
+        num_workers (``int``, optional):
+
+            If larger than 1, split independent parts of the graph in a pool
+            of this many processes.
+
+        backend (``string``, optional):
+
+            The min-cut implementation to use, ``'graph_tool'`` or
+            ``'scipy'``. Defaults to ``'graph_tool'`` if it is installed.
+
+        mode (``string``, optional):
+
+            How to separate the components, ``'recursive'`` or
+            ``'multiway'``.
+
+        return_cut_weight (``bool``, optional):
+
+            If ``True``, also return the summed weight of all edges between
+            different splits.
+
+    Returns:
+
+        Tuple ``(split_labels, num_splits)``, where ``split_labels`` is an
+        array with the ID of the split each node ended up in. In
+        ``'multiway'`` mode, split IDs follow the order of the (non-empty)
+        components. If ``return_cut_weight`` is set, the cut weight is
+        appended to the tuple.
+    '''
+
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    weights = np.asarray(weights)
+    positions = np.asarray(positions)
+    if positions.ndim == 1:
+        positions = positions[:, np.newaxis]
+    components = component_heap([
+        SplitComponent(i, np.asarray(component, dtype=np.int64))
+        for i, component in enumerate(components)
+        if len(component) > 0
+    ])
+    num_nodes = len(positions)
+
+    assert len(weights) == len(edges), (
+        "weights need to be given for each edge")
+
+    if backend is None:
+        backend = 'graph_tool' if _have_graph_tool else 'scipy'
+    if backend not in MIN_CUT_BACKENDS:
+        raise ValueError("Unknown min-cut backend %s" % backend)
+    if backend == 'graph_tool' and not _have_graph_tool:
+        raise ImportError("graph_tool is not installed")
+    if mode not in ('recursive', 'multiway'):
+        raise ValueError("Unknown split mode %s" % mode)
+
+    add_count('split_graph.nodes', num_nodes)
+    add_count('split_graph.edges', len(edges))
+
+    with timer('split_graph'):
+        if mode == 'multiway':
+            split_labels, num_splits = multiway_cut(
+                num_nodes,
+                edges,
+                weights,
+                components,
+                backend,
+                num_workers)
+        # split the graph until all components are separated
+        elif num_workers > 1:
+            split_labels, num_splits = split_graph_parallel(
+                num_nodes,
+                edges,
+                weights,
+                components,
+                positions,
+                backend,
+                num_workers)
+        else:
+            split_labels, num_splits = split_subgraph(
+                num_nodes,
+                edges,
+                weights,
+                components,
+                positions,
+                backend)
+    add_count('split_graph.min_cuts', num_splits)
+
+    if return_cut_weight:
+        return (
+            split_labels,
+            num_splits,
+            cut_weight(edges, weights, split_labels))
+    return split_labels, num_splits
+
+
+class GraphToolMinCut():
+    '''Min-cuts on partitions of a graph with graph_tool's Boykov-Kolmogorov
+    max-flow.
+
+    ``u`` and ``v`` are single nodes or arrays of nodes. Sets of nodes are
+    connected to an auxiliary source or sink with edges that are never
+    cut.'''
+
+    def __init__(self, num_nodes, edges, weights, terminals=None):
+
+        self.num_nodes = num_nodes
+        self.edges = np.concatenate([edges, edges[:, [1, 0]]])
+        self.edge_weights = np.concatenate([weights, weights])
+
+        self.graph = graph_tool.Graph()
+        self.graph.add_vertex(num_nodes)
+        self.graph.add_edge_list(self.edges)  # edges are directed
+        self.weights = self.graph.new_edge_property(
+            'double',
+            self.edge_weights)
+
+    def __call__(self, mask, u, v):
+
+        if np.ndim(u) > 0 or np.ndim(v) > 0:
+            return self.terminal_cut(mask, u, v)
+
+        subgraph = graph_tool.GraphView(self.graph, vfilt=mask)
+        partition = min_cut(subgraph, u, v, self.weights)
+
+        return np.logical_and(partition.a.astype(bool), mask)
+
+    def terminal_cut(self, mask, sources, sinks):
+
+        source = self.num_nodes
+        sink = self.num_nodes + 1
+        sources = np.atleast_1d(sources)
+        sinks = np.atleast_1d(sinks)
+
+        terminal_edges = np.concatenate([
+            np.stack([np.full_like(sources, source), sources], axis=1),
+            np.stack([sinks, np.full_like(sinks, sink)], axis=1)
+        ])
+        terminal_edges = np.concatenate([
+            terminal_edges,
+            terminal_edges[:, [1, 0]]
+        ])
+        infinity = np.sum(self.edge_weights) + 1
+
+        graph = graph_tool.Graph()
+        graph.add_vertex(self.num_nodes + 2)
+        graph.add_edge_list(self.edges)
+        graph.add_edge_list(terminal_edges)
+        weights = graph.new_edge_property(
+            'double',
+            np.concatenate([
+                self.edge_weights,
+                np.full((len(terminal_edges),), infinity)
+            ]))
+
+        subgraph = graph_tool.GraphView(
+            graph,
+            vfilt=np.concatenate([mask, [True, True]]))
+        partition = min_cut(subgraph, source, sink, weights)
+
+        return np.logical_and(
+            partition.a[:self.num_nodes].astype(bool),
+            mask)
+
+
+class ScipyMinCut():
+    '''Min-cuts on partitions of a graph with
+    ``scipy.sparse.csgraph.maximum_flow``.
+
+    The max-flow needs integer capacities, weights are therefore scaled such
+    that the weighted degree of each node fits into 30 bits and rounded.
+
+    ``u`` and ``v`` are single nodes or arrays of nodes. Sets of nodes are
+    contracted into a single node. If such sets are used, they have to be
+    passed as ``terminals`` to the constructor, such that their weighted
+    degree fits into 30 bits as well.'''
+
+    def __init__(self, num_nodes, edges, weights, terminals=None):
+
+        weights = np.asarray(weights, dtype=np.float64)
+        if np.any(weights < 0):
+            raise ValueError("Min-cut weights have to be non-negative")
+
+        # the flow through a node is bounded by its weighted degree
+        weighted_degrees = np.bincount(
+            edges.ravel(),
+            weights=np.repeat(weights, 2),
+            minlength=num_nodes)
+        max_degree = np.max(weighted_degrees, initial=0)
+        for nodes in terminals or []:
+            max_degree = max(max_degree, np.sum(weighted_degrees[nodes]))
+        scale = (2**30 - 1)/max_degree if max_degree > 0 else 1.0
+
+        # zero capacities and self-loops carry no flow
+        capacities = np.round(weights*scale).astype(np.int32)
+        keep = np.logical_and(capacities > 0, edges[:, 0] != edges[:, 1])
+
+        self.num_nodes = num_nodes
+        self.edges = edges[keep]
+        self.capacities = capacities[keep]
+
+    def __call__(self, mask, u, v):
+
+        nodes = np.nonzero(mask)[0]
+        local_ids = np.full((self.num_nodes,), -1, dtype=np.int64)
+        local_ids[nodes] = np.arange(len(nodes))
+
+        # contract sets of source and sink nodes
+        u = np.atleast_1d(u)
+        v = np.atleast_1d(v)
+        source = local_ids[u[0]]
+        sink = local_ids[v[0]]
+        local_ids[u] = source
+        local_ids[v] = sink
+
+        local_edges = local_ids[self.edges]
+        inside = np.logical_and(
+            np.all(local_edges >= 0, axis=1),
+            local_edges[:, 0] != local_edges[:, 1])
+        local_edges = local_edges[inside]
+        capacities = self.capacities[inside]
+
+        capacity = csr_matrix(
+            (
+                np.concatenate([capacities, capacities]),
+                (
+                    np.concatenate([local_edges[:, 0], local_edges[:, 1]]),
+                    np.concatenate([local_edges[:, 1], local_edges[:, 0]])
+                )
+            ),
+            shape=(len(nodes), len(nodes)),
+            dtype=np.int32)
+
+        flow = maximum_flow(capacity, source, sink).flow
+
+        # the source side of the min-cut is everything reachable from the
+        # source in the residual graph
+        residual = csr_matrix(capacity - flow)
+        residual.eliminate_zeros()
+        reachable = breadth_first_order(
+            residual,
+            source,
+            directed=True,
+            return_predecessors=False)
+
+        local_mask_u = np.zeros((len(nodes),), dtype=bool)
+        local_mask_u[reachable] = True
+
+        mask_u = np.zeros((self.num_nodes,), dtype=bool)
+        mask_u[nodes] = local_mask_u[local_ids[nodes]]
+
+        return mask_u
+
+
+MIN_CUT_BACKENDS = {
+    'graph_tool': GraphToolMinCut,
+    'scipy': ScipyMinCut
+}
+
+
+def multiway_cut(num_nodes, edges, weights, components, backend, num_workers):
+    '''Separate all components at once with the isolation heuristic.
+
+    Computes one isolating cut per component against all other components,
+    in a process pool if ``num_workers`` is larger than 1. Nodes on the
+    source side of an isolating cut get the split ID of its component (split
+    IDs follow the component order), all other nodes are assigned to the
+    component with the heaviest isolating cut. Returns the split ID of each
+    node and the number of min-cuts computed.'''
+
+    terminals = [
+        c.nodes
+        for _, _, c in sorted(components, key=lambda entry: entry[2].index)
+    ]
+    num_terminals = len(terminals)
+
+    split_labels = np.zeros((num_nodes,), dtype=np.int64)
+    if num_terminals <= 1:
+        return split_labels, 0
+
+    if num_workers > 1:
+        chunks = np.array_split(np.arange(num_terminals), num_workers)
+        with ProcessPoolExecutor(num_workers) as executor:
+            futures = [
+                executor.submit(
+                    isolating_cuts,
+                    num_nodes,
+                    edges,
+                    weights,
+                    terminals,
+                    chunk,
+                    backend)
+                for chunk in chunks
+                if len(chunk) > 0
+            ]
+            sides = [side for f in futures for side in f.result()]
     else:
-        partition.a = np.logical_not(partition.a)
+        sides = isolating_cuts(
+            num_nodes,
+            edges,
+            weights,
+            terminals,
+            range(num_terminals),
+            backend)
+
+    cut_weights = []
+    for side in sides:
+        mask = np.zeros((num_nodes,), dtype=bool)
+        mask[side] = True
+        cut_weights.append(cut_weight(edges, weights, mask))
+
+    # drop the heaviest cut, its component keeps all remaining nodes
+    heaviest = int(np.argmax(cut_weights))
+    split_labels[:] = heaviest
+    for i in np.argsort(cut_weights, kind='stable'):
+        if i == heaviest:
+            continue
+        side = sides[i]
+        split_labels[side[split_labels[side] == heaviest]] = i
+
+    return split_labels, num_terminals
+
+
+def isolating_cuts(num_nodes, edges, weights, terminals, indices, backend):
+    '''Cut each of the terminal node sets with the given indices from all
+    other terminal node sets. Returns the nodes on the side of the terminal
+    for each cut.'''
+
+    cut = MIN_CUT_BACKENDS[backend](
+        num_nodes,
+        edges,
+        weights,
+        terminals=terminals)
+    mask = np.ones((num_nodes,), dtype=bool)
 
-    graph.set_vertex_filter(partition)
-    component_nodes_v = filter_component_nodes(graph, components)
-    num_splits_needed_v, next_split_id = rec_split_graph(
-        graph,
+    sides = []
+    for i in indices:
+        others = np.concatenate(terminals[:i] + terminals[i + 1:])
+        with timer('split_graph.isolating_cut'):
+            sides.append(np.nonzero(cut(mask, terminals[i], others))[0])
+
+    return sides
+
+
+def cut_weight(edges, weights, split_labels):
+    '''The summed weight of all edges between different splits.'''
+
+    edge_labels = split_labels[edges]
+    return float(np.sum(weights[edge_labels[:, 0] != edge_labels[:, 1]]))
+
+
+def split_subgraph(
+        num_nodes,
+        edges,
         weights,
-        component_nodes_v,
-        component_node_positions,
-        split_labels,
-        next_split_id)
+        components,
+        positions,
+        backend):
+    '''Split a graph given as arrays completely.
 
-    graph.clear_filters()
+    Returns the split ID of each node (consecutive, starting at 0) and the
+    number of splits.'''
 
-    return 1 + num_splits_needed_u + num_splits_needed_v, next_split_id
+    cut = MIN_CUT_BACKENDS[backend](num_nodes, edges, weights)
 
+    return split_partitions(cut, num_nodes, components, positions)
 
-def select_split_component(components):
 
-    start = time.time()
+def split_graph_parallel(
+        num_nodes,
+        edges,
+        weights,
+        components,
+        positions,
+        backend,
+        num_workers):
+    '''Split a graph given as arrays completely, solving independent
+    partitions in a process pool.
+
+    The graph is split in this process until there are at least
+    ``num_workers`` partitions left to split. Each of them is then extracted
+    as a compact subgraph and split by a worker. Split IDs are the same as
+    for :func:`split_subgraph`.'''
+
+    cut = MIN_CUT_BACKENDS[backend](num_nodes, edges, weights)
+    num_splits = 0
+
+    # partitions (nodes, components) in the order of a depth-first split
+    partitions = [(np.arange(num_nodes), components)]
+    while True:
+
+        pending = [i for i, p in enumerate(partitions) if len(p[1]) > 1]
+        if not pending or len(pending) >= num_workers:
+            break
+
+        # split the largest partition
+        i = max(pending, key=lambda i: len(partitions[i][0]))
+        nodes, components = partitions[i]
+        partitions[i:i + 1] = split_partition(
+            cut,
+            num_nodes,
+            nodes,
+            components,
+            positions)
+        num_splits += 1
+
+    subgraphs = [
+        extract_subgraph(
+            num_nodes,
+            edges,
+            weights,
+            nodes,
+            components,
+            positions) + (backend,)
+        for nodes, components in partitions
+        if len(components) > 1
+    ]
+
+    results = []
+    if subgraphs:
+        with ProcessPoolExecutor(num_workers) as executor:
+            results = list(executor.map(split_subgraph, *zip(*subgraphs)))
+    results = iter(results)
+
+    split_labels = np.full((num_nodes,), -1, dtype=np.int64)
+    next_split_id = 0
+    for nodes, components in partitions:
+
+        if len(components) <= 1:
+            split_labels[nodes] = next_split_id
+            next_split_id += 1
+            continue
 
-    # return largest two components
-    components = sorted(components, key=lambda l: len(l))
+        subgraph_labels, subgraph_splits = next(results)
+        split_labels[nodes] = subgraph_labels + next_split_id
+        next_split_id += subgraph_splits + 1
+        num_splits += subgraph_splits
 
-    print("Found split components in %.3fs" % (time.time() - start))
-    return components[-2:]
+    return split_labels, num_splits
+
+
+def extract_subgraph(
+        num_nodes,
+        edges,
+        weights,
+        nodes,
+        components,
+        positions):
+    '''Extract the subgraph induced by ``nodes`` with consecutive node IDs,
+    as arguments for :func:`split_subgraph`.'''
+
+    local_ids = np.full((num_nodes,), -1, dtype=np.int64)
+    local_ids[nodes] = np.arange(len(nodes))
+
+    local_edges = local_ids[edges]
+    inside = np.all(local_edges >= 0, axis=1)
+
+    return (
+        len(nodes),
+        local_edges[inside],
+        weights[inside],
+        component_heap([
+            SplitComponent(
+                c.index,
+                local_ids[c.nodes],
+                c._kd_tree)
+            for _, _, c in components
+        ]),
+        positions[nodes]
+    )
+
+
+def split_partitions(cut, num_nodes, components, positions):
+    '''Split a graph with an explicit work queue of independent partitions,
+    each given by its nodes and the component nodes in it.
+
+    Partitions are processed in the order of a depth-first recursion (the
+    side of ``u`` before the side of ``v``), such that the final partitions
+    get consecutive split IDs in this order. Returns the split ID of each
+    node and the number of splits performed.'''
+
+    split_labels = np.full((num_nodes,), -1, dtype=np.int64)
+    num_splits = 0
+    next_split_id = 0
+
+    queue = [(np.arange(num_nodes), components)]
+    while queue:
+
+        nodes, components = queue.pop()
+
+        # nothing to split?
+        if len(components) <= 1:
+            split_labels[nodes] = next_split_id
+            next_split_id += 1
+            continue
+
+        (nodes_u, components_u), (nodes_v, components_v) = split_partition(
+            cut,
+            num_nodes,
+            nodes,
+            components,
+            positions)
+        num_splits += 1
+
+        # last in, first out: split the side of u first
+        queue.append((nodes_v, components_v))
+        queue.append((nodes_u, components_u))
+
+    return split_labels, num_splits
+
+
+def split_partition(cut, num_nodes, nodes, components, positions):
+    '''Split one partition of the graph in two.
+
+    Returns the nodes and component nodes of both sides as tuples
+    ``(nodes_u, components_u), (nodes_v, components_v)``.'''
+
+    # find split nodes
+    with timer('split_graph.select_split_nodes'):
+        component_u, component_v = select_split_component(components)
+        u, v = select_split_nodes(
+            component_u,
+            component_v,
+            positions)
+
+    # split graph
+    mask = np.zeros((num_nodes,), dtype=bool)
+    mask[nodes] = True
+    with timer('split_graph.min_cut'):
+        mask_u = cut(mask, u, v)
+    mask_v = np.logical_and(np.logical_not(mask_u), mask)
+    add_count('split_graph.min_cut_nodes', len(nodes))
+
+    with timer('split_graph.filter_components'):
+        return (
+            (
+                np.nonzero(mask_u)[0],
+                filter_component_nodes(mask_u, components)
+            ),
+            (
+                np.nonzero(mask_v)[0],
+                filter_component_nodes(mask_v, components)
+            )
+        )
+
+
+class SplitComponent():
+    '''The nodes of a component to separate, with a KD-tree of their
+    positions that is built on first use.
+
+    Components that lose nodes after a split are replaced with new instances,
+    such that the KD-tree stays valid as long as the instance is used.'''
+
+    __slots__ = ('index', 'nodes', '_kd_tree')
+
+    def __init__(self, index, nodes, kd_tree=None):
+
+        self.index = index
+        self.nodes = nodes
+        self._kd_tree = kd_tree
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def kd_tree(self, positions):
+
+        if self._kd_tree is None:
+            self._kd_tree = KDTree(positions[self.nodes])
+
+        return self._kd_tree
+
+
+class ComponentHeap():
+    '''A heap of :class:`SplitComponent`, with the largest component first.
+    Among components of equal size, the one given last comes first.
+
+    Iterating and indexing give the heap entries ``(-size, -index,
+    component)``. The nodes of all components are also kept in one array
+    (in the order the components were given, starting at ``starts``), such
+    that they can be filtered at once by :func:`filter_component_nodes`.'''
+
+    def __init__(self, components, nodes=None, starts=None):
+
+        self.components = list(components)
+
+        if nodes is None:
+            sizes = np.array(
+                [len(c) for c in self.components],
+                dtype=np.int64)
+            starts = np.cumsum(sizes) - sizes
+            nodes = np.concatenate(
+                [c.nodes for c in self.components] +
+                [np.zeros((0,), dtype=np.int64)])
+
+        self.nodes = nodes
+        self.starts = starts
+
+        self.entries = [(-len(c), -c.index, c) for c in self.components]
+        heapq.heapify(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+
+def component_heap(components):
+    '''Create a :class:`ComponentHeap` of :class:`SplitComponent`.'''
+
+    return ComponentHeap(components)
+
+
+def select_split_component(components):
+    '''Return the second largest and the largest component from a heap.'''
+
+    largest = components[0]
+    second = min(components[1:3])
+
+    return second[2], largest[2]
 
 
 def select_split_nodes(
         component_u,
         component_v,
-        component_node_positions):
+        positions):
     '''Find the two spatially closest component nodes.'''
 
-    start = time.time()
-
-    kd_tree_u = KDTree(
-        [component_node_positions[n] for n in component_u]
-    )
-    distances, indices = kd_tree_u.query(
-        [component_node_positions[n] for n in component_v]
-    )
+    kd_tree_u = component_u.kd_tree(positions)
+    distances, indices = kd_tree_u.query(positions[component_v.nodes])
 
     v_index = np.argmin(distances)
     u_index = indices[v_index]
 
-    print("Found split nodes in %.3fs" % (time.time() - start))
-    return component_u[u_index], component_v[v_index]
+    return component_u.nodes[u_index], component_v.nodes[v_index]
 
 
 def min_cut(graph, u, v, weights):
 
-    start = time.time()
-
     res = graph_tool.flow.boykov_kolmogorov_max_flow(
         graph,
         graph.vertex(u), graph.vertex(v),
@@ -209,31 +816,36 @@ def min_cut(graph, u, v, weights):
         weights,
         res)
 
-    print("Split in %.3fs" % (time.time() - start))
     return partition
 
 
-def filter_component_nodes(graph, components):
-    '''Return a list of component nodes limited to nodes in graph.'''
+def filter_component_nodes(mask, components):
+    '''Return a heap of components limited to nodes in mask.'''
 
-    start = time.time()
+    if len(components) == 0:
+        return components
 
-    vertex_filter, inverted = graph.get_vertex_filter()
-    vertex_filter_array = vertex_filter.a
-    contained = not inverted
+    # count the nodes of each component in mask at once
+    contained = mask[components.nodes]
+    counts = np.add.reduceat(contained, components.starts, dtype=np.int64)
+    nodes = components.nodes[contained]
+    starts = np.cumsum(counts) - counts
 
-    # filter nodes
-    components = [
-        [
-            n
-            for n in comp
-            if vertex_filter_array[n] == contained
-        ]
-        for comp in components
-    ]
+    keep = np.flatnonzero(counts)
+    filtered = []
+    for i, count, start in zip(
+            keep.tolist(),
+            counts[keep].tolist(),
+            starts[keep].tolist()):
+
+        component = components.components[i]
 
-    # remove empty lists
-    components = [c for c in components if len(c) > 0]
+        # keep unchanged components (and their KD-trees)
+        if count == len(component):
+            filtered.append(component)
+        else:
+            filtered.append(SplitComponent(
+                component.index,
+                nodes[start:start + count]))
 
-    print("Filtered components in %.3fs" % (time.time() - start))
-    return components
+    return ComponentHeap(filtered, nodes, starts[keep])
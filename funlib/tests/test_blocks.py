@@ -0,0 +1,156 @@
+from funlib import evaluate
+from funlib.evaluate.blocks import BlockReader, get_blocks
+import numpy as np
+import threading
+import unittest
+
+
+class RecordingArray():
+    '''An array that records which blocks are read, and can hold back reads
+    until released.'''
+
+    def __init__(self, data):
+
+        self.data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __getitem__(self, block):
+
+        self.release.wait()
+        self.reads.append(block)
+        return self.data[block]
+
+
+class TestBlocks(unittest.TestCase):
+
+    def test_get_blocks(self):
+
+        blocks = get_blocks((slice(0, 10), slice(5, 12)), (4, 4))
+
+        self.assertEqual(len(blocks), 3*2)
+        self.assertEqual(blocks[0], (slice(0, 4), slice(5, 9)))
+        self.assertEqual(blocks[-1], (slice(8, 10), slice(9, 12)))
+
+    def test_block_reader(self):
+
+        data = np.arange(20*30).reshape(20, 30)
+        blocks = get_blocks((slice(0, 20), slice(0, 30)), (5, 10))
+
+        for num_prefetch in [0, 1, 3]:
+            reader = BlockReader(
+                [data, data.astype(np.uint8)],
+                blocks,
+                num_prefetch=num_prefetch)
+
+            read = []
+            for block, (a, b) in reader:
+                np.testing.assert_array_equal(a, data[block])
+                np.testing.assert_array_equal(b, data[block].astype(np.uint8))
+                read.append(block)
+
+            self.assertEqual(read, blocks)
+
+    def test_prefetch(self):
+
+        array = RecordingArray(np.zeros((100,), dtype=np.uint64))
+        blocks = get_blocks((slice(0, 100),), (10,))
+
+        reader = iter(BlockReader([array], blocks, num_prefetch=2))
+        next(reader)
+
+        # the next two blocks are read while the first one is processed
+        while len(array.reads) < 3:
+            pass
+        self.assertEqual(array.reads, blocks[:3])
+
+        # with a memory budget of two blocks, only one block is read ahead
+        array = RecordingArray(np.zeros((100,), dtype=np.uint64))
+        array.release.clear()
+        reader = BlockReader(
+            [array],
+            blocks,
+            num_prefetch=4,
+            max_bytes=2*10*8)
+        blocks_iter = iter(reader)
+        array.release.set()
+        next(blocks_iter)
+        while len(array.reads) < 2:
+            pass
+        self.assertEqual(len(array.reads), 2)
+
+        self.assertEqual(len(list(blocks_iter)), 9)
+
+    def test_stats(self):
+
+        data = np.zeros((10, 10), dtype=np.uint64)
+        blocks = get_blocks((slice(0, 10), slice(0, 10)), (5, 5))
+
+        with evaluate.collect_stats() as stats:
+            reader = BlockReader([data], blocks)
+            for _ in reader:
+                pass
+
+        self.assertEqual(stats.calls['BlockReader.io_wait'], 4)
+        self.assertEqual(stats.calls['BlockReader.compute'], 4)
+        self.assertEqual(stats.counts['BlockReader.bytes_read'], data.nbytes)
+        self.assertAlmostEqual(
+            stats.timings['BlockReader.io_wait'],
+            reader.io_wait)
+
+    def test_evaluate_blockwise(self):
+
+        rng = np.random.default_rng(0)
+        truth = rng.integers(0, 20, size=(10, 20, 30)).astype(np.uint64)
+        test = rng.integers(0, 10, size=(10, 20, 30)).astype(np.uint64)
+        mask = np.zeros((10, 20, 30), dtype=np.uint8)
+        mask[:, 3:17] = 1
+
+        scores = evaluate.evaluate_blockwise(
+            truth,
+            test,
+            ['rand_voi', 'edit_counts', 'detection'],
+            mask=mask,
+            block_shape=(4, 8, 16),
+            num_prefetch=1,
+            max_bytes=2**12,
+            min_overlap=2)
+
+        truth = truth*mask
+        test = test*mask
+
+        rand_voi = evaluate.rand_voi(truth, test)
+        for key, value in scores['rand_voi'].items():
+            self.assertAlmostEqual(value, rand_voi[key])
+
+        self.assertEqual(
+            scores['edit_counts'],
+            evaluate.edit_counts(truth, test, min_overlap=2))
+
+        detection = evaluate.DetectionEvaluator(truth, test).scores()
+        for key, value in scores['detection'].items():
+            self.assertAlmostEqual(value, detection[key], places=5)
+
+        with self.assertRaises(ValueError):
+            evaluate.evaluate_blockwise(truth, test, ['accuracy'])
+
+    def test_detection_ties(self):
+
+        # true component 1 overlaps test components 1 and 2 by the same
+        # number of voxels, but has a higher IoU with 2 (which is seen first
+        # block-wise)
+        truth = np.array([[[1, 1, 1, 1, 0, 0, 0, 0]]], dtype=np.uint64)
+        test = np.array([[[2, 2, 1, 1, 1, 1, 0, 0]]], dtype=np.uint64)
+
+        for block_shape in [(1, 1, 2), (1, 1, 3), (1, 1, 8)]:
+            scores = evaluate.evaluate_blockwise(
+                truth,
+                test,
+                ['detection'],
+                block_shape=block_shape)
+            self.assertEqual(
+                scores['detection'],
+                evaluate.DetectionEvaluator(truth, test).scores())
@@ -0,0 +1,134 @@
+from funlib import evaluate
+from funlib.evaluate import cli
+import contextlib
+import io
+import json
+import numpy as np
+import os
+import tempfile
+import unittest
+
+try:
+    import h5py
+    _have_h5py = True
+except ImportError:
+    _have_h5py = False
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+        self.truth = rng.integers(0, 20, size=(10, 20, 30)).astype(np.uint64)
+        self.test = rng.integers(0, 10, size=(10, 20, 30)).astype(np.uint64)
+        self.mask = np.zeros((10, 20, 30), dtype=np.uint8)
+        self.mask[2:8] = 1
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name in ['truth', 'test', 'mask']:
+            self.paths[name] = os.path.join(self.tmp.name, name + '.npy')
+            np.save(self.paths[name], getattr(self, name))
+
+    def tearDown(self):
+
+        self.tmp.cleanup()
+
+    def test_evaluate_volume(self):
+
+        for num_workers in [1, 2]:
+
+            scores = cli.evaluate_volume(
+                self.paths['truth'],
+                self.paths['test'],
+                ['rand_voi', 'edit_counts', 'detection'],
+                block_shape=(4, 8, 16),
+                num_workers=num_workers,
+                min_overlap=3)
+
+            rand_voi = evaluate.rand_voi(self.truth, self.test)
+            for key, value in scores['rand_voi'].items():
+                self.assertAlmostEqual(value, rand_voi[key])
+
+            self.assertEqual(
+                scores['edit_counts'],
+                evaluate.edit_counts(self.truth, self.test, min_overlap=3))
+
+            detection = evaluate.DetectionEvaluator(
+                self.truth,
+                self.test).scores()
+            for key, value in scores['detection'].items():
+                self.assertAlmostEqual(value, detection[key], places=5)
+
+    def test_roi_and_mask(self):
+
+        scores = cli.evaluate_volume(
+            self.paths['truth'],
+            self.paths['test'],
+            ['rand_voi'],
+            roi=cli.parse_roi('1:9,0:20,5:25'),
+            mask=self.paths['mask'],
+            block_shape=(3, 7, 11))
+
+        roi = (slice(1, 9), slice(0, 20), slice(5, 25))
+        truth = self.truth[roi]*(self.mask[roi] > 0)
+        rand_voi = evaluate.rand_voi(truth, self.test[roi])
+        for key, value in scores['rand_voi'].items():
+            self.assertAlmostEqual(value, rand_voi[key])
+
+    def test_main(self):
+
+        # raw files
+        truth = os.path.join(self.tmp.name, 'truth.raw')
+        self.truth.tofile(truth)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.main([
+                truth,
+                self.paths['test'],
+                '--shape', '10,20,30',
+                '--dtype', 'uint64',
+                '--metrics', 'rand_voi', 'edit_counts',
+                '--block-shape', '5,10,10',
+                '--prefetch', '1',
+                '--profile'
+            ])
+
+        scores = json.loads(output.getvalue())
+        self.assertEqual(
+            set(scores.keys()),
+            {'rand_voi', 'edit_counts', 'stats'})
+        self.assertEqual(
+            scores['stats']['calls']['BlockReader.io_wait'], 2*2*3)
+        self.assertAlmostEqual(
+            scores['rand_voi']['voi_split'],
+            evaluate.rand_voi(self.truth, self.test)['voi_split'])
+
+        with self.assertRaises(ValueError):
+            cli.evaluate_volume(truth, self.paths['test'], ['rand_voi'])
+
+    @unittest.skipIf(not _have_h5py, "h5py is not installed")
+    def test_hdf5(self):
+
+        filename = os.path.join(self.tmp.name, 'volumes.h5')
+        with h5py.File(filename, 'w') as f:
+            f['labels/truth'] = self.truth
+            f['labels/test'] = self.test
+
+        output = os.path.join(self.tmp.name, 'scores.json')
+        cli.main([
+            filename + ':labels/truth',
+            filename + ':labels/test',
+            '--metrics', 'detection',
+            '--num-workers', '2',
+            '--output', output
+        ])
+
+        with open(output) as f:
+            scores = json.load(f)
+
+        self.assertEqual(
+            scores['detection']['tp'],
+            evaluate.DetectionEvaluator(self.truth, self.test).scores()['tp'])
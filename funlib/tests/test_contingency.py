@@ -0,0 +1,94 @@
+from funlib import evaluate
+from funlib.evaluate.blocks import get_blocks
+from funlib.evaluate.contingency import \
+        contingency_table, \
+        edit_counts_from_contingency, \
+        merge_contingency_tables, \
+        rand_voi_from_contingency
+import numpy as np
+import unittest
+
+
+class TestContingency(unittest.TestCase):
+
+    def blockwise_table(self, truth, test):
+
+        blocks = get_blocks(
+            tuple(slice(0, s) for s in truth.shape),
+            (3,)*truth.ndim)
+
+        return merge_contingency_tables(
+            contingency_table(truth[block], test[block])
+            for block in blocks)
+
+    def assertScoresEqual(self, scores, expected):
+
+        self.assertEqual(set(scores.keys()), set(expected.keys()))
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                self.assertEqual(set(scores[key].keys()), set(value.keys()))
+                for k, v in value.items():
+                    self.assertAlmostEqual(scores[key][k], v)
+            else:
+                np.testing.assert_allclose(scores[key], value, equal_nan=True)
+
+    def test_equivalence(self):
+
+        rng = np.random.default_rng(0)
+        truth = rng.integers(0, 6, size=(7, 8, 9)).astype(np.uint64)
+        test = rng.integers(0, 4, size=(7, 8, 9)).astype(np.uint64)
+
+        cases = {
+            'random': (truth, test),
+            'empty': (truth[:0], test[:0]),
+            'truth background': (np.zeros_like(truth), test),
+            'test background': (truth, np.zeros_like(test))
+        }
+
+        for name, (truth, test) in cases.items():
+
+            table = self.blockwise_table(truth, test)
+
+            self.assertScoresEqual(
+                rand_voi_from_contingency(
+                    *table,
+                    return_cluster_scores=True),
+                evaluate.rand_voi(truth, test, return_cluster_scores=True))
+
+            for min_overlap, min_overlap_fraction in [
+                    (1, 0.0),
+                    (3, 0.0),
+                    (1, 0.2),
+                    (2, 0.05)]:
+
+                self.assertEqual(
+                    edit_counts_from_contingency(
+                        *table,
+                        min_overlap=min_overlap,
+                        min_overlap_fraction=min_overlap_fraction),
+                    evaluate.edit_counts(
+                        truth,
+                        test,
+                        min_overlap=min_overlap,
+                        min_overlap_fraction=min_overlap_fraction),
+                    name)
+
+    def test_edit_count_weights(self):
+
+        truth = np.array([1, 1, 2, 2], dtype=np.uint64)
+        test = np.array([1, 2, 2, 3], dtype=np.uint64)
+
+        # truth 1 overlaps test 1 by 5 and test 2 by 1, truth 2 overlaps test
+        # 2 and 3 by 1 each
+        weights = np.array([5, 1, 1, 1], dtype=np.uint64)
+
+        self.assertEqual(
+            evaluate.edit_counts(truth, test, weights=weights),
+            {'splits': 2, 'merges': 1, 'total': 3})
+        self.assertEqual(
+            evaluate.edit_counts(
+                truth,
+                test,
+                min_overlap_fraction=0.3,
+                weights=weights),
+            {'splits': 1, 'merges': 1, 'total': 2})
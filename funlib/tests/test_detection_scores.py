@@ -101,3 +101,56 @@ class TestDetectionScores(unittest.TestCase):
                         [False, True, False, False],
                         [False, True, False, False]
                     ]).all())
+
+    def test_detection_evaluator(self):
+
+        truth = np.array([[0, 1, 1, 0, 2, 2], [0, 1, 1, 0, 2, 2]],
+                         dtype=np.uint64)
+        test = np.array([[0, 1, 2, 0, 3, 3], [0, 1, 2, 0, 0, 0]],
+                        dtype=np.uint64)
+
+        for matching_score, threshold in [
+                ('overlap', 1),
+                ('iou', 0.3),
+                ('distance', 1.0)]:
+
+            evaluator = evaluate.DetectionEvaluator(
+                truth,
+                test,
+                matching_score=matching_score,
+                matching_threshold=threshold)
+
+            m = evaluator.scores()
+            self.assertEqual(m['tp'], 2)
+            self.assertEqual(m['fp'], 1)
+            self.assertEqual(m['fn'], 0)
+
+            # merge test components 1 and 2
+            evaluator.update(
+                (slice(0, 2), slice(2, 3)),
+                np.array([[1], [1]], dtype=np.uint64))
+
+            m = evaluator.scores(return_matches=True)
+            self.assertEqual(m['tp'], 2)
+            self.assertEqual(m['fp'], 0)
+            self.assertEqual(m['fn'], 0)
+            self.assertEqual(sorted(m['matches']), [(1, 1), (3, 2)])
+
+            # remove test component 3
+            evaluator.update(
+                (slice(0, 1), slice(4, 6)),
+                np.array([[0, 0]], dtype=np.uint64))
+
+            m = evaluator.scores()
+            self.assertEqual(m['tp'], 1)
+            self.assertEqual(m['fp'], 0)
+            self.assertEqual(m['fn'], 1)
+            self.assertAlmostEqual(m['avg_iou'], 1.0)
+
+            self.assertEqual(
+                evaluator.scores(),
+                evaluate.detection_scores(
+                    truth,
+                    evaluator.test,
+                    matching_score=matching_score,
+                    matching_threshold=threshold))
@@ -0,0 +1,66 @@
+from funlib import evaluate
+import numpy as np
+import unittest
+
+
+class TestEditCounts(unittest.TestCase):
+
+    def test_edit_counts(self):
+
+        a = np.array([1, 1, 2, 2], dtype=np.uint64)
+        b = np.array([2, 2, 2, 2], dtype=np.uint64)
+
+        m = evaluate.edit_counts(a, b)
+        self.assertEqual(m['splits'], 0)
+        self.assertEqual(m['merges'], 1)
+        self.assertEqual(m['total'], 1)
+
+        m = evaluate.edit_counts(b, a)
+        self.assertEqual(m['splits'], 1)
+        self.assertEqual(m['merges'], 0)
+
+        # truth 0 is ignored, test 0 is not a segment
+        a = np.array([0, 0, 1, 1, 1, 2], dtype=np.uint64)
+        b = np.array([3, 4, 0, 3, 5, 5], dtype=np.uint64)
+
+        m = evaluate.edit_counts(a, b)
+        self.assertEqual(m['splits'], 1)
+        self.assertEqual(m['merges'], 1)
+
+        # small overlaps
+        a = np.array([1]*10 + [2]*10, dtype=np.uint64)
+        b = np.array([3]*9 + [4]*1 + [4]*10, dtype=np.uint64)
+
+        m = evaluate.edit_counts(a, b)
+        self.assertEqual(m['splits'], 1)
+        self.assertEqual(m['merges'], 1)
+
+        m = evaluate.edit_counts(a, b, min_overlap=2)
+        self.assertEqual(m['splits'], 0)
+        self.assertEqual(m['merges'], 0)
+
+        # 1 voxel is 10% of truth 1, but less than 10% of test 4
+        m = evaluate.edit_counts(a, b, min_overlap_fraction=0.1)
+        self.assertEqual(m['splits'], 1)
+        self.assertEqual(m['merges'], 0)
+
+    def test_random(self):
+
+        rng = np.random.default_rng(0)
+        a = rng.integers(0, 20, size=(10, 20, 30)).astype(np.uint32)
+        b = rng.integers(0, 10, size=(10, 20, 30))
+
+        pairs, counts = np.unique(
+            np.stack([a.ravel(), b.ravel()])[:, a.ravel() > 0],
+            axis=1,
+            return_counts=True)
+        overlap = np.logical_and(pairs[1] > 0, counts >= 5)
+        pairs = pairs[:, overlap]
+
+        m = evaluate.edit_counts(a, b, min_overlap=5)
+        self.assertEqual(
+            m['splits'],
+            len(pairs[0]) - len(np.unique(pairs[0])))
+        self.assertEqual(
+            m['merges'],
+            len(pairs[1]) - len(np.unique(pairs[1])))
@@ -0,0 +1,53 @@
+from funlib import evaluate
+import subprocess
+import sys
+import unittest
+
+
+def loaded_modules(statement):
+    '''Get the modules loaded by ``statement`` in a fresh interpreter.'''
+
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        statement + '; import sys; print(" ".join(sys.modules))'
+    ])
+
+    return set(output.decode().split())
+
+
+class TestImports(unittest.TestCase):
+
+    def test_lazy_imports(self):
+
+        heavy = {
+            'scipy',
+            'networkx',
+            'graph_tool',
+            'funlib.evaluate.detection',
+            'funlib.evaluate.split_merge'
+        }
+
+        modules = loaded_modules('from funlib.evaluate import rand_voi')
+        self.assertFalse(modules & heavy)
+
+        modules = loaded_modules('from funlib.evaluate import edit_counts')
+        self.assertFalse(modules & heavy)
+
+        modules = loaded_modules(
+            'from funlib.evaluate import detection_scores')
+        self.assertIn('funlib.evaluate.detection', modules)
+        self.assertNotIn('funlib.evaluate.split_merge', modules)
+
+    def test_public_names(self):
+
+        for name in evaluate.__all__:
+            self.assertTrue(callable(getattr(evaluate, name)), name)
+            self.assertIn(name, dir(evaluate))
+
+        # submodules with the same name do not shadow functions
+        import funlib.evaluate.rand_voi  # noqa
+        self.assertTrue(callable(evaluate.rand_voi))
+
+        with self.assertRaises(AttributeError):
+            evaluate.does_not_exist
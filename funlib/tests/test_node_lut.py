@@ -0,0 +1,78 @@
+from funlib import evaluate
+import numpy as np
+import tempfile
+import unittest
+
+
+class ChunkedArray():
+
+    def __init__(self, data, chunks):
+        self.data = data
+        self.chunks = chunks
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.reads = 0
+
+    def __getitem__(self, slices):
+        self.reads += 1
+        return self.data[slices]
+
+
+class TestNodeLut(unittest.TestCase):
+
+    def test_node_segment_lut(self):
+
+        np.random.seed(42)
+        segmentation = np.random.randint(
+            1, 100,
+            size=(10, 20, 30),
+            dtype=np.uint64)
+        voxel_size = (4, 2, 1)
+        offset = (8, 0, -10)
+
+        voxels = np.stack([
+            np.random.randint(0, s, size=(1000,))
+            for s in segmentation.shape
+        ], axis=1)
+        positions = voxels*voxel_size + offset + 0.5
+        expected = segmentation[tuple(voxels.T)]
+
+        # two nodes outside of the volume
+        positions[0] = (0, 0, 0)
+        positions[1] = (48, 0, 0)
+        expected[0] = 0
+        expected[1] = 0
+
+        lut = evaluate.get_node_segment_lut(
+            positions,
+            segmentation,
+            voxel_size,
+            offset)
+        np.testing.assert_array_equal(lut, expected)
+
+        with tempfile.TemporaryFile() as f:
+            memmap = np.memmap(
+                f,
+                dtype=segmentation.dtype,
+                shape=segmentation.shape,
+                mode='w+')
+            memmap[:] = segmentation
+            lut = evaluate.get_node_segment_lut(
+                positions,
+                memmap,
+                voxel_size,
+                offset)
+            np.testing.assert_array_equal(lut, expected)
+
+        chunked = ChunkedArray(segmentation, (4, 8, 16))
+        for num_workers in [1, 4]:
+            chunked.reads = 0
+            lut = evaluate.get_node_segment_lut(
+                positions,
+                chunked,
+                voxel_size,
+                offset,
+                num_workers=num_workers)
+            np.testing.assert_array_equal(lut, expected)
+            # each of the 3*3*2 chunks is read once
+            self.assertEqual(chunked.reads, 18)
@@ -0,0 +1,60 @@
+from funlib import evaluate
+import contextlib
+import io
+import numpy as np
+import unittest
+
+
+class TestProfiling(unittest.TestCase):
+
+    def test_collect_stats(self):
+
+        truth = np.arange(24, dtype=np.uint64).reshape(2, 3, 4)
+        test = np.ones((2, 3, 4), dtype=np.uint64)
+
+        events = []
+        with evaluate.collect_stats(
+                callback=lambda name, value: events.append(name)) as stats:
+
+            # strided arrays have to be copied
+            evaluate.rand_voi(truth[:, :, ::2], test[:, :, ::2])
+            evaluate.edit_counts(truth, test)
+
+        self.assertIsInstance(stats, evaluate.CallStats)
+        self.assertEqual(stats.calls['rand_voi'], 1)
+        self.assertGreaterEqual(stats.timings['rand_voi'], 0)
+        self.assertEqual(stats.counts['rand_voi.voxels'], 12)
+        self.assertEqual(stats.counts['rand_voi.bytes_copied'], 2*12*8)
+        self.assertEqual(stats.counts['edit_counts.voxels'], 24)
+        self.assertNotIn('edit_counts.bytes_copied', stats.counts)
+        self.assertIn('rand_voi', events)
+        self.assertIn('edit_counts', stats.to_dict()['timings'])
+
+        # nothing is collected outside of the context
+        evaluate.rand_voi(truth, test)
+        self.assertEqual(stats.calls['rand_voi'], 1)
+
+    def test_no_output(self):
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), \
+                evaluate.collect_stats() as stats:
+
+            evaluate.split_graph_arrays(
+                edges=[[0, 1], [1, 2], [2, 5], [4, 5], [3, 4], [0, 3]],
+                weights=[1, 0.5, 1, 1, 0.1, 1],
+                positions=[[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2]],
+                components=[[0], [3], [4, 5]])
+
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual(stats.calls['split_graph.min_cut'], 2)
+        self.assertEqual(stats.counts['split_graph.min_cuts'], 2)
+
+    def test_logging(self):
+
+        truth = np.arange(10, dtype=np.uint64)
+
+        with self.assertLogs('funlib.evaluate.profiling', 'DEBUG') as logs:
+            evaluate.rand_voi(truth, truth)
+
+        self.assertTrue(any('rand_voi took' in line for line in logs.output))
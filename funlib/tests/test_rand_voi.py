@@ -69,6 +69,21 @@ class TestRandVoi(unittest.TestCase):
         self.assertAlmostEqual(sum(m['voi_split_i'].values()), m['voi_split'])
         self.assertAlmostEqual(sum(m['voi_merge_j'].values()), m['voi_merge'])
 
+    def test_weights(self):
+
+        a = np.array([1, 1, 2, 2, 2, 3, 3, 3, 3, 4, 4], dtype=np.uint64)
+        b = np.array([3, 3, 3, 3, 4, 5, 6, 6, 5, 5, 5], dtype=np.uint64)
+        weights = np.array([1, 2, 1, 3, 1, 1, 2, 1, 1, 4, 1])
+
+        # integer weights are the same as repeated samples
+        m = evaluate.rand_voi(a, b, weights=weights)
+        expected = evaluate.rand_voi(
+            np.repeat(a, weights),
+            np.repeat(b, weights))
+
+        for key in expected:
+            self.assertAlmostEqual(m[key], expected[key])
+
     def test_inputs(self):
 
         with self.assertRaises(AssertionError):
@@ -1,7 +1,11 @@
 from funlib import evaluate
 import math
 import networkx
+import numpy as np
+import os
+import tempfile
 import unittest
+import warnings
 
 
 class TestRandVoi(unittest.TestCase):
@@ -30,6 +34,21 @@ class TestRandVoi(unittest.TestCase):
         self.assertAlmostEqual(skeleton_lengths[1], 2*math.sqrt(2))
         self.assertAlmostEqual(skeleton_lengths[2], math.sqrt(2))
 
+        # anisotropic voxels, store lengths in edges
+        skeleton_lengths = evaluate.get_skeleton_lengths(
+            skeletons,
+            skeleton_position_attributes=['z', 'y', 'x'],
+            skeleton_id_attribute='skeleton_id',
+            store_edge_length='length',
+            voxel_size=(4, 1, 1))
+
+        self.assertAlmostEqual(
+            skeleton_lengths[1],
+            math.sqrt(17) + math.sqrt(17))
+        self.assertAlmostEqual(skeleton_lengths[2], math.sqrt(17))
+        self.assertAlmostEqual(skeletons.edges[1, 2]['length'], math.sqrt(17))
+        self.assertAlmostEqual(skeletons.edges[4, 5]['length'], math.sqrt(17))
+
     def test_edge_scores(self):
 
         skeletons = networkx.Graph()
@@ -360,6 +379,24 @@ class TestRandVoi(unittest.TestCase):
 
         self.assertAlmostEqual(erl, 0.5*math.sqrt(2), places=5)
 
+    def test_expected_run_length_no_edges(self):
+
+        skeletons = networkx.Graph()
+        skeletons.add_node(1, skeleton_id=1, z=0, y=0, x=0)
+        skeletons.add_node(2, skeleton_id=2, z=1, y=1, x=0)
+        node_segment_lut = {1: 10, 2: 10}
+
+        for graph in [skeletons, networkx.Graph()]:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                erl = evaluate.expected_run_length(
+                    graph,
+                    'skeleton_id',
+                    'length',
+                    node_segment_lut,
+                    skeleton_position_attributes=['z', 'y', 'x'])
+            self.assertEqual(erl, 0)
+
     def test_merge_split_stats(self):
 
         skeletons = networkx.Graph()
@@ -460,3 +497,430 @@ class TestRandVoi(unittest.TestCase):
         self.assertEqual(len(stats['merge_stats']), 1)
         self.assertEqual(len(stats['split_stats']), 0)
         self.assertEqual(stats['merge_stats'][10], [1, 2])
+
+    def test_skeleton_arrays(self):
+
+        skeletons = networkx.Graph()
+        skeletons.add_node(1, skeleton_id=1, z=0, y=0, x=0)
+        skeletons.add_node(2, skeleton_id=1, z=1, y=1, x=0)
+        skeletons.add_node(3, skeleton_id=1, z=0, y=1, x=1)
+        skeletons.add_edge(1, 2)
+        skeletons.add_edge(2, 3)
+        skeletons.add_node(4, skeleton_id=2, z=1, y=1, x=1)
+        skeletons.add_node(5, skeleton_id=2, z=0, y=0, x=1)
+        skeletons.add_edge(4, 5)
+
+        skeleton_arrays = evaluate.SkeletonArrays.from_graph(
+            skeletons,
+            'skeleton_id',
+            position_attributes=['z', 'y', 'x'])
+
+        self.assertEqual(skeleton_arrays.num_nodes, 5)
+        self.assertEqual(skeleton_arrays.num_edges, 3)
+        self.assertEqual(
+            list(skeleton_arrays.node_indices([5, 1])), [4, 0])
+
+        skeleton_lengths = evaluate.get_skeleton_lengths(
+            skeleton_arrays,
+            skeleton_position_attributes=None,
+            skeleton_id_attribute=None)
+
+        self.assertAlmostEqual(skeleton_lengths[1], 2*math.sqrt(2))
+        self.assertAlmostEqual(skeleton_lengths[2], math.sqrt(2))
+
+        # one split in 1, one in 2
+        node_segment_lut = {
+            1: 10,
+            2: 10,
+            3: 30,
+            4: 20,
+            5: 40
+        }
+
+        scores = evaluate.evaluate_skeletons(
+            skeletons=skeleton_arrays,
+            skeleton_id_attribute=None,
+            node_segment_lut=node_segment_lut)
+
+        self.assertEqual(scores[1].split, 1)
+        self.assertEqual(scores[1].correct, 1)
+        self.assertEqual(scores[1].correct_edges, {10: [(1, 2)]})
+        self.assertEqual(scores[2].split, 1)
+        self.assertEqual(scores[2].correct, 0)
+
+        erl, stats = evaluate.expected_run_length(
+            skeleton_arrays,
+            None,
+            None,
+            node_segment_lut,
+            return_merge_split_stats=True)
+
+        self.assertAlmostEqual(erl, 2.0/3*0.5*math.sqrt(2), places=5)
+        self.assertEqual(stats['split_stats'][1], [(10, 30)])
+        self.assertEqual(stats['split_stats'][2], [(20, 40)])
+
+        # complete merge, LUT given as array aligned with node IDs
+        erl, stats = evaluate.expected_run_length(
+            skeleton_arrays,
+            None,
+            None,
+            [10, 10, 10, 10, 10],
+            return_merge_split_stats=True)
+
+        self.assertAlmostEqual(erl, 0)
+        self.assertEqual(stats['merge_stats'][10], [1, 2])
+
+    def test_save_load_skeleton_arrays(self):
+
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2, 3, 4, 5],
+            skeleton_ids=[1, 1, 1, 2, 2],
+            edges=[[0, 1], [1, 2], [3, 4]],
+            positions=[[0, 0], [0, 1], [1, 1], [5, 5], [5, 7]])
+        node_segment_lut = [10, 10, 20, 20, 20]
+
+        erl = evaluate.expected_run_length(
+            skeletons,
+            None,
+            None,
+            node_segment_lut)
+
+        with tempfile.TemporaryDirectory() as tmp:
+
+            for path in ['skeletons.npz', 'skeletons']:
+
+                path = os.path.join(tmp, path)
+                skeletons.save(path)
+                loaded = evaluate.SkeletonArrays.load(path)
+
+                for name in [
+                        'node_ids',
+                        'skeleton_ids',
+                        'edges',
+                        'positions',
+                        'edge_lengths']:
+                    np.testing.assert_array_equal(
+                        getattr(loaded, name),
+                        getattr(skeletons, name))
+
+                self.assertEqual(
+                    erl,
+                    evaluate.expected_run_length(
+                        loaded,
+                        None,
+                        None,
+                        node_segment_lut))
+
+            # arrays in directories are memory-mapped
+            self.assertIsInstance(loaded.node_ids.base, np.memmap)
+
+    def test_evaluate_skeleton_arrays(self):
+
+        # two skeletons:
+        #
+        # 1--2--3--4 (length 3)
+        # 5--6       (length 1)
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2, 3, 4, 5, 6],
+            skeleton_ids=[1, 1, 1, 1, 2, 2],
+            edges=[[0, 1], [1, 2], [2, 3], [4, 5]],
+            positions=[0, 1, 2, 3, 10, 11])
+
+        # 3 is ommitted, 4 merges with skeleton 2
+        evaluation = evaluate.evaluate_skeleton_arrays(
+            skeletons,
+            [10, 10, 0, 20, 20, 20])
+
+        self.assertEqual(list(evaluation.skeleton_ids), [1, 2])
+        self.assertEqual(list(evaluation.ommitted), [2, 0])
+        self.assertEqual(list(evaluation.split), [0, 0])
+        self.assertEqual(list(evaluation.merged), [0, 1])
+        self.assertEqual(list(evaluation.correct), [1, 0])
+        self.assertEqual(list(evaluation.correct_skeleton_ids), [1])
+        self.assertEqual(list(evaluation.correct_segment_ids), [10])
+        self.assertEqual(list(evaluation.correct_lengths), [1.0])
+        self.assertEqual(list(evaluation.merging_segments), [20])
+
+        scores = evaluation.skeleton_scores()
+        self.assertEqual(scores[1].correct_edges, {10: [(1, 2)]})
+        self.assertEqual(scores[2].merged, 1)
+
+        stats = evaluation.merge_split_stats()
+        self.assertEqual(stats['merge_stats'], {20: [1, 2]})
+        self.assertEqual(stats['split_stats'], {})
+
+        # 2 is split from 1 and 3, 5--6 is correct
+        evaluation = evaluate.evaluate_skeleton_arrays(
+            skeletons,
+            [10, 20, 10, 10, 30, 30])
+
+        scores = evaluation.skeleton_scores()
+        self.assertEqual(list(scores), [1, 2])
+        self.assertEqual(scores[1].split, 2)
+        self.assertEqual(scores[1].correct_lengths, {10: 1.0})
+        self.assertEqual(scores[2].correct_lengths, {30: 1.0})
+        self.assertEqual(scores[2].correct_edges, {30: [(5, 6)]})
+        with self.assertRaises(KeyError):
+            scores[3]
+
+        arrays = evaluation.merge_split_arrays()
+        skeleton_ids, segments_u, segments_v = arrays['splits']
+        self.assertEqual(list(skeleton_ids), [1, 1])
+        self.assertEqual(list(segments_u), [10, 20])
+        self.assertEqual(list(segments_v), [20, 10])
+        self.assertEqual(len(arrays['merges'][0]), 0)
+
+        stats = evaluation.merge_split_stats()
+        self.assertEqual(stats['split_stats'], {1: [(10, 20), (20, 10)]})
+
+    def test_parallel_evaluation(self):
+
+        np.random.seed(42)
+        num_nodes = 10000
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=np.arange(num_nodes),
+            skeleton_ids=np.arange(num_nodes)//100,
+            edges=[
+                [i, i + 1]
+                for i in range(num_nodes - 1)
+                if i//100 == (i + 1)//100
+            ],
+            positions=np.random.random((num_nodes, 3)))
+        node_segment_lut = np.random.randint(0, 50, size=(num_nodes,))//2
+
+        erl, stats = evaluate.expected_run_length(
+            skeletons,
+            None,
+            None,
+            node_segment_lut,
+            return_merge_split_stats=True)
+        expected = evaluate.evaluate_skeleton_arrays(
+            skeletons,
+            node_segment_lut)
+
+        for num_workers in [2, 3, 8, 200]:
+
+            parallel_erl, parallel_stats = evaluate.expected_run_length(
+                skeletons,
+                None,
+                None,
+                node_segment_lut,
+                return_merge_split_stats=True,
+                num_workers=num_workers)
+            evaluation = evaluate.evaluate_skeleton_arrays(
+                skeletons,
+                node_segment_lut,
+                num_workers=num_workers)
+
+            self.assertEqual(erl, parallel_erl)
+            self.assertEqual(stats, parallel_stats)
+            np.testing.assert_array_equal(
+                evaluation.edge_classes,
+                expected.edge_classes)
+            np.testing.assert_array_equal(
+                evaluation.correct_lengths,
+                expected.correct_lengths)
+
+    def test_expected_run_length_sweep(self):
+
+        # skeleton: o--o--o--o--o (distance = 1 between nodes)
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2, 3, 4, 5, 6, 7],
+            skeleton_ids=[1, 1, 1, 1, 1, 2, 2],
+            edges=[[0, 1], [1, 2], [2, 3], [3, 4], [5, 6]],
+            positions=[0, 1, 2, 3, 4, 10, 11])
+
+        node_segment_luts = [
+            [1, 1, 1, 2, 2, 3, 3],
+            [1, 1, 1, 1, 2, 3, 3],
+            [1, 1, 1, 1, 2, 2, 2],
+            [0, 1, 1, 1, 1, 3, 3],
+        ]
+
+        results = evaluate.expected_run_length_sweep(
+            skeletons,
+            node_segment_luts)
+
+        for i, node_segment_lut in enumerate(node_segment_luts):
+
+            self.assertAlmostEqual(
+                results['erl'][i],
+                evaluate.expected_run_length(
+                    skeletons,
+                    None,
+                    None,
+                    node_segment_lut))
+
+            evaluation = evaluate.evaluate_skeleton_arrays(
+                skeletons,
+                node_segment_lut)
+            for key in ['ommitted', 'split', 'merged', 'correct']:
+                self.assertEqual(
+                    results[key][i],
+                    getattr(evaluation, key).sum())
+
+        self.assertEqual(list(results['split']), [1, 1, 1, 0])
+        self.assertEqual(list(results['merged']), [0, 0, 1, 0])
+        self.assertEqual(list(results['ommitted']), [0, 0, 0, 1])
+        self.assertAlmostEqual(results['erl'][0], (4 + 1 + 1)/5)
+
+        # no edges
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2],
+            skeleton_ids=[1, 2],
+            edges=np.zeros((0, 2), dtype=np.int64),
+            positions=[0, 1])
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            results = evaluate.expected_run_length_sweep(
+                skeletons,
+                [[1, 1], [1, 2]])
+
+        self.assertEqual(list(results['erl']), [0, 0])
+        self.assertEqual(list(results['correct']), [0, 0])
+
+    def test_expected_run_length_bootstrap(self):
+
+        np.random.seed(42)
+        num_nodes = 10000
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=np.arange(num_nodes),
+            skeleton_ids=np.arange(num_nodes)//100,
+            edges=[
+                [i, i + 1]
+                for i in range(num_nodes - 1)
+                if i//100 == (i + 1)//100
+            ],
+            positions=np.random.random((num_nodes, 3)))
+        node_segment_lut = np.arange(num_nodes)//10
+
+        erl = evaluate.expected_run_length(
+            skeletons,
+            None,
+            None,
+            node_segment_lut)
+
+        evaluation = evaluate.evaluate_skeleton_arrays(
+            skeletons,
+            node_segment_lut)
+        lengths, contributions = evaluation.run_length_contributions()
+
+        results = evaluate.expected_run_length_bootstrap(
+            lengths,
+            contributions,
+            num_samples=2000,
+            seed=42,
+            max_chunk_size=10000)
+
+        self.assertAlmostEqual(results['erl'], erl)
+        self.assertEqual(results['samples'].shape, (2000,))
+        self.assertLess(results['lower'], erl)
+        self.assertGreater(results['upper'], erl)
+        self.assertAlmostEqual(results['mean'], erl, places=2)
+
+        # same seed, same samples
+        np.testing.assert_array_equal(
+            results['samples'],
+            evaluate.expected_run_length_bootstrap(
+                lengths,
+                contributions,
+                num_samples=2000,
+                seed=42,
+                max_chunk_size=10000)['samples'])
+
+        # no skeletons, or skeletons without length
+        for lengths, contributions in [([], []), ([0, 0], [0, 0])]:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                results = evaluate.expected_run_length_bootstrap(
+                    lengths,
+                    contributions,
+                    num_samples=10,
+                    seed=42)
+            for key in ['erl', 'mean', 'lower', 'upper']:
+                self.assertEqual(results[key], 0)
+            self.assertEqual(list(results['samples']), [0]*10)
+
+        # replicates that only draw skeletons without length
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            results = evaluate.expected_run_length_bootstrap(
+                [0, 2],
+                [0, 4],
+                num_samples=100,
+                seed=42)
+        self.assertEqual(results['erl'], 2)
+        self.assertEqual(set(results['samples']), {0, 2})
+
+    def test_expected_run_length_curve(self):
+
+        # skeleton: o--o--o--o--o (distance = 1 between nodes)
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2, 3, 4, 5, 6, 7],
+            skeleton_ids=[1, 1, 1, 1, 1, 2, 2],
+            edges=[[0, 1], [1, 2], [2, 3], [3, 4], [5, 6]],
+            positions=[0, 1, 2, 3, 4, 10, 11])
+
+        # one fragment per node, 0 is background
+        node_fragment_lut = [1, 2, 3, 4, 5, 6, 0]
+        merges = [
+            (1, 2),  # correct
+            (3, 4),  # correct
+            (2, 3),  # correct
+            (2, 0),  # ignored
+            (3, 3),  # no-op
+            (5, 6),  # merges skeletons 1 and 2
+            (4, 5),  # extends the merge
+        ]
+
+        curve = evaluate.expected_run_length_curve(
+            skeletons,
+            node_fragment_lut,
+            merges)
+
+        self.assertEqual(len(curve), len(merges) + 1)
+
+        # check against evaluating each agglomeration separately
+        segments = list(node_fragment_lut)
+        for i, (a, b) in enumerate([(0, 0)] + merges):
+            if a != 0 and b != 0:
+                old = segments[node_fragment_lut.index(b)]
+                new = segments[node_fragment_lut.index(a)]
+                segments = [new if s == old else s for s in segments]
+            self.assertAlmostEqual(
+                curve[i],
+                evaluate.expected_run_length(
+                    skeletons,
+                    None,
+                    None,
+                    segments))
+
+        self.assertAlmostEqual(curve[3], (9 + 0)/5)
+        self.assertAlmostEqual(curve[-1], 0)
+
+        run_length = evaluate.IncrementalRunLength(
+            skeletons,
+            node_fragment_lut)
+        self.assertAlmostEqual(run_length.erl, 0)
+        self.assertAlmostEqual(run_length.merge(4, 5), 1/5)
+
+        # no length, without edges or with edges of length 0
+        for edges, positions in [
+                (np.zeros((0, 2), dtype=np.int64), [0, 1]),
+                ([[0, 1]], [0, 0])]:
+
+            skeletons = evaluate.SkeletonArrays(
+                node_ids=[1, 2],
+                skeleton_ids=[1, 1],
+                edges=edges,
+                positions=positions)
+
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                curve = evaluate.expected_run_length_curve(
+                    skeletons,
+                    [1, 2],
+                    [(1, 2)])
+
+            self.assertEqual(list(curve), [0, 0])
@@ -0,0 +1,79 @@
+from funlib import evaluate
+import networkx
+import numpy as np
+import unittest
+
+
+class TestSkeletonRandVoi(unittest.TestCase):
+
+    def test_skeleton_rand_voi(self):
+
+        # skeleton 0: o-o-o-o (length 3)
+        # skeleton 1: o---o   (length 3)
+        skeletons = evaluate.SkeletonArrays(
+            node_ids=[1, 2, 3, 4, 5, 6],
+            skeleton_ids=[0, 0, 0, 0, 1, 1],
+            edges=[[0, 1], [1, 2], [2, 3], [4, 5]],
+            positions=[0, 1, 2, 3, 10, 13])
+
+        # perfect segmentation
+        m = evaluate.skeleton_rand_voi(
+            skeletons,
+            None,
+            [10, 10, 10, 10, 20, 20])
+
+        self.assertEqual(m['rand_split'], 1.0)
+        self.assertEqual(m['rand_merge'], 1.0)
+        self.assertEqual(m['voi_split'], 0.0)
+        self.assertEqual(m['voi_merge'], 0.0)
+
+        # split skeleton 0, merge part of it with skeleton 1: same as
+        # voxel-wise rand_voi on the nodes
+        node_segment_lut = [10, 10, 20, 20, 20, 20]
+        m = evaluate.skeleton_rand_voi(
+            skeletons,
+            None,
+            node_segment_lut,
+            return_cluster_scores=True)
+        expected = evaluate.rand_voi(
+            np.array([1, 1, 1, 1, 2, 2], dtype=np.uint64),
+            np.array(node_segment_lut, dtype=np.uint64),
+            return_cluster_scores=True)
+
+        for key in ['rand_split', 'rand_merge', 'voi_split', 'voi_merge']:
+            self.assertAlmostEqual(m[key], expected[key])
+        self.assertEqual(set(m['voi_split_i'].keys()), {0, 1})
+        self.assertAlmostEqual(
+            m['voi_split_i'][0],
+            expected['voi_split_i'][1])
+
+        # with edge length weights, nodes of skeleton 1 weigh 1.5 each,
+        # skeleton 0 weighs 0.5, 1, 1, 0.5
+        m = evaluate.skeleton_rand_voi(
+            skeletons,
+            None,
+            node_segment_lut,
+            weighting='edge_length')
+        expected = evaluate.rand_voi(
+            np.array([1, 1, 1, 1, 2, 2], dtype=np.uint64),
+            np.array(node_segment_lut, dtype=np.uint64),
+            weights=np.array([0.5, 1, 1, 0.5, 1.5, 1.5]))
+
+        for key in ['rand_split', 'rand_merge', 'voi_split', 'voi_merge']:
+            self.assertAlmostEqual(m[key], expected[key])
+        # each skeleton split in half
+        self.assertAlmostEqual(m['voi_split'], 0.5)
+
+        # same for graphs
+        graph = networkx.Graph()
+        graph.add_nodes_from([
+            (n, {'skeleton_id': s})
+            for n, s in zip([1, 2, 3, 4, 5, 6], [0, 0, 0, 0, 1, 1])
+        ])
+        graph.add_edges_from([(1, 2), (2, 3), (3, 4), (5, 6)])
+        m_graph = evaluate.skeleton_rand_voi(
+            graph,
+            'skeleton_id',
+            dict(zip([1, 2, 3, 4, 5, 6], node_segment_lut)))
+        m = evaluate.skeleton_rand_voi(skeletons, None, node_segment_lut)
+        self.assertAlmostEqual(m_graph['voi_merge'], m['voi_merge'])
@@ -1,14 +1,20 @@
 from funlib import evaluate
+from funlib.evaluate.split_merge import \
+        SplitComponent, \
+        component_heap, \
+        filter_component_nodes, \
+        select_split_component, \
+        select_split_nodes
+import heapq
 import networkx
+import numpy as np
 import random
+import sys
 import unittest
 
 
 class TestRandVoi(unittest.TestCase):
 
-    @unittest.skipIf(
-        not evaluate._have_graph_tool,
-        "Skipping (graph_tool not installed)")
     def test_split_graph(self):
 
         # simple case
@@ -289,3 +295,283 @@ class TestRandVoi(unittest.TestCase):
             'split')
 
         self.assertEqual(num_splits, 18)
+
+    def test_split_graph_parallel(self):
+
+        graph = networkx.Graph()
+        random.seed(3)
+        num_nodes = 1000
+        num_edges = 10000
+        for i in range(num_nodes):
+            graph.add_node(
+                i,
+                z=random.random(),
+                y=random.random(),
+                x=random.random())
+        for i in range(num_edges):
+            graph.add_edge(
+                random.randint(0, num_nodes - 1),
+                random.randint(0, num_nodes - 1),
+                weight=random.random())
+
+        components = [
+            list(range(i, i + 10))
+            for i in range(0, num_nodes, 100)
+        ]
+
+        num_splits = evaluate.split_graph(
+            graph,
+            components,
+            ['x', 'y', 'z'],
+            'weight',
+            'split')
+
+        for num_workers in [2, 4]:
+
+            parallel_num_splits = evaluate.split_graph(
+                graph,
+                components,
+                ['x', 'y', 'z'],
+                'weight',
+                'parallel_split',
+                num_workers=num_workers)
+
+            self.assertEqual(num_splits, parallel_num_splits)
+            for _, data in graph.nodes(data=True):
+                self.assertEqual(data['split'], data['parallel_split'])
+
+    def test_split_graph_arrays(self):
+
+        # loop, three components, several nodes per component
+        #
+        # 0---1-*-2
+        # |       |
+        # 3-*-4---5
+        #
+        # split 0 / 3 / 4,5
+
+        split_labels, num_splits = evaluate.split_graph_arrays(
+            edges=[[0, 1], [1, 2], [2, 5], [4, 5], [3, 4], [0, 3]],
+            weights=[1, 0.5, 1, 1, 0.1, 1],
+            positions=[[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2]],
+            components=[[0], [3], [4, 5]])
+
+        self.assertEqual(num_splits, 2)
+        self.assertEqual(list(split_labels), [0, 0, 2, 1, 2, 2])
+
+        # all backends agree
+        backends = ['scipy']
+        if evaluate._have_graph_tool:
+            backends.append('graph_tool')
+
+        for backend in backends:
+            split_labels, num_splits = evaluate.split_graph_arrays(
+                edges=[[0, 1], [1, 2], [2, 5], [4, 5], [3, 4], [0, 3]],
+                weights=[1, 0.5, 1, 1, 0.1, 1],
+                positions=[[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2]],
+                components=[[0], [3], [4, 5]],
+                backend=backend)
+
+            self.assertEqual(num_splits, 2)
+            self.assertEqual(list(split_labels), [0, 0, 2, 1, 2, 2])
+
+        with self.assertRaises(ValueError):
+            evaluate.split_graph_arrays(
+                edges=[[0, 1]],
+                weights=[1],
+                positions=[[0], [1]],
+                components=[[0], [1]],
+                backend='unknown')
+
+    def test_split_graph_numbering(self):
+
+        # chain, four components, split IDs follow a depth-first recursion
+        # that visits the side of the second largest component first
+        #
+        # 0---1-*-2-*-3-*-4---5
+        #
+        # split 0,1 / 2 / 3 / 4,5 in the order 4,5 / 3 / 2 / 0,1
+
+        for num_workers in [1, 2]:
+            split_labels, num_splits = evaluate.split_graph_arrays(
+                edges=[[0, 1], [1, 2], [2, 3], [3, 4], [4, 5]],
+                weights=[1, 0.2, 0.5, 0.1, 1],
+                positions=[0, 1, 2, 3, 4, 5],
+                components=[[5], [3], [2], [0]],
+                backend='scipy',
+                num_workers=num_workers)
+
+            self.assertEqual(num_splits, 3)
+            self.assertEqual(list(split_labels), [3, 3, 2, 1, 0, 0])
+
+    def test_split_graph_deep(self):
+
+        # chain with one component per node, each split only cuts off the
+        # last node, such that splits are nested deeper than the recursion
+        # limit (lowered to keep the test fast)
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(250)
+        try:
+            num_nodes = sys.getrecursionlimit() + 50
+            weights = np.random.default_rng(0).random(num_nodes - 1) + 0.1
+
+            split_labels, num_splits = evaluate.split_graph_arrays(
+                edges=np.stack(
+                    [np.arange(num_nodes - 1), np.arange(1, num_nodes)],
+                    axis=1),
+                weights=weights,
+                positions=np.arange(num_nodes),
+                components=[[i] for i in range(num_nodes)],
+                backend='scipy')
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.assertEqual(num_splits, num_nodes - 1)
+        self.assertEqual(list(split_labels), list(range(num_nodes)))
+
+    def test_split_components(self):
+
+        positions = np.arange(10, dtype=np.float64)[:, np.newaxis]
+
+        a = SplitComponent(0, np.array([0, 1, 2, 3]))
+        b = SplitComponent(1, np.array([7, 8, 9]))
+        components = component_heap([a, b])
+
+        tree_a = a.kd_tree(positions)
+        tree_b = b.kd_tree(positions)
+        self.assertIs(a.kd_tree(positions), tree_a)
+        self.assertEqual(select_split_nodes(a, b, positions), (3, 7))
+
+        # a loses node 3, b is unchanged
+        mask = np.ones((10,), dtype=bool)
+        mask[3] = False
+        filtered = {
+            c.index: c
+            for _, _, c in filter_component_nodes(mask, components)
+        }
+
+        self.assertIs(filtered[1], b)
+        self.assertIs(filtered[1].kd_tree(positions), tree_b)
+        self.assertIsNot(filtered[0], a)
+        self.assertEqual(list(filtered[0].nodes), [0, 1, 2])
+        self.assertIsNot(filtered[0].kd_tree(positions), tree_a)
+        self.assertEqual(
+            select_split_nodes(filtered[0], filtered[1], positions),
+            (2, 7))
+
+        # components without nodes in mask are dropped
+        mask[7:] = False
+        filtered = filter_component_nodes(mask, components)
+        self.assertEqual([c.index for _, _, c in filtered], [0])
+
+        # the nodes of all components are filtered at once
+        components = component_heap([
+            SplitComponent(i, np.arange(3*i, 3*i + 3))
+            for i in range(100)
+        ])
+        mask = np.random.default_rng(0).random(300) > 0.5
+        filtered = filter_component_nodes(mask, components)
+        for _, _, c in filtered:
+            self.assertEqual(
+                list(c.nodes),
+                [n for n in range(3*c.index, 3*c.index + 3) if mask[n]])
+        self.assertEqual(
+            len(filtered),
+            len(set(np.nonzero(mask)[0]//3)))
+        self.assertEqual(
+            list(filtered.nodes),
+            [n for c in filtered.components for n in c.nodes])
+
+    def test_select_split_component(self):
+
+        def heap(sizes):
+            return component_heap([
+                SplitComponent(i, np.arange(size))
+                for i, size in enumerate(sizes)
+            ])
+
+        # (second largest, largest), the last given wins ties
+        u, v = select_split_component(heap([2, 5, 3]))
+        self.assertEqual((u.index, v.index), (2, 1))
+        u, v = select_split_component(heap([2, 5, 3, 5]))
+        self.assertEqual((u.index, v.index), (1, 3))
+        u, v = select_split_component(heap([4, 4]))
+        self.assertEqual((u.index, v.index), (0, 1))
+
+        # same as taking the two smallest heap entries
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            components = heap(rng.integers(1, 5, size=rng.integers(2, 10)))
+            u, v = select_split_component(components)
+            largest, second = heapq.nsmallest(2, components)
+            self.assertEqual(
+                (u.index, v.index),
+                (second[2].index, largest[2].index))
+
+    def test_split_graph_multiway(self):
+
+        # loop, three components, several nodes per component
+        #
+        # 0---1-*-2
+        # |       |
+        # 3-*-4---5
+        #
+        # split 0 / 3 / 4,5
+
+        for mode in ['recursive', 'multiway']:
+            split_labels, num_splits, cut_weight = \
+                evaluate.split_graph_arrays(
+                    edges=[[0, 1], [1, 2], [2, 5], [4, 5], [3, 4], [0, 3]],
+                    weights=[1, 0.5, 1, 1, 0.1, 1],
+                    positions=[[0, 0], [0, 1], [0, 2], [1, 0], [1, 1], [1, 2]],
+                    components=[[0], [3], [4, 5]],
+                    backend='scipy',
+                    mode=mode,
+                    return_cut_weight=True)
+
+            self.assertEqual(num_splits, 2 if mode == 'recursive' else 3)
+            self.assertEqual(list(split_labels), [0, 0, 2, 1, 2, 2])
+            self.assertAlmostEqual(cut_weight, 1.6)
+
+        # random graph, all components end up in different splits
+        graph = networkx.Graph()
+        random.seed(4)
+        num_nodes = 500
+        for i in range(num_nodes):
+            graph.add_node(i, x=random.random(), y=random.random())
+        for i in range(4*num_nodes):
+            graph.add_edge(
+                random.randint(0, num_nodes - 1),
+                random.randint(0, num_nodes - 1),
+                weight=random.random())
+
+        components = [
+            list(range(i, i + 5))
+            for i in range(0, num_nodes, 50)
+        ]
+
+        for num_workers in [1, 2]:
+
+            num_splits, cut_weight = evaluate.split_graph(
+                graph,
+                components,
+                ['x', 'y'],
+                'weight',
+                'split',
+                num_workers=num_workers,
+                mode='multiway',
+                return_cut_weight=True)
+
+            self.assertEqual(num_splits, len(components))
+            self.assertGreater(cut_weight, 0)
+            for i, component in enumerate(components):
+                for n in component:
+                    self.assertEqual(graph.nodes[n]['split'], i)
+
+        with self.assertRaises(ValueError):
+            evaluate.split_graph_arrays(
+                edges=[[0, 1]],
+                weights=[1],
+                positions=[[0], [1]],
+                components=[[0], [1]],
+                mode='unknown')
@@ -15,6 +15,11 @@ setup(
             'funlib.evaluate',
             'funlib.evaluate.impl'
         ],
+        entry_points={
+            'console_scripts': [
+                'funlib-evaluate = funlib.evaluate.cli:main'
+            ]
+        },
         ext_modules=cythonize([
             Extension(
                 'funlib.evaluate.rand_voi',
@@ -31,6 +36,23 @@ setup(
                 ],
                 extra_compile_args=['-O3', '-std=c++11'],
                 include_dirs=[np.get_include()],
+                language='c++'),
+            Extension(
+                'funlib.evaluate.edit_counts',
+                sources=[
+                    'funlib/evaluate/edit_counts.pyx'
+                ],
+                extra_compile_args=['-O3', '-std=c++11'],
+                include_dirs=[np.get_include()],
+                language='c++'),
+            Extension(
+                'funlib.evaluate.skeleton_scores',
+                sources=[
+                    'funlib/evaluate/skeleton_scores.pyx'
+                ],
+                extra_compile_args=['-O3', '-std=c++11', '-pthread'],
+                extra_link_args=['-pthread'],
+                include_dirs=[np.get_include()],
                 language='c++')
         ])
 )